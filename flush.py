@@ -1,25 +1,39 @@
 import wikimedia_connection.wikimedia_connection as wikimedia_connection
 import osm_handling_config.global_config as osm_handling_config
-import os
+import sys
+from wikibrain import cache_store
 
-wikimedia_connection.set_cache_location(osm_handling_config.get_wikimedia_connection_cache_location())
+"""
+flush.py Q49833 Q45621
 
-forced_refresh = True
-forced_refresh = False
-article = "he:גשר יהודית".split(":")
-wikimedia_connection.get_data_from_wikidata(article[0], article[1], forced_refresh)
+flushes cache of Q49833 and Q45621
 
-kill = "".split()  # NOT FLUSHED YET!
-"""
-# use like this:
-kill = ["Q45621"]
-"""
-for id in kill:
-    os.remove(wikimedia_connection.get_filename_with_wikidata_entity_by_id(id))
-    os.remove(wikimedia_connection.get_filename_with_wikidata_by_id_response_code(id))
+flush.py "he:גשר יהודית"
 
-"""
-flush.py Q49833
+flushes cache of article and its wikidata entry
 
-flushes cache of Q49833
+flush.py --cache-store=/path/to/wikimedia-connection-cache.sqlite Q49833
+
+flushes cache kept in single file store (see python3 -m wikibrain.cache_store
+for migration), by default the original directory layout is used - the same
+store as used by validator should be given
 """
+
+wikimedia_connection.set_cache_location(osm_handling_config.get_wikimedia_connection_cache_location())
+
+flushed_entries = []
+for argument in sys.argv[1:]:
+    if argument.startswith("--cache-store="):
+        cache_store.set_cache_store(cache_store.open_cache_store(argument[len("--cache-store="):]))
+    else:
+        flushed_entries.append(argument)
+
+with cache_store.current_cache_store() as store:
+    for flushed in flushed_entries:
+        if ":" in flushed:
+            language_code = wikimedia_connection.get_language_code_from_link(flushed)
+            article_name = wikimedia_connection.get_article_name_from_link(flushed)
+            store.delete_many(cache_store.keys_for_article(language_code, article_name))
+        else:
+            store.delete_many(cache_store.keys_for_wikidata_id(flushed))
+        print("flushed", flushed)
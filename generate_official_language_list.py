@@ -1,4 +1,9 @@
 import csv
+import json
+import os
+
+# data artifact loaded by wikibrain.official_languages
+OUTPUT_PATH = os.path.join('wikibrain', 'official_languages.json')
 
 
 def main():
@@ -22,24 +27,19 @@ def main():
                 rows_grouped_by_language[language_code] = []
             rows_grouped_by_language[language_code].append(row)
 
-    for language_code in rows_grouped_by_language.keys():
-        tab = "    "
-        prefix = tab + tab
+    # one line per language, sorted - so regenerated file gives readable diffs
+    lines = []
+    for language_code in sorted(rows_grouped_by_language.keys()):
         rows = rows_grouped_by_language[language_code]
-        language_name = rows[0][1]
-        returned = ""
-        returned += prefix + "if language_code == \"" + language_code + "\": # " + language_name + "\n"
-        if len(rows) > 1:
-            returned += prefix + tab + "return [\n"
-            for row in rows:
-                country_wikidata_where_language_is_official = row[5].replace("http://www.wikidata.org/entity/", "")
-                country_name_where_language_is_official = row[6]
-                returned += prefix + tab + tab + "\"" + country_wikidata_where_language_is_official + "\", # " + country_name_where_language_is_official + "\n"
-            returned += prefix + tab + "]\n"
-        else:
-            country_wikidata_where_language_is_official = rows[0][5].replace("http://www.wikidata.org/entity/", "")
-            returned += prefix + tab + "return [\"" + country_wikidata_where_language_is_official + "\"] # " + rows[0][6] + "\n"
-        print(returned)
+        country_ids = sorted(set(row[5].replace("http://www.wikidata.org/entity/", "") for row in rows), key=wikidata_id_sort_key)
+        lines.append(json.dumps(language_code) + ": " + json.dumps(country_ids))
+    with open(OUTPUT_PATH, 'w') as output:
+        output.write("{\n" + ",\n".join(lines) + "\n}\n")
+    print(len(lines), "languages written to", OUTPUT_PATH)
+
+
+def wikidata_id_sort_key(wikidata_id):
+    return int(wikidata_id[1:])
 
 
 def get_language_code_from_row(row):
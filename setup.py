@@ -13,6 +13,7 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/matkoniecz/wikibrain",
     packages=setuptools.find_packages(),
+    package_data={"wikibrain": ["official_languages.json"]},
     install_requires=[
         'geopy>=1.11.0',
         'nose>=1.3.7',
@@ -0,0 +1,190 @@
+import ast
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import unittest.mock
+import urllib.parse
+from wikimedia_connection import wikimedia_connection
+from wikibrain.async_detector import AsyncWikimediaLinkIssueDetector
+import wikibrain.parallel_evaluation
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+def item(wikidata_id, instance_of=(), subclass_of=(), sitelinks=None):
+    def claims(values):
+        return [{"mainsnak": {"snaktype": "value", "datavalue": {"value": {"entity-type": "item", "id": value}, "type": "wikibase-entityid"}}, "rank": "normal"} for value in values]
+    returned = {"type": "item", "id": wikidata_id, "labels": {}, "claims": {"P31": claims(instance_of), "P279": claims(subclass_of)}, "sitelinks": {}}
+    for language_code, title in (sitelinks or {}).items():
+        returned["sitelinks"][language_code + "wiki"] = {"site": language_code + "wiki", "title": title}
+    return returned
+
+
+# stubbed Wikidata, with data matching test cases from test_wikimedia_link_issue_reporter
+ENTITIES = {
+    "Q5": item("Q5"),
+    "Q1339": item("Q1339", instance_of=["Q5"], sitelinks={"en": "Johann Sebastian Bach"}),
+    "Q1656682": item("Q1656682"),
+    "Q2": item("Q2", sitelinks={"en": "Earth"}),
+}
+
+
+def stubbed_download(url, timeout=360):
+    parsed = urllib.parse.urlparse(url)
+    parameters = urllib.parse.parse_qs(parsed.query)
+    if parsed.netloc == "www.wikidata.org" and "ids" in parameters:
+        wikidata_id = parameters["ids"][0]
+        if wikidata_id not in ENTITIES:
+            response = {"error": {"code": "no-such-entity", "id": wikidata_id}}
+        else:
+            response = {"entities": {wikidata_id: ENTITIES[wikidata_id]}, "success": 1}
+        return wikimedia_connection.UrlResponse(json.dumps(response).encode("utf-8"), 200)
+    if parsed.netloc == "www.wikidata.org" and "titles" in parameters:
+        site = parameters["sites"][0]
+        title = parameters["titles"][0]
+        for wikidata_id, data in ENTITIES.items():
+            if data["sitelinks"].get(site, {}).get("title") == title:
+                response = {"entities": {wikidata_id: data}, "success": 1}
+                return wikimedia_connection.UrlResponse(json.dumps(response).encode("utf-8"), 200)
+        response = {"entities": {"-1": {"site": site, "title": title, "missing": ""}}, "success": 1}
+        return wikimedia_connection.UrlResponse(json.dumps(response).encode("utf-8"), 200)
+    if parsed.path == "/w/api.php":
+        response = {"query": {"pages": {"-1": {"ns": 0, "title": parameters["titles"][0], "missing": ""}}}}
+        return wikimedia_connection.UrlResponse(json.dumps(response).encode("utf-8"), 200)
+    return wikimedia_connection.UrlResponse(b'', 404)
+
+
+def reporter_test_cases():
+    """
+    literal tag dictionaries of test cases in test_wikimedia_link_issue_reporter,
+    parsed rather than imported - that module needs configured cache location
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_wikimedia_link_issue_reporter.py")
+    with open(path, encoding="utf-8") as source:
+        tree = ast.parse(source.read())
+    returned = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Assign) or not isinstance(node.value, ast.Dict):
+            continue
+        if not any(isinstance(target, ast.Name) and target.id.endswith("tags") for target in node.targets):
+            continue
+        try:
+            tags = ast.literal_eval(node.value)
+        except ValueError:
+            # keys computed in test, such as {key: ...}
+            continue
+        if tags not in returned:
+            returned.append(tags)
+    return returned
+
+
+class FakeElement:
+    def __init__(self, tags):
+        self.tags = tags
+
+    def get_tag_dictionary(self):
+        return self.tags
+
+
+class Tests(unittest.TestCase):
+    cases = reporter_test_cases()
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        wikimedia_connection.set_cache_location(self.location)
+        self.patch = unittest.mock.patch.object(wikimedia_connection, "download", stubbed_download)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(self.location)
+
+    def detector(self):
+        return wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches.private())
+
+    def summary(self, problem):
+        if problem == None:
+            return None
+        return problem.data()
+
+    def test_reporter_test_cases_are_found(self):
+        self.assertIn({"wikidata": "Q999999999999999999999999999999999999"}, self.cases)
+        self.assertIn({"wikidata": "Saturn"}, self.cases)
+        self.assertGreater(len(self.cases), 20)
+
+    def test_async_verdicts_are_identical_to_sync_ones(self):
+        async def check(tags):
+            async with AsyncWikimediaLinkIssueDetector(self.detector(), concurrency=4) as detector:
+                return await detector.get_problem_for_given_tags(tags, "node", "fake test object")
+        for tags in self.cases:
+            with self.subTest(tags=tags):
+                expected = self.summary(self.detector().get_problem_for_given_tags(tags, "node", "fake test object"))
+                self.assertEqual(expected, self.summary(asyncio.run(check(tags))))
+
+    def test_concurrent_async_verdicts_are_identical_to_sync_ones(self):
+        expected = [self.summary(self.detector().get_problem_for_given_tags(tags, "node", "fake test object")) for tags in self.cases]
+
+        async def check_all():
+            async with AsyncWikimediaLinkIssueDetector(self.detector(), concurrency=4) as detector:
+                checks = [detector.get_problem_for_given_tags(tags, "node", "fake test object") for tags in self.cases]
+                return await asyncio.gather(*checks)
+        self.assertEqual(expected, [self.summary(problem) for problem in asyncio.run(check_all())])
+        self.assertNotEqual([None] * len(expected), expected)
+
+    def test_element_stream_is_reported_in_order(self):
+        expected = [self.summary(self.detector().get_problem_for_given_tags(tags, "node", "fake test object")) for tags in self.cases]
+
+        async def elements():
+            for tags in self.cases:
+                await asyncio.sleep(0)
+                yield FakeElement(tags)
+
+        async def check_all():
+            returned = []
+            async with AsyncWikimediaLinkIssueDetector(self.detector(), concurrency=3) as detector:
+                async for problem in detector.iterate_problems(elements()):
+                    returned.append(self.summary(problem))
+            return returned
+        with unittest.mock.patch.object(wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector, "get_problem_for_given_element", lambda detector, element: detector.get_problem_for_given_tags(element.get_tag_dictionary(), "node", "fake test object")):
+            self.assertEqual(expected, asyncio.run(check_all()))
+
+    def test_closing_stream_cancels_pending_checks(self):
+        async def check_first():
+            async with AsyncWikimediaLinkIssueDetector(self.detector(), concurrency=2) as detector:
+                stream = detector.iterate_problems([FakeElement(tags) for tags in self.cases])
+                async for problem in stream:
+                    break
+                await stream.aclose()
+                return problem
+        with unittest.mock.patch.object(wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector, "get_problem_for_given_element", lambda detector, element: detector.get_problem_for_given_tags(element.get_tag_dictionary(), "node", "fake test object")):
+            self.assertNotEqual(None, asyncio.run(check_first()))
+        self.assertEqual(stubbed_download, wikimedia_connection.download)
+
+
+    def test_limit_of_requests_per_host_is_configurable(self):
+        self.assertEqual(7, AsyncWikimediaLinkIssueDetector(self.detector(), requests_per_host=7).shared_cache.limiter.requests_per_host)
+        self.assertGreater(AsyncWikimediaLinkIssueDetector(self.detector()).shared_cache.limiter.requests_per_host, wikibrain.parallel_evaluation.REQUESTS_PER_HOST)
+
+    def test_closing_does_not_block_event_loop(self):
+        released = threading.Event()
+
+        async def check():
+            async with AsyncWikimediaLinkIssueDetector(self.detector(), concurrency=2) as detector:
+                # lookup still running in background when detector is closed
+                detector.executor.submit(released.wait, 10)
+
+                async def release_later():
+                    await asyncio.sleep(0.05)
+                    released.set()
+                releasing = asyncio.ensure_future(release_later())
+            await releasing
+            return detector.executor
+        self.assertEqual(None, asyncio.run(asyncio.wait_for(check(), 5)))
+        self.assertEqual(True, released.is_set())
+
+if __name__ == '__main__':
+    unittest.main()
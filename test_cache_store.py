@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+from wikimedia_connection import wikimedia_connection
+from wikibrain import cache_store
+import wikibrain.wikimedia_link_issue_reporter
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        wikimedia_connection.set_cache_location(self.location)
+
+    def tearDown(self):
+        cache_store.set_cache_store(None)
+        shutil.rmtree(self.location)
+
+    def stores(self):
+        return [
+            cache_store.SqliteCacheStore(os.path.join(self.location, "cache.sqlite")),
+            cache_store.DbmCacheStore(os.path.join(self.location, "cache.dbm")),
+            cache_store.DirectoryCacheStore(self.location),
+        ]
+
+    def test_bulk_operations(self):
+        entity = "wikimedia-connection-cache/wikidata_by_id/Q42.wikidata_entity.txt"
+        code = "wikimedia-connection-cache/wikidata_by_id/Q42.wikidata_entity.code.txt"
+        for store in self.stores():
+            with store:
+                store.put_many([(entity, '{"entities": {}}'), (code, "200")])
+                self.assertEqual({entity: '{"entities": {}}', code: "200"}, store.get_many([entity, code, "missing"]))
+                self.assertEqual(True, code in store)
+                self.assertEqual(sorted([entity, code]), sorted(store.keys()))
+                store.delete_many([entity, code])
+                self.assertEqual(None, store.get(entity))
+                self.assertEqual(0, len(store))
+
+    def test_entries_are_indexed_by_kind(self):
+        with cache_store.SqliteCacheStore(os.path.join(self.location, "cache.sqlite")) as store:
+            store.put_many(zip(cache_store.keys_for_wikidata_id("Q42"), ["{}", "200"]))
+            store.put_many(zip(cache_store.keys_for_article("en", "Douglas Adams"), ["{}", "200", "<html>", "200"]))
+            self.assertEqual(cache_store.keys_for_wikidata_id("Q42")[:1], [key for key in store.keys("wikidata entity") if "Q42" in key])
+            self.assertEqual(3, len(store.keys("wikidata entity response code") + store.keys("response code")))
+
+    def test_migration_from_directory_layout(self):
+        directory_store = cache_store.DirectoryCacheStore(self.location)
+        keys = cache_store.keys_for_wikidata_id("Q42") + cache_store.keys_for_article("pl", "Kraków")
+        directory_store.put_many((key, "content of " + key) for key in keys)
+        with cache_store.SqliteCacheStore(os.path.join(self.location, "migrated.sqlite")) as store:
+            self.assertEqual(len(keys), cache_store.migrate_directory_cache(self.location, store, batch_size=2))
+            self.assertEqual({key: "content of " + key for key in keys}, store.get_many(keys))
+
+    def test_wikimedia_connection_uses_store(self):
+        downloaded = []
+
+        def download(url, timeout=360):
+            downloaded.append(url)
+            return wikimedia_connection.UrlResponse(b'{"entities": {"Q42": {"id": "Q42", "claims": {}}}}', 200)
+
+        path = os.path.join(self.location, "cache.sqlite")
+        with unittest.mock.patch.object(wikimedia_connection, "download", download):
+            with cache_store.SqliteCacheStore(path) as store:
+                cache_store.set_cache_store(store)
+                self.assertEqual("Q42", wikimedia_connection.get_data_from_wikidata_by_id("Q42")['entities']['Q42']['id'])
+                self.assertEqual("Q42", wikimedia_connection.get_data_from_wikidata_by_id("Q42")['entities']['Q42']['id'])
+                self.assertIs(store, cache_store.current_cache_store())
+                self.assertEqual(path, cache_store.current_cache_store_path())
+                cache_store.set_cache_store(None)
+                self.assertEqual("200", store.get(cache_store.keys_for_wikidata_id("Q42")[1]))
+        self.assertEqual(1, len(downloaded))
+        self.assertEqual(["cache.sqlite"], [name for name in os.listdir(self.location) if not name.startswith("cache.sqlite-")])
+
+    def test_files_outside_of_cache_are_not_affected(self):
+        outside = os.path.join(self.location, "other")
+        os.makedirs(outside)
+        filename = os.path.join(outside, "file.txt")
+        with cache_store.SqliteCacheStore(os.path.join(self.location, "cache.sqlite")) as store:
+            cache_store.set_cache_store(store)
+            wikimedia_connection.write_to_file(filename, "content", 'w')
+            self.assertEqual(True, wikimedia_connection.os.path.isfile(filename))
+            self.assertEqual("content", wikimedia_connection.get_entire_file_content(filename))
+            self.assertEqual(False, wikimedia_connection.os.path.isdir(os.path.join(outside, "missing")))
+            self.assertEqual(0, len(store))
+
+    def test_directory_layout_is_used_unless_store_is_set(self):
+        with cache_store.SqliteCacheStore(os.path.join(self.location, wikimedia_connection.cache_folder_name() + ".sqlite")):
+            pass
+        self.assertIsInstance(cache_store.current_cache_store(), cache_store.DirectoryCacheStore)
+        self.assertEqual(None, cache_store.current_cache_store_path())
+
+    def test_detector_sets_store(self):
+        with cache_store.SqliteCacheStore(os.path.join(self.location, "cache.sqlite")) as store:
+            wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(cache_store=store)
+            self.assertIs(store, cache_store.current_cache_store())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import unittest.mock
+import urllib.parse
+from wikimedia_connection import wikimedia_connection
+from wikibrain import check_registry
+from wikibrain.check_registry import CheckContext
+from wikibrain.check_registry import CheckRegistry
+from wikibrain.wikimedia_link_issue_reporter import ErrorReport
+from wikibrain.verdict_cache import TagSetVerdictCache
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+# stubbed Wikidata, human and class of humans
+ENTITIES = {
+    "Q5": {"type": "item", "id": "Q5", "labels": {}, "claims": {}, "sitelinks": {}},
+    "Q1339": {"type": "item", "id": "Q1339", "labels": {}, "sitelinks": {"enwiki": {"site": "enwiki", "title": "Johann Sebastian Bach"}},
+              "claims": {"P31": [{"mainsnak": {"snaktype": "value", "datavalue": {"value": {"entity-type": "item", "id": "Q5"}, "type": "wikibase-entityid"}}, "rank": "normal"}]}},
+}
+
+
+def stubbed_download(url, timeout=360):
+    parameters = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+    if "ids" in parameters:
+        wikidata_id = parameters["ids"][0]
+        if wikidata_id not in ENTITIES:
+            response = {"error": {"code": "no-such-entity", "id": wikidata_id}}
+        else:
+            response = {"entities": {wikidata_id: ENTITIES[wikidata_id]}, "success": 1}
+        return wikimedia_connection.UrlResponse(json.dumps(response).encode("utf-8"), 200)
+    raise AssertionError("unexpected download of " + url)
+
+
+class Tests(unittest.TestCase):
+    def registry(self, results, called):
+        # results: name -> (priority, cost, reported value)
+        registry = CheckRegistry()
+        for name, (priority, cost, reported) in results.items():
+            def run(detector, context, name=name, reported=reported):
+                called.append(name)
+                return reported
+            registry.add(name, priority, cost, run, group="group")
+        return registry
+
+    def context(self, tags):
+        return CheckContext(None, tags, None, "node", "fake test object")
+
+    def test_the_most_important_problem_wins(self):
+        called = []
+        registry = self.registry({"remote": (1, check_registry.REMOTE, "remote problem"), "local": (2, check_registry.LOCAL, "local problem")}, called)
+        self.assertEqual("remote problem", registry.run(None, self.context({})))
+        self.assertEqual(["local", "remote"], called)
+
+    def test_less_important_remote_checks_are_skipped(self):
+        called = []
+        registry = self.registry({
+            "remote": (1, check_registry.REMOTE, None),
+            "local": (2, check_registry.LOCAL, "local problem"),
+            "expensive": (3, check_registry.REMOTE, "remote problem"),
+        }, called)
+        self.assertEqual("local problem", registry.run(None, self.context({})))
+        self.assertEqual(["local", "remote"], called)
+
+    def test_guard_disables_group(self):
+        called = []
+        registry = self.registry({"local": (1, check_registry.LOCAL, "local problem"), "remote": (2, check_registry.REMOTE, "remote problem")}, called)
+        registry.set_group_guard("group", lambda detector, context: False)
+        self.assertEqual(None, registry.run(None, self.context({})))
+        self.assertEqual(["local"], called)
+
+    def test_checks_are_skipped_when_not_applicable(self):
+        registry = CheckRegistry()
+        registry.add("bridge", 1, check_registry.LOCAL, lambda detector, context: "problem", applies=lambda tags: "bridge" in tags)
+        self.assertEqual(None, registry.run(None, self.context({})))
+        self.assertEqual("problem", registry.run(None, self.context({"bridge": "yes"})))
+
+    def test_priorities_must_be_unique(self):
+        registry = CheckRegistry()
+        registry.add("first", 1, check_registry.LOCAL, lambda detector, context: None)
+        with self.assertRaises(ValueError):
+            registry.add("second", 1, check_registry.REMOTE, lambda detector, context: None)
+        with self.assertRaises(ValueError):
+            registry.add("third", 2, "cheap", lambda detector, context: None)
+
+    def test_all_problems_are_listed_by_priority(self):
+        called = []
+        registry = self.registry({
+            "remote": (1, check_registry.REMOTE, None),
+            "local": (2, check_registry.LOCAL, "local problem"),
+            "expensive": (3, check_registry.REMOTE, "remote problem"),
+        }, called)
+        self.assertEqual(["local problem", "remote problem"], registry.run_all(None, self.context({})))
+        self.assertEqual(registry.run(None, self.context({})), registry.run_all(None, self.context({}))[0])
+        registry.set_group_guard("group", lambda detector, context: False)
+        self.assertEqual([], registry.run_all(None, self.context({})))
+
+    def test_checks_using_linked_data_are_skipped_after_gate_reported_problem(self):
+        called = []
+        registry = CheckRegistry()
+
+        def check(name, reported):
+            def run(detector, context):
+                called.append(name)
+                return reported
+            return run
+        registry.add("links", 1, check_registry.REMOTE, check("links", "broken link"), gate=True)
+        registry.add("data", 2, check_registry.REMOTE, check("data", "problem with linked data"), group="group")
+        registry.add("tags", 3, check_registry.LOCAL, check("tags", "problem with tags"), group="group", uses_linked_data=False)
+        registry.set_group_guard("group", lambda detector, context: called.append("guard") or True)
+        self.assertEqual(["broken link", "problem with tags"], registry.run_all(None, self.context({})))
+        self.assertEqual(["links", "tags"], called)
+
+    def test_the_same_problem_is_listed_once(self):
+        reports = [ErrorReport(error_id="problem", prerequisite={"wikidata": "Q1"}), ErrorReport(error_id="problem", prerequisite={"wikidata": "Q1"}), ErrorReport(error_id="problem", prerequisite={"wikidata": "Q2"})]
+        self.assertEqual([{"wikidata": "Q1"}, {"wikidata": "Q2"}], [report.prerequisite for report in wikibrain.wikimedia_link_issue_reporter.unique_reports(reports)])
+
+    def test_all_problems_of_broken_links(self):
+        cache_location = tempfile.mkdtemp()
+        wikimedia_connection.set_cache_location(cache_location)
+        try:
+            with unittest.mock.patch.object(wikimedia_connection, "download", stubbed_download):
+                detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches.private())
+                for tags, expected in [
+                    ({"wikidata": "Saturn"}, ["malformed wikidata tag"]),
+                    ({"wikidata": "Q999999999999999999999999999999999999"}, ["wikidata tag links to 404"]),
+                    ({"wikidata": "Q5;Q1339"}, ["wikidata tag links to 404"]),
+                    ({"wikipedia": "pl"}, ["malformed wikipedia tag"]),
+                    ({"wikipedia": "pl", "information": "board"}, ["malformed wikipedia tag", "information board with wikipedia tag, not subject:wikipedia"]),
+                    ({"wikidata": "Q1339"}, ["should use a secondary wikipedia tag - linking from wikidata tag to a human"]),
+                ]:
+                    with self.subTest(tags=tags):
+                        problems = detector.get_all_problems_for_given_tags(tags, "node", "fake test object")
+                        self.assertEqual(expected, [problem.error_id for problem in problems])
+                        self.assertEqual(detector.get_problem_for_given_tags(tags, "node", "fake test object").data(), problems[0].data())
+        finally:
+            shutil.rmtree(cache_location)
+
+    def test_first_of_all_problems_is_the_most_important_one(self):
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector()
+        tags = {"bridge:wikipedia": "en:Tower Bridge", "not:bridge:wikipedia": "en:Tower Bridge"}
+        problems = detector.get_all_problems_for_given_tags(tags, "way", "fake test object")
+        expected = detector.get_problem_for_given_tags(tags, "way", "fake test object")
+        self.assertEqual(["wikipedia/wikidata type tag that is incorrect according to not:* tag", "bridge:wikipedia - move to bridge outline"], [problem.error_id for problem in problems])
+        self.assertEqual(expected.data(), problems[0].data())
+        self.assertEqual([], detector.get_all_problems_for_given_tags({"name": "no links at all"}, "node", "fake test object"))
+        self.assertEqual([], detector.get_all_problems_for_given_tags({"historic": "battlefield", "bridge:wikipedia": "en:Tower Bridge"}, "node", "fake test object"))
+
+    def test_derived_values_are_memoized_while_element_is_evaluated(self):
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector()
+        lookups = []
+
+        class CountingProjections:
+            def property(self, wikidata_id, property):
+                lookups.append((wikidata_id, property))
+                return None
+        detector.entity_projection_cache = CountingProjections()
+        detector.wikidata_property("Q1", "P576")
+        detector.wikidata_property("Q1", "P576")
+        self.assertEqual(2, len(lookups))
+
+        context = CheckContext(detector, {}, None, "node", "fake test object")
+        detector.evaluation_state.context = context
+        try:
+            detector.wikidata_property("Q1", "P576")
+            detector.wikidata_property("Q1", "P576")
+            detector.wikidata_property("Q1", "P159")
+            thread = threading.Thread(target=detector.wikidata_property, args=("Q1", "P576"))
+            thread.start()
+            thread.join()
+        finally:
+            detector.evaluation_state.context = None
+        # other thread is not evaluating this element
+        self.assertEqual(5, len(lookups))
+
+    def test_local_problem_skips_less_important_remote_checks(self):
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches(tag_set_verdict_cache=TagSetVerdictCache()))
+
+        def unexpected_call(*args):
+            raise AssertionError("less important check was run")
+        detector.add_wikipedia_and_wikidata_based_on_each_other = unexpected_call
+        problem = detector.get_problem_for_given_tags({"bridge:wikipedia": "en:Tower Bridge"}, "way", "fake test object")
+        self.assertEqual("bridge:wikipedia - move to bridge outline", problem.error_id)
+
+if __name__ == '__main__':
+    unittest.main()
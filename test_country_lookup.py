@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+import urllib.parse
+from wikimedia_connection import wikimedia_connection
+from wikibrain.country_lookup import CountryIndex
+from wikibrain.country_lookup import load_country_index
+from wikibrain.entity_projection import EntityProjectionCache
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+def square(min_lon, min_lat, max_lon, max_lat):
+    return [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+
+
+# simplified, not real boundaries
+FEATURES = {
+    "type": "FeatureCollection",
+    "features": [
+        {"type": "Feature", "properties": {"wikidata": "Q36", "name:en": "Poland", "name": "Polska"}, "geometry": {"type": "Polygon", "coordinates": [square(14, 49, 24, 55), square(20, 50, 21, 51)]}},
+        {"type": "Feature", "properties": {"tags": {"wikidata": "Q183", "name": "Deutschland"}}, "geometry": {"type": "MultiPolygon", "coordinates": [[square(6, 47, 14, 55)], [square(20, 50, 21, 51)]]}},
+        {"type": "Feature", "properties": {"name": "no Wikidata ID"}, "geometry": {"type": "Polygon", "coordinates": [square(0, 0, 1, 1)]}},
+    ]
+}
+
+
+def item(wikidata_id, countries=(), label=None):
+    claims = [{"mainsnak": {"snaktype": "value", "datavalue": {"value": {"entity-type": "item", "id": country}, "type": "wikibase-entityid"}}, "rank": "normal"} for country in countries]
+    returned = {"type": "item", "id": wikidata_id, "labels": {}, "claims": {}, "sitelinks": {}}
+    if claims != []:
+        returned["claims"]["P17"] = claims
+    if label != None:
+        returned["labels"]["en"] = {"language": "en", "value": label}
+    return returned
+
+
+# stubbed Wikidata
+ENTITIES = {
+    # without country
+    "Q1": item("Q1"),
+    # on Polish-German border
+    "Q2": item("Q2", countries=["Q36", "Q183"]),
+    # Wikidata claims that it is also in Nazi Germany, without end time
+    "Q3": item("Q3", countries=["Q36", "Q7318"]),
+    "Q7318": item("Q7318", label="Nazi Germany"),
+}
+
+
+def stubbed_download(url, timeout=360):
+    parameters = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+    if "ids" not in parameters or parameters["ids"][0] not in ENTITIES:
+        raise AssertionError("unexpected download of " + url)
+    wikidata_id = parameters["ids"][0]
+    response = {"entities": {wikidata_id: ENTITIES[wikidata_id]}, "success": 1}
+    return wikimedia_connection.UrlResponse(json.dumps(response).encode("utf-8"), 200)
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.path = os.path.join(self.location, "countries.geojson")
+        with open(self.path, "w") as file:
+            json.dump(FEATURES, file)
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_point_in_country(self):
+        index = load_country_index(self.path)
+        self.assertEqual(["Q36"], index.countries_at(52.2, 21.0))
+        self.assertEqual(["Q183"], index.countries_at(52.5, 13.4))
+        # hole in Poland filled by exclave
+        self.assertEqual(["Q183"], index.countries_at(50.5, 20.5))
+        self.assertEqual([], index.countries_at(0.5, 0.5))
+        self.assertEqual([], index.countries_at(-30, 130))
+        self.assertEqual("Poland", index.country_name("Q36"))
+        self.assertEqual("Deutschland", index.country_name("Q183"))
+
+    def test_grid_size_does_not_change_results(self):
+        coarse = load_country_index(self.path, cell_size=45)
+        fine = load_country_index(self.path, cell_size=0.25)
+        for lat in range(46, 57):
+            for lon in range(5, 26):
+                self.assertEqual(coarse.countries_at(lat + 0.5, lon + 0.5), fine.countries_at(lat + 0.5, lon + 0.5))
+
+    def detector(self):
+        wikimedia_connection.set_cache_location(self.location)
+        return wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(expected_language_code="pl", caches=DetectorCaches(entity_projection_cache=EntityProjectionCache(), country_index=load_country_index(self.path)))
+
+    def test_foreign_language_check_uses_coordinates(self):
+        detector = self.detector()
+        with unittest.mock.patch.object(wikimedia_connection, "download", stubbed_download):
+            self.assertEqual("it is at least partially in Deutschland", detector.why_object_is_allowed_to_have_foreign_language_label("dummy description", "Q1", (52.5, 13.4)))
+            self.assertEqual(None, detector.why_object_is_allowed_to_have_foreign_language_label("dummy description", "Q1", (52.2, 21.0)))
+
+    def test_foreign_language_check_uses_wikidata_without_location(self):
+        detector = self.detector()
+        with unittest.mock.patch.object(wikimedia_connection, "download", stubbed_download):
+            # on border according to Wikidata
+            self.assertEqual("it is at least partially in Deutschland", detector.why_object_is_allowed_to_have_foreign_language_label("dummy description", "Q2", None))
+            self.assertEqual(None, detector.why_object_is_allowed_to_have_foreign_language_label("dummy description", "Q3", None))
+            # outside all countries in index
+            self.assertEqual("it is at least partially in Deutschland", detector.why_object_is_allowed_to_have_foreign_language_label("dummy description", "Q2", (0.5, 0.5)))
+
+    def test_foreign_language_check_with_known_country_fetches_nothing(self):
+        detector = self.detector()
+        with unittest.mock.patch.object(wikimedia_connection, "download", unittest.mock.Mock(side_effect=AssertionError("nothing should be downloaded"))):
+            # coordinates are trusted over Wikidata claiming that it is also in Germany
+            self.assertEqual(None, detector.why_object_is_allowed_to_have_foreign_language_label("dummy description", "Q2", (52.2, 21.0)))
+            self.assertEqual(None, detector.why_object_is_allowed_to_have_foreign_language_label("dummy description", "Q3", (52.2, 21.0)))
+            self.assertEqual("it is at least partially in Deutschland", detector.why_object_is_allowed_to_have_foreign_language_label("dummy description", "Q2", (52.5, 13.4)))
+
+    def test_empty_index(self):
+        self.assertEqual([], CountryIndex().countries_at(52.2, 21.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
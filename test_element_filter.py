@@ -0,0 +1,54 @@
+import unittest
+from wikibrain.element_filter import KeyClassifier
+from wikibrain.element_filter import RelevantElementFilter
+from wikibrain.element_filter import is_relevant
+import wikibrain.wikimedia_link_issue_reporter
+
+
+class FakeElement:
+    def __init__(self, tags):
+        self.tags = tags
+
+    def get_tag_dictionary(self):
+        return self.tags
+
+
+class Tests(unittest.TestCase):
+    def test_relevant_keys(self):
+        for tags in [{"wikipedia": "en:Oslo"}, {"brand:wikidata": "Q1"}, {"wikipedia:de": "Berlin"}, {"name": "x", "not:operator:wikidata": "Q1"}, {"species:wikipedia": "en:Bear"}]:
+            self.assertEqual(True, is_relevant(tags), tags)
+        for tags in [{}, {"name": "Oslo"}, {"building": "yes", "not:name": "Oslo"}, {"wiki": "yes"}]:
+            self.assertEqual(False, is_relevant(tags), tags)
+
+    def test_classifier_size_is_bounded(self):
+        classifier = KeyClassifier(maximum_size=10)
+        for index in range(100):
+            classifier.is_relevant({"key" + str(index): "value"})
+        self.assertLessEqual(len(classifier.verdicts), 10)
+        self.assertEqual(True, classifier.is_relevant({"wikidata": "Q1"}))
+
+    def test_streaming_filter_reports_skipped_share(self):
+        element_filter = RelevantElementFilter()
+        self.assertEqual(None, element_filter.skipped_share())
+        elements = [FakeElement({"name": "a"}), FakeElement({"wikidata": "Q1"}), FakeElement({"building": "yes"}), FakeElement({"highway": "bus_stop"})]
+        self.assertEqual([elements[1]], list(element_filter.filter(elements)))
+        self.assertEqual(0.75, element_filter.skipped_share())
+        self.assertEqual("3 of 4 elements skipped as irrelevant (75.0%)", element_filter.summary())
+
+    def test_filter_of_tags(self):
+        element_filter = RelevantElementFilter(tags_of=lambda entry: entry[0])
+        entries = [({"wikipedia": "en:Oslo"}, "node", "a"), ({"name": "Oslo"}, "node", "b")]
+        self.assertEqual(entries[:1], list(element_filter.filter(entries)))
+
+    def test_detector_skips_irrelevant_elements(self):
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector()
+
+        def unexpected_call(*args):
+            raise AssertionError("irrelevant element was checked")
+        detector.object_should_be_deleted_not_repaired = unexpected_call
+        self.assertEqual(None, detector.get_problem_for_given_tags({"name": "Oslo", "teryt:simc": "1"}, "node", "fake test object"))
+        self.assertEqual([], detector.get_all_problems_for_given_tags({"name": "Oslo"}, "node", "fake test object"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+from wikimedia_connection import wikidata_processing
+from wikimedia_connection import wikimedia_connection
+from wikibrain import cache_store
+from wikibrain.entity_projection import PROJECTION_VERSION
+from wikibrain.entity_projection import EntityProjectionCache
+from wikibrain.entity_projection import ProjectingDownloads
+from wikibrain.entity_projection import compact_cache_store
+from wikibrain.entity_projection import project_entity
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+def statement(value, rank="normal", qualifiers=None):
+    returned = {"mainsnak": {"snaktype": "value", "property": "P", "hash": "abc", "datatype": "wikibase-item", "datavalue": {"value": {"entity-type": "item", "numeric-id": 1, "id": value}, "type": "wikibase-entityid"}}, "type": "statement", "id": "Q1$abc", "rank": rank, "references": [{"hash": "def", "snaks": {}}]}
+    if qualifiers != None:
+        returned["qualifiers"] = qualifiers
+    return returned
+
+
+def full_entity():
+    return {
+        "type": "item", "id": "Q1492", "lastrevid": 123456,
+        "labels": {"en": {"language": "en", "value": "Barcelona"}},
+        "descriptions": {"en": {"language": "en", "value": "city in Spain"}},
+        "aliases": {"en": [{"language": "en", "value": "BCN"}]},
+        "sitelinks": {"enwiki": {"site": "enwiki", "title": "Barcelona", "badges": []}},
+        "claims": {
+            "P31": [statement("Q515"), statement("Q1", rank="deprecated"), statement("Q2", qualifiers={"P2241": [{}], "P580": [{}]})],
+            "P17": [statement("Q29"), statement("Q7318", qualifiers={"P582": [{}]})],
+            "P576": [statement("Q3", qualifiers={"P1011": [{}]})],
+            "P18": [statement("Q4")],
+            "P1082": [statement("Q5")],
+        },
+    }
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        wikimedia_connection.set_cache_location(self.location)
+        self.response = json.dumps({"entities": {"Q1492": full_entity()}, "success": 1}).encode("utf-8")
+        self.downloaded = []
+
+        def download(url, timeout=360):
+            self.downloaded.append(url)
+            return wikimedia_connection.UrlResponse(self.response, 200)
+        self.patch = unittest.mock.patch.object(wikimedia_connection, "download", download)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(self.location)
+
+    def test_projection_keeps_only_used_data(self):
+        projected = project_entity(full_entity())
+        self.assertEqual(["P17", "P31", "P576"], sorted(projected["claims"]))
+        self.assertEqual(123456, projected["lastrevid"])
+        self.assertEqual("Barcelona", projected["sitelinks"]["enwiki"]["title"])
+        self.assertEqual("city in Spain", projected["descriptions"]["en"]["value"])
+        self.assertEqual(False, "aliases" in projected)
+        self.assertEqual(["P1011"], list(projected["claims"]["P576"][0]["qualifiers"]))
+        self.assertEqual(["P2241"], list(projected["claims"]["P31"][2]["qualifiers"]))
+        self.assertEqual(False, "references" in projected["claims"]["P31"][0])
+        self.assertEqual(projected, project_entity(projected))
+
+    def test_projection_serves_the_same_data_as_full_entity(self):
+        projections = EntityProjectionCache()
+        for property in ["P31", "P17", "P576", "P625"]:
+            full = wikimedia_connection.get_property_from_wikidata("Q1492", property)
+            projected = projections.property("Q1492", property)
+            if full == None:
+                self.assertEqual(None, projected)
+                continue
+            for full_claim, projected_claim in zip(full, projected):
+                self.assertEqual(full_claim["mainsnak"]["datavalue"], projected_claim["mainsnak"]["datavalue"])
+        self.assertEqual(["Q515"], projections.instance_of_ids("Q1492"))
+        self.assertEqual("Barcelona", projections.label("Q1492", "en"))
+        self.assertEqual((None, None), projections.location("Q1492"))
+        self.assertEqual(1, len(self.downloaded))
+
+    def test_downloads_are_stored_as_projections(self):
+        with ProjectingDownloads():
+            wikimedia_connection.get_data_from_wikidata_by_id("Q1492")
+        cached = wikimedia_connection.get_entire_file_content(wikimedia_connection.get_filename_with_wikidata_entity_by_id("Q1492"))
+        self.assertEqual(False, "aliases" in cached)
+        self.assertEqual(["Q515"], EntityProjectionCache().instance_of_ids("Q1492"))
+        self.assertEqual("en: Barcelona (city in Spain) [https://www.wikidata.org/wiki/Q1492]", wikidata_processing.wikidata_description("Q1492"))
+
+    def test_projections_of_older_version_are_projected_again(self):
+        projected = project_entity(full_entity())
+        projected["wikibrain_projection"] = PROJECTION_VERSION - 1
+        self.assertEqual(PROJECTION_VERSION, project_entity(projected)["wikibrain_projection"])
+
+    def test_redirect_is_resolved_with_projection_cache(self):
+        projections = EntityProjectionCache()
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches(entity_projection_cache=projections))
+        self.response = json.dumps({"entities": {"Q1": full_entity()}, "success": 1}).encode("utf-8")
+        self.assertEqual("Q1492", detector.get_wikidata_id_after_redirect("Q1"))
+        self.assertEqual("Q1492", projections.get("Q1")["id"])
+        self.assertEqual(["Q515"], projections.instance_of_ids("Q1"))
+        self.assertEqual(1, len(self.downloaded))
+
+    def test_cache_store_compaction(self):
+        with cache_store.SqliteCacheStore(os.path.join(self.location, "cache.sqlite")) as store:
+            store.put_many(zip(cache_store.keys_for_wikidata_id("Q1492"), [json.dumps({"entities": {"Q1492": full_entity()}}), "200"]))
+            size_before, size_after = compact_cache_store(store)
+            self.assertLess(size_after, size_before)
+            compacted = json.loads(store.get(cache_store.keys_for_wikidata_id("Q1492")[0]))
+            self.assertEqual(project_entity(full_entity()), compacted["entities"]["Q1492"])
+            self.assertEqual("200", store.get(cache_store.keys_for_wikidata_id("Q1492")[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from wikibrain import official_languages
+import wikibrain.wikimedia_link_issue_reporter
+
+
+class Tests(unittest.TestCase):
+    def test_countries_of_language(self):
+        self.assertEqual(frozenset(["Q36"]), official_languages.countries_with_official_language("pl"))
+        self.assertIn("Q29", official_languages.countries_with_official_language("es"))
+        self.assertEqual(None, official_languages.countries_with_official_language("xx-unknown"))
+
+    def test_reverse_index_is_consistent(self):
+        for language_code, country_ids in official_languages.countries_by_language.items():
+            for country_id in country_ids:
+                self.assertIn(language_code, official_languages.official_languages_of_country(country_id))
+        for country_id, language_codes in official_languages.languages_by_country.items():
+            for language_code in language_codes:
+                self.assertIn(country_id, official_languages.countries_by_language[language_code])
+        self.assertEqual(frozenset(), official_languages.official_languages_of_country("Q2"))
+
+    def test_detector_uses_loaded_table(self):
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector()
+        self.assertEqual(["Q668"], detector.wikidata_ids_of_countries_with_language("hi"))
+        self.assertEqual(frozenset(["Q668"]), detector.frozenset_of_countries_with_language("hi"))
+        with self.assertRaises(AssertionError):
+            detector.wikidata_ids_of_countries_with_language("xx-unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
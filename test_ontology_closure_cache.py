@@ -0,0 +1,142 @@
+import unittest
+from wikibrain.ontology_closure_cache import AncestorClosureCache
+from wikibrain.ontology_closure_cache import ClassVerdictCache
+from wikibrain.wikimedia_link_issue_reporter import OntologyRules
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+class Tests(unittest.TestCase):
+    def parents_lookup(self, graph, requested):
+        def get_direct_parents(class_id):
+            requested.append(class_id)
+            return graph.get(class_id, [])
+        return get_direct_parents
+
+    def test_closure_includes_class_and_all_superclasses(self):
+        graph = {'church': ['place of worship', 'building'], 'place of worship': ['building'], 'building': ['structure']}
+        cache = AncestorClosureCache()
+        closure = cache.ancestors('church', frozenset(), 'v1', self.parents_lookup(graph, []))
+        self.assertEqual({'church', 'place of worship', 'building', 'structure'}, closure)
+
+    def test_shared_superclasses_are_expanded_once(self):
+        graph = {'church': ['building'], 'lake': ['water body'], 'village': ['settlement'], 'building': ['structure'], 'settlement': ['structure']}
+        requested = []
+        cache = AncestorClosureCache()
+        get_direct_parents = self.parents_lookup(graph, requested)
+        cache.ancestors('church', frozenset(), 'v1', get_direct_parents)
+        cache.ancestors('village', frozenset(), 'v1', get_direct_parents)
+        cache.ancestors('church', frozenset(), 'v1', get_direct_parents)
+        self.assertEqual(1, requested.count('structure'))
+        self.assertEqual(1, requested.count('church'))
+
+    def test_cycles_are_handled(self):
+        graph = {'a': ['b'], 'b': ['c'], 'c': ['a', 'd']}
+        cache = AncestorClosureCache()
+        self.assertEqual({'a', 'b', 'c', 'd'}, cache.ancestors('a', frozenset(), 'v1', self.parents_lookup(graph, [])))
+        self.assertEqual({'a', 'b', 'c', 'd'}, cache.get_cached('b', 'v1'))
+
+    def test_ignored_entries_are_not_expanded(self):
+        graph = {'castle': ['building', 'trademark'], 'trademark': ['abstract entity']}
+        cache = AncestorClosureCache()
+        closure = cache.ancestors('castle', frozenset(['trademark']), 'v1', self.parents_lookup(graph, []))
+        self.assertEqual({'castle', 'building'}, closure)
+
+    def test_ignored_entries_version_is_part_of_key(self):
+        graph = {'castle': ['trademark'], 'trademark': ['abstract entity']}
+        cache = AncestorClosureCache()
+        cache.ancestors('castle', frozenset(['trademark']), 'v1', self.parents_lookup(graph, []))
+        closure = cache.ancestors('castle', frozenset(), 'v2', self.parents_lookup(graph, []))
+        self.assertEqual({'castle', 'trademark', 'abstract entity'}, closure)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = AncestorClosureCache(maximum_size=2)
+        get_direct_parents = self.parents_lookup({}, [])
+        cache.ancestors('a', frozenset(), 'v1', get_direct_parents)
+        cache.ancestors('b', frozenset(), 'v1', get_direct_parents)
+        cache.ancestors('a', frozenset(), 'v1', get_direct_parents)
+        cache.ancestors('c', frozenset(), 'v1', get_direct_parents)
+        self.assertEqual(2, len(cache))
+        self.assertEqual(None, cache.get_cached('b', 'v1'))
+        self.assertNotEqual(None, cache.get_cached('a', 'v1'))
+
+    def rules(self, ignored=(), ambiguous=()):
+        invalid_types = {
+            'event': {'what': 'an event', 'replacement': None, 'extremely_broad_and_unspecific': True},
+            'festival': {'what': 'a festival', 'replacement': 'brand:'},
+            'human': {'what': 'a human', 'replacement': 'name:'},
+            'sport': {'what': 'a sport', 'replacement': None},
+        }
+        return OntologyRules(ignored, invalid_types, ambiguous)
+
+    def test_verdict_prefers_specific_reason_over_extremely_broad_one(self):
+        graph = {'music festival': ['event', 'festival'], 'festival': ['event']}
+        verdict = ClassVerdictCache().verdict('music festival', self.rules(), self.parents_lookup(graph, []))
+        self.assertEqual('a festival', verdict.reason['what'])
+        self.assertEqual(1, verdict.distance)
+
+    def test_verdict_uses_extremely_broad_reason_if_nothing_else_matched(self):
+        graph = {'parade': ['public event'], 'public event': ['event']}
+        verdict = ClassVerdictCache().verdict('parade', self.rules(), self.parents_lookup(graph, []))
+        self.assertEqual('an event', verdict.reason['what'])
+
+    def test_verdict_prefers_closer_reason(self):
+        graph = {'football club': ['sport team', 'company'], 'sport team': ['sport'], 'company': ['organisation'], 'organisation': ['group of humans'], 'group of humans': ['human']}
+        verdict = ClassVerdictCache().verdict('football club', self.rules(), self.parents_lookup(graph, []))
+        self.assertEqual('a sport', verdict.reason['what'])
+
+    def test_equally_close_reasons_are_selected_by_class_id(self):
+        graph = {'tribe': ['sport', 'human']}
+        verdict = ClassVerdictCache().verdict('tribe', self.rules(), self.parents_lookup(graph, []))
+        self.assertEqual('a human', verdict.reason['what'])
+
+    def test_reason_for_entry_classified_in_multiple_ways(self):
+        # Q9000002 is subclass of human (Q5) through Q9000003, Q9000004 is direct subclass of sport (Q349)
+        # Q1656682 (event) is extremely broad and unspecific and is used only when nothing else matches
+        graph = {'Q9000002': ['Q9000003'], 'Q9000003': ['Q5'], 'Q9000004': ['Q349'], 'Q9000006': ['Q1656682']}
+        instances = {'Q9000001': ['Q9000002', 'Q9000004', 'Q9000006'], 'Q9000007': ['Q9000006'], 'Q9000008': ['Q9000006', 'Q9000002'], 'Q9000009': ['Q9000004', 'Q9000002']}
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches(ancestor_closure_cache=AncestorClosureCache(), class_verdict_cache=ClassVerdictCache()))
+        detector.get_direct_superclasses = lambda class_id: graph.get(class_id, [])
+        detector.get_instance_of_ids = lambda wikidata_id: instances.get(wikidata_id)
+        # the closest reason wins, regardless of order of instance of values
+        self.assertEqual('a sport', detector.get_verdict_for_entry('Q9000001').reason['what'])
+        self.assertEqual(2, detector.get_verdict_for_entry('Q9000001').distance)
+        # walking superclasses in order of instance of values reported the last reason met (a human) here
+        self.assertEqual('a sport', detector.get_verdict_for_entry('Q9000009').reason['what'])
+        self.assertEqual('an event', detector.get_verdict_for_entry('Q9000007').reason['what'])
+        self.assertEqual('a human', detector.get_verdict_for_entry('Q9000008').reason['what'])
+        self.assertEqual('a sport', detector.get_verdict_for_entry('Q9000001', frozenset(['a human'])).reason['what'])
+        self.assertEqual('an event', detector.get_verdict_for_entry('Q9000008', frozenset(['a human'])).reason['what'])
+
+    def test_clean_verdict(self):
+        graph = {'church': ['building'], 'building': ['structure']}
+        self.assertEqual(True, ClassVerdictCache().verdict('church', self.rules(), self.parents_lookup(graph, [])).is_clean())
+
+    def test_ambiguous_class_overrides_other_reasons(self):
+        graph = {'mess': ['human', 'ambiguous item']}
+        verdict = ClassVerdictCache().verdict('mess', self.rules(ambiguous=['ambiguous item']), self.parents_lookup(graph, []))
+        self.assertEqual(True, verdict.ambiguous)
+
+    def test_excluded_reasons_are_skipped(self):
+        graph = {'tribe': ['human', 'event']}
+        cache = ClassVerdictCache()
+        verdict = cache.verdict('tribe', self.rules(), self.parents_lookup(graph, []), frozenset(['a human']))
+        self.assertEqual('an event', verdict.reason['what'])
+        verdict = cache.verdict('tribe', self.rules(), self.parents_lookup(graph, []))
+        self.assertEqual('a human', verdict.reason['what'])
+
+    def test_verdict_propagates_through_cycles(self):
+        graph = {'a': ['b'], 'b': ['c'], 'c': ['a', 'sport']}
+        cache = ClassVerdictCache()
+        self.assertEqual(3, cache.verdict('a', self.rules(), self.parents_lookup(graph, [])).distance)
+        self.assertEqual(2, cache.verdict('b', self.rules(), self.parents_lookup(graph, [])).distance)
+
+    def test_change_of_rules_invalidates_verdicts(self):
+        graph = {'castle': ['trademark'], 'trademark': ['sport']}
+        cache = ClassVerdictCache()
+        self.assertEqual(False, cache.verdict('castle', self.rules(), self.parents_lookup(graph, [])).is_clean())
+        self.assertEqual(True, cache.verdict('castle', self.rules(ignored=['trademark']), self.parents_lookup(graph, [])).is_clean())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import bz2
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from wikibrain.ontology_closure_cache import AncestorClosureCache
+from wikibrain.ontology_closure_cache import ClassVerdictCache
+from wikibrain.ontology_graph import OntologyGraph
+from wikibrain.ontology_graph import build_ontology_graph
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+def claim(target, rank="normal", qualifiers=None):
+    returned = {"mainsnak": {"snaktype": "value", "property": "P", "datavalue": {"value": {"entity-type": "item", "id": target}, "type": "wikibase-entityid"}}, "rank": rank}
+    if qualifiers != None:
+        returned["qualifiers"] = qualifiers
+    return returned
+
+
+def no_value_claim():
+    return {"mainsnak": {"snaktype": "novalue", "property": "P"}, "rank": "normal"}
+
+
+def entity(wikidata_id, instance_of=(), subclass_of=()):
+    return {"type": "item", "id": wikidata_id, "claims": {"P31": list(instance_of), "P279": list(subclass_of)}}
+
+
+def fixture_entities():
+    return [
+        # some church, instance of church building
+        entity("Q1001", instance_of=[claim("Q16970"), claim("Q9999", rank="deprecated")]),
+        # church building
+        entity("Q16970", subclass_of=[claim("Q24398318"), claim("Q5"), claim("Q2", qualifiers={"P2241": []})]),
+        # religious building
+        entity("Q24398318", subclass_of=[claim("Q41176"), no_value_claim()]),
+        # building
+        entity("Q41176", subclass_of=[claim("Q811979")]),
+        # architectural structure
+        entity("Q811979", subclass_of=[claim("Q41176")]),
+        # property, is not part of the graph
+        {"type": "property", "id": "P31", "claims": {"P31": [claim("Q18616576")]}},
+        # entity without any ontology data
+        entity("Q64"),
+    ]
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_dump(self, filename, opener, entities=None):
+        if entities == None:
+            entities = fixture_entities()
+        path = os.path.join(self.directory, filename)
+        with opener(path, "wt", encoding="utf-8") as dump:
+            dump.write("[\n")
+            lines = [json.dumps(entry) for entry in entities]
+            dump.write(",\n".join(lines))
+            dump.write("\n]\n")
+        return path
+
+    def build(self, filename="latest-all.json.gz", opener=gzip.open):
+        dump_path = self.write_dump(filename, opener)
+        graph_path = os.path.join(self.directory, "ontology.graph")
+        build_ontology_graph(dump_path, graph_path)
+        return OntologyGraph(graph_path)
+
+    def test_graph_contains_edges_from_dump(self):
+        graph = self.build()
+        self.assertEqual(["Q16970"], graph.instance_of_ids("Q1001"))
+        self.assertEqual(["Q24398318", "Q5"], graph.direct_superclasses("Q16970"))
+        self.assertEqual(["Q41176"], graph.direct_superclasses("Q24398318"))
+        self.assertEqual(["Q41176"], graph.direct_superclasses("Q811979"))
+
+    def test_entities_without_ontology_data_are_skipped(self):
+        graph = self.build()
+        self.assertEqual(5, graph.node_count)
+        self.assertEqual(False, "Q64" in graph)
+        self.assertEqual(None, graph.instance_of_ids("Q64"))
+        self.assertEqual([], graph.direct_superclasses("Q64"))
+        self.assertEqual(None, graph.instance_of_ids("P31"))
+
+    def test_supported_dump_compressions(self):
+        for filename, opener in [("dump.json.bz2", bz2.open), ("dump.json", open)]:
+            graph = self.build(filename, opener)
+            self.assertEqual(["Q16970"], graph.instance_of_ids("Q1001"))
+
+    def test_graph_is_sorted_externally_with_bounded_buffer(self):
+        dump_path = self.write_dump("dump.json", open, list(reversed(fixture_entities())))
+        graph_path = os.path.join(self.directory, "ontology.graph")
+        self.assertEqual(5, build_ontology_graph(dump_path, graph_path, records_in_memory=2))
+        graph = OntologyGraph(graph_path)
+        self.assertEqual(["Q16970"], graph.instance_of_ids("Q1001"))
+        self.assertEqual(["Q24398318", "Q5"], graph.direct_superclasses("Q16970"))
+        self.assertEqual(["Q41176"], graph.direct_superclasses("Q811979"))
+        self.assertEqual(None, graph.instance_of_ids("Q16970"))
+        self.assertEqual(["ontology.graph", "dump.json"], sorted(os.listdir(self.directory), reverse=True))
+
+    def test_invalid_file_is_rejected(self):
+        path = os.path.join(self.directory, "not_a_graph")
+        with open(path, "wb") as file:
+            file.write(b"something else entirely, not a graph")
+        with self.assertRaises(ValueError):
+            OntologyGraph(path)
+
+    def test_detector_classifies_entries_without_network_access(self):
+        graph = self.build()
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches(ancestor_closure_cache=AncestorClosureCache(), class_verdict_cache=ClassVerdictCache(), ontology_graph=graph))
+        classifying = detector.wikidata_entries_classifying_entry("Q1001")
+        for expected in ["Q1001", "Q16970", "Q24398318", "Q41176", "Q811979", "Q5"]:
+            self.assertIn(expected, classifying)
+        with_depth = detector.wikidata_entries_classifying_entry_with_depth_data("Q1001")
+        self.assertIn({"id": "Q41176", "depth": 2}, with_depth)
+        self.assertIn({"id": "Q16970", "depth": 0}, with_depth)
+        # church building is claimed to be a subclass of human
+        self.assertEqual("a human", detector.get_verdict_for_entry("Q1001").reason['what'])
+
+
+if __name__ == '__main__':
+    unittest.main()
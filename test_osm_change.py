@@ -0,0 +1,81 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from wikibrain.osm_change import DeltaProcessor
+from wikibrain.osm_change import ReportSet
+from wikibrain.osm_change import iterate_changes
+from wikibrain.osm_change import update_reports
+from wikibrain.verdict_cache import TagSetVerdictCache
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+CHANGES = b"""<?xml version="1.0" encoding="UTF-8"?>
+<osmChange version="0.6">
+  <create>
+    <node id="1" version="1" lat="51.5" lon="-0.07">
+      <tag k="bridge:wikipedia" v="en:Tower Bridge"/>
+      <tag k="name" v="Tower Bridge"/>
+    </node>
+    <node id="2" version="1" lat="51.0" lon="0.0"/>
+    <node id="3" version="1" lat="52.0" lon="1.0"/>
+  </create>
+  <modify>
+    <way id="10" version="2">
+      <nd ref="2"/>
+      <nd ref="3"/>
+      <tag k="bridge:wikipedia" v="en:Tower Bridge"/>
+    </way>
+    <node id="4" version="3" lat="50.0" lon="20.0">
+      <tag k="name" v="wikipedia tag removed"/>
+    </node>
+  </modify>
+  <delete>
+    <node id="5" version="2" lat="50.0" lon="20.0"/>
+  </delete>
+</osmChange>
+"""
+
+
+def report(link, location=(50.0, 20.0)):
+    return {"osm_object_url": link, "error_id": "old problem", "location": location}
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches(tag_set_verdict_cache=TagSetVerdictCache()))
+
+    def test_changes_are_streamed_with_actions(self):
+        changes = [(action, element.tag, element.attrib["id"]) for action, element in iterate_changes(io.BytesIO(CHANGES))]
+        self.assertEqual([("create", "node", "1"), ("create", "node", "2"), ("create", "node", "3"), ("modify", "way", "10"), ("modify", "node", "4"), ("delete", "node", "5")], changes)
+
+    def test_report_set_is_updated(self):
+        unrelated = report("https://www.openstreetmap.org/node/99")
+        report_set = ReportSet([unrelated, report("https://www.openstreetmap.org/node/4"), report("https://www.openstreetmap.org/node/5")])
+        processor = DeltaProcessor(self.detector, report_set)
+        processor.process(io.BytesIO(CHANGES))
+        self.assertEqual((2, 3, 2, 2), (processor.checked, processor.skipped, processor.reported, processor.dropped))
+        reports = report_set.reports
+        self.assertEqual(["https://www.openstreetmap.org/node/99", "https://www.openstreetmap.org/node/1", "https://www.openstreetmap.org/way/10"], list(reports))
+        self.assertEqual(unrelated, reports["https://www.openstreetmap.org/node/99"])
+        self.assertEqual("bridge:wikipedia - move to bridge outline", reports["https://www.openstreetmap.org/node/1"]["error_id"])
+        # way located using nodes from the same diff
+        self.assertEqual((51.5, 0.5), reports["https://www.openstreetmap.org/way/10"]["location"])
+
+    def test_reports_are_updated_in_place(self):
+        directory = tempfile.mkdtemp()
+        try:
+            reports = os.path.join(directory, "reports.yaml")
+            changes = os.path.join(directory, "changes.osc")
+            with open(changes, "wb") as changes_file:
+                changes_file.write(CHANGES)
+            ReportSet([report("https://www.openstreetmap.org/node/5")]).save(reports)
+            update_reports(reports, changes, self.detector)
+            self.assertEqual(["https://www.openstreetmap.org/node/1", "https://www.openstreetmap.org/way/10"], list(ReportSet.load(reports).reports))
+            self.assertEqual([], [name for name in os.listdir(directory) if ".tmp" in name])
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+from wikimedia_connection import wikimedia_connection
+from wikibrain.parallel_evaluation import HostConcurrencyLimiter
+from wikibrain.parallel_evaluation import ParallelElementEvaluator
+from wikibrain.parallel_evaluation import SharedWikimediaCache
+from wikibrain.parallel_evaluation import SingleFlightCache
+
+
+class FakeDetector:
+    def get_problem_for_given_element(self, element):
+        time.sleep(random.random() / 100)
+        return "report for " + element
+
+    def get_problem_for_given_tags(self, tags, object_type, object_description):
+        return tags.get("wikidata")
+
+
+def run_in_threads(count, function):
+    threads = [threading.Thread(target=function) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class Tests(unittest.TestCase):
+    def test_concurrent_requests_for_the_same_key_are_computed_once(self):
+        cache = SingleFlightCache()
+        computed = []
+        results = []
+
+        def compute():
+            computed.append(1)
+            time.sleep(0.05)
+            return "Q42 data"
+
+        run_in_threads(8, lambda: results.append(cache.get_or_compute("Q42", compute)))
+        self.assertEqual(1, len(computed))
+        self.assertEqual(["Q42 data"] * 8, results)
+
+    def test_none_is_cached(self):
+        cache = SingleFlightCache()
+        computed = []
+        cache.get_or_compute("Q0", lambda: computed.append(1))
+        cache.get_or_compute("Q0", lambda: computed.append(1))
+        self.assertEqual(1, len(computed))
+
+    def test_failures_are_not_cached(self):
+        cache = SingleFlightCache()
+
+        def fail():
+            raise ValueError("failed")
+        with self.assertRaises(ValueError):
+            cache.get_or_compute("Q42", fail)
+        self.assertEqual("data", cache.get_or_compute("Q42", lambda: "data"))
+
+    def test_requests_per_host_are_limited(self):
+        limiter = HostConcurrencyLimiter(requests_per_host=2)
+        lock = threading.Lock()
+        running = {"count": 0, "maximum": 0}
+
+        def download(url):
+            with lock:
+                running["count"] += 1
+                running["maximum"] = max(running["maximum"], running["count"])
+            time.sleep(0.02)
+            with lock:
+                running["count"] -= 1
+        limited = limiter.wrap(download)
+        run_in_threads(10, lambda: limited("https://www.wikidata.org/w/api.php?action=wbgetentities&ids=Q42"))
+        self.assertEqual(2, running["maximum"])
+
+    def test_reports_are_returned_in_input_order(self):
+        elements = ["element " + str(index) for index in range(100)]
+        reports = ParallelElementEvaluator(FakeDetector(), thread_count=8).evaluate(elements)
+        self.assertEqual(["report for " + element for element in elements], reports)
+
+    def test_tags_may_be_evaluated(self):
+        entries = [({"wikidata": "Q" + str(index)}, "node", "description") for index in range(20)]
+        reports = ParallelElementEvaluator(FakeDetector(), thread_count=4).evaluate_tags(entries)
+        self.assertEqual(["Q" + str(index) for index in range(20)], reports)
+
+    def test_shared_cache_deduplicates_wikidata_requests(self):
+        location = tempfile.mkdtemp()
+        downloaded = []
+
+        def download(url, timeout=360):
+            downloaded.append(url)
+            time.sleep(0.05)
+            return wikimedia_connection.UrlResponse(b'{"entities": {"Q42": {"id": "Q42"}}, "success": 1}', 200)
+
+        try:
+            wikimedia_connection.set_cache_location(location)
+            with unittest.mock.patch.object(wikimedia_connection, "download", download):
+                with SharedWikimediaCache():
+                    run_in_threads(8, lambda: wikimedia_connection.get_data_from_wikidata_by_id("Q42"))
+                    # also calls made within wikimedia_connection use shared cache
+                    self.assertEqual(None, wikimedia_connection.get_property_from_wikidata("Q42", "P31"))
+                self.assertEqual(download, wikimedia_connection.download)
+        finally:
+            shutil.rmtree(location)
+        self.assertEqual(1, len(downloaded))
+
+
+if __name__ == '__main__':
+    unittest.main()
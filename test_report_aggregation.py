@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+import yaml
+from wikibrain.country_lookup import CountryIndex
+from wikibrain.report_aggregation import ReportAggregator
+from wikibrain.report_aggregation import SpaceSavingCounter
+from wikibrain.report_aggregation import country_lookup_by_location
+from wikibrain.report_aggregation import linked_wikidata_ids
+from wikibrain.wikimedia_link_issue_reporter import ErrorReport
+
+
+def report(error_id, wikidata_id, location=(50.5, 19.5)):
+    problem = ErrorReport(error_id=error_id, error_message="message", prerequisite={"wikidata": wikidata_id})
+    problem.location = location
+    problem.tags = {"wikidata": wikidata_id, "brand:wikidata": "Q100"}
+    return problem
+
+
+class Tests(unittest.TestCase):
+    def test_linked_wikidata_ids(self):
+        self.assertEqual(["Q1", "Q100"], linked_wikidata_ids(report("x", "Q1").data()))
+
+    def test_frequent_values_are_kept_by_bounded_counter(self):
+        counter = SpaceSavingCounter(3)
+        for value in ["Q1"] * 50 + ["Q" + str(number) for number in range(2, 40)] + ["Q2"] * 20:
+            counter.add(value)
+        self.assertEqual(3, len(counter.counters))
+        top = counter.top(2)
+        self.assertEqual(["Q1", "Q2"], [value for value, _, _ in top])
+        for value, count, error in top:
+            self.assertLessEqual(count - error, {"Q1": 50, "Q2": 21}[value])
+            self.assertGreaterEqual(count, {"Q1": 50, "Q2": 21}[value])
+
+    def test_reports_are_aggregated_while_passing_through(self):
+        index = CountryIndex()
+        index.add_polygon("Q36", [[(14.0, 49.0), (24.0, 49.0), (24.0, 55.0), (14.0, 55.0)]])
+        aggregator = ReportAggregator(top_k=1, sample_size=2, country_of=country_lookup_by_location(index), seed=1)
+        reports = [report("link to a disambiguation page", "Q" + str(number % 3)) for number in range(100)]
+        reports += [report("wikipedia tag links to 404", "Q7", location=(None, None))]
+        self.assertEqual(reports, list(aggregator.observe(reports)))
+        statistics = aggregator.statistics()
+        self.assertEqual(101, statistics["total"])
+        self.assertEqual(["link to a disambiguation page", "wikipedia tag links to 404"], list(statistics["error_classes"]))
+        disambig = statistics["error_classes"]["link to a disambiguation page"]
+        self.assertEqual(100, disambig["count"])
+        self.assertEqual("Q100", disambig["top_wikidata_ids"][0]["wikidata"])
+        self.assertEqual(2, len(disambig["examples"]))
+        self.assertEqual({"Q36": 100, "None": 1}, statistics["countries"])
+        self.assertIn("100 link to a disambiguation page", aggregator.summary())
+
+    def test_statistics_are_written(self):
+        directory = tempfile.mkdtemp()
+        try:
+            aggregator = ReportAggregator()
+            aggregator.add_all([report("wikipedia tag links to 404", "Q7"), report("wikipedia tag links to 404", "Q7").data()])
+            filepath = os.path.join(directory, "statistics.yaml")
+            aggregator.write_statistics(filepath)
+            with open(filepath) as infile:
+                loaded = yaml.load(infile, Loader=yaml.FullLoader)
+            self.assertEqual(2, loaded["error_classes"]["wikipedia tag links to 404"]["count"])
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
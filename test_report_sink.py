@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+import yaml
+from wikibrain.report_sink import iterate_reports
+from wikibrain.report_sink import open_report_sink
+from wikibrain.wikimedia_link_issue_reporter import ErrorReport
+
+
+def report(number):
+    problem = ErrorReport(
+        error_id="wikipedia tag links to 404",
+        error_message="message\nin two lines: " + str(number),
+        prerequisite={"wikipedia": "pl:Kraków"},
+        proposed_tagging_changes=[{"from": {"wikipedia": "pl:Kraków"}, "to": {"wikipedia": None}}],
+    )
+    problem.osm_object_url = "https://www.openstreetmap.org/node/" + str(number)
+    problem.location = (50.06, 19.94)
+    problem.tags = {"wikipedia": "pl:Kraków", "name": "- not a list entry"}
+    return problem
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_reports_survive_round_trip_in_all_formats(self):
+        reports = [report(number) for number in range(5)]
+        for extension in [".yaml", ".jsonl", ".csv"]:
+            filepath = os.path.join(self.directory, "reports" + extension)
+            with open_report_sink(filepath, buffer_size=2) as sink:
+                sink.write_all(reports)
+                sink.write(reports[0].data())
+            self.assertEqual([problem.data() for problem in reports + reports[:1]], list(iterate_reports(filepath)), extension)
+        with open(os.path.join(self.directory, "reports.yaml")) as infile:
+            self.assertEqual(6, len(yaml.load(infile, Loader=yaml.FullLoader)))
+
+    def test_output_of_yaml_output_is_readable(self):
+        filepath = os.path.join(self.directory, "reports.yaml")
+        for number in range(3):
+            report(number).yaml_output(filepath)
+        self.assertEqual([report(number).data() for number in range(3)], list(iterate_reports(filepath)))
+
+    def test_failed_writing_leaves_previous_file(self):
+        filepath = os.path.join(self.directory, "reports.jsonl")
+        with open_report_sink(filepath) as sink:
+            sink.write(report(1))
+        with self.assertRaises(KeyError):
+            with open_report_sink(filepath, buffer_size=1) as sink:
+                sink.write(report(2))
+                raise KeyError("failure during run")
+        self.assertEqual([report(1).data()], list(iterate_reports(filepath)))
+        self.assertEqual(["reports.jsonl"], os.listdir(self.directory))
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            open_report_sink(os.path.join(self.directory, "reports.txt"))
+
+if __name__ == '__main__':
+    unittest.main()
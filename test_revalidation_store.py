@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+from wikibrain.revalidation_store import IncrementalValidator
+from wikibrain.revalidation_store import RevalidationStore
+from wikibrain.verdict_cache import TagSetVerdictCache
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+class FakeProjections:
+    def __init__(self, revisions):
+        self.revisions = revisions
+
+    def entity(self, wikidata_id, forced_refresh=False):
+        return {"id": wikidata_id, "lastrevid": self.revisions[wikidata_id]}
+
+    def property(self, wikidata_id, property, forced_refresh=False):
+        return None
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = RevalidationStore(os.path.join(self.directory, "results.sqlite"))
+        self.revisions = {"Q5": 1}
+        self.detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches(tag_set_verdict_cache=TagSetVerdictCache()))
+        self.detector.entity_projection_cache = FakeProjections(self.revisions)
+        original = self.detector.get_problem_based_on_bridge_prefixed_tags
+
+        def consulting_wikidata(tags):
+            self.detector.wikidata_property("Q5", "P31")
+            return original(tags)
+        self.detector.get_problem_based_on_bridge_prefixed_tags = consulting_wikidata
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def entries(self, name="bridge"):
+        return [
+            ("way/1", {"bridge:wikipedia": "en:Tower Bridge", "name": name}, (51.5, -0.07), "way", "fake test object"),
+            ("node/2", {"name": "no links at all"}, (51.5, -0.07), "node", "fake test object"),
+        ]
+
+    def summary(self, results):
+        return [(element_id, None if problem == None else problem.data()) for element_id, problem in results]
+
+    def test_consulted_entities_are_recorded_also_for_memoized_verdicts(self):
+        tags = {"bridge:wikipedia": "en:Tower Bridge"}
+        for _ in range(2):
+            problem, consulted = self.detector.get_problem_and_consulted_entities_generic(tags, None, "way", "fake test object")
+            self.assertEqual("bridge:wikipedia - move to bridge outline", problem.error_id)
+            self.assertEqual({"Q5"}, consulted)
+
+    def test_unchanged_elements_are_not_checked_again(self):
+        expected = self.summary(IncrementalValidator(self.detector, self.store).run(self.entries()))
+        self.assertEqual(2, len(self.store))
+        validator = IncrementalValidator(self.detector, self.store)
+        self.assertEqual(expected, self.summary(validator.run(self.entries())))
+        self.assertEqual((0, 2), (validator.evaluated, validator.reused))
+
+        validator = IncrementalValidator(self.detector, self.store)
+        validator.run(self.entries(name="renamed bridge"))
+        self.assertEqual((1, 1), (validator.evaluated, validator.reused))
+
+    def test_changed_entity_and_rules_cause_new_check(self):
+        IncrementalValidator(self.detector, self.store).run(self.entries())
+        validator = IncrementalValidator(self.detector, self.store, revisions_of=lambda wikidata_ids: {"Q5": 2})
+        validator.run(self.entries())
+        self.assertEqual((1, 1), (validator.evaluated, validator.reused))
+
+        self.detector.rules_version = "other"
+        validator = IncrementalValidator(self.detector, self.store)
+        validator.run(self.entries())
+        self.assertEqual((2, 0), (validator.evaluated, validator.reused))
+
+    def test_dissolved_brands_are_consulted_entities(self):
+        self.revisions["Q6746"] = 7
+        original = self.detector.get_problem_based_on_bridge_prefixed_tags
+
+        def checking_brand(tags):
+            self.detector.get_dissolved_brands(["Q6746"])
+            return original(tags)
+        self.detector.get_problem_based_on_bridge_prefixed_tags = checking_brand
+        problem, consulted = self.detector.get_problem_and_consulted_entities_generic({"bridge:wikipedia": "en:Tower Bridge"}, None, "way", "fake test object")
+        self.assertEqual({"Q5", "Q6746"}, consulted)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+import urllib.parse
+from wikimedia_connection import wikimedia_connection
+from wikibrain import cache_store
+from wikibrain import entity_projection
+from wikibrain.country_lookup import CountryIndex
+from wikibrain.country_lookup import load_country_index
+from wikibrain.sharded_runner import ShardedRunner
+from wikibrain.sharded_runner import entry_of_element
+from wikibrain.sharded_runner import shards_of
+from wikibrain.sharded_runner import write_to_file_atomically
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+def write_many_times(filename, content):
+    for _ in range(200):
+        write_to_file_atomically(filename, content, 'w')
+
+
+def square(min_lon, min_lat, max_lon, max_lat):
+    return [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+
+
+# simplified, not real boundaries
+FEATURES = {
+    "type": "FeatureCollection",
+    "features": [
+        {"type": "Feature", "properties": {"wikidata": "Q36", "name": "Polska"}, "geometry": {"type": "Polygon", "coordinates": [square(14, 49, 24, 55)]}},
+        {"type": "Feature", "properties": {"wikidata": "Q183", "name": "Deutschland"}, "geometry": {"type": "Polygon", "coordinates": [square(6, 47, 14, 55)]}},
+    ]
+}
+
+
+# stubbed Wikidata, object without country which has both Polish and German article
+ENTITY = {"type": "item", "id": "Q10", "labels": {}, "claims": {}, "sitelinks": {"plwiki": {"site": "plwiki", "title": "Obiekt"}, "dewiki": {"site": "dewiki", "title": "Objekt"}}}
+
+
+def stubbed_download(url, timeout=360):
+    parameters = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+    if parameters.get("ids") == ["Q10"] or parameters.get("titles") in [["Obiekt"], ["Objekt"]]:
+        response = {"entities": {"Q10": ENTITY}, "success": 1}
+        return wikimedia_connection.UrlResponse(json.dumps(response).encode("utf-8"), 200)
+    raise AssertionError("unexpected download of " + url)
+
+
+class FakeCoords:
+    def __init__(self, lat, lon):
+        self.lat = lat
+        self.lon = lon
+
+
+class FakeXmlElement:
+    tag = "node"
+
+
+class FakeElement:
+    def __init__(self, osm_id, tags, lat, lon):
+        self.osm_id = osm_id
+        self.tags = tags
+        self.coords = FakeCoords(lat, lon)
+
+    def get_tag_dictionary(self):
+        return self.tags
+
+    def get_tag_value(self, key):
+        return self.tags.get(key)
+
+    def get_link(self):
+        return "https://www.openstreetmap.org/node/" + str(self.osm_id)
+
+    def get_coords(self):
+        return self.coords
+
+    def get_element(self):
+        return FakeXmlElement()
+
+
+class Tests(unittest.TestCase):
+    # checks that can be done without fetching any data
+    cases = [
+        ({"wikidata": "Saturn"}, "node", "fake test object"),
+        ({"wikipedia": "https://wikipedia.org/wiki/Article"}, "way", "fake test object"),
+        ({"name:etymology:wikipedia": "https://de.wikipedia.org/wiki/Konrad_Wirnhier"}, "node", "fake test object"),
+        ({"wikidata:note": "gibberish"}, "relation", "fake test object"),
+        ({"operator:wikidata": "#"}, "node", "fake test object"),
+        ({"name": "no links at all"}, "node", "fake test object"),
+    ]
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_shards_cover_all_entries_in_order(self):
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6]], list(shards_of(range(7), 3)))
+
+    def test_results_are_merged_in_input_order(self):
+        entries = self.cases * 5
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector()
+        expected = []
+        for tags, object_type, object_description in entries:
+            problem = detector.get_problem_for_given_tags(tags, object_type, object_description)
+            expected.append(None if problem == None else problem.data())
+        runner = ShardedRunner(process_count=3, shard_size=4, cache_location=self.location, mp_context=multiprocessing.get_context("spawn"))
+        problems = runner.run([(tags, None, object_type, object_description) for tags, object_type, object_description in entries])
+        self.assertEqual(expected, [None if problem == None else problem.data() for problem in problems])
+
+    def test_results_depend_on_location_like_for_single_element(self):
+        path = os.path.join(self.location, "countries.geojson")
+        with open(path, "w") as file:
+            json.dump(FEATURES, file)
+        detector_arguments = {"expected_language_code": "pl", "caches": DetectorCaches(country_index=load_country_index(path))}
+        tags = {"wikipedia": "de:Objekt", "wikidata": "Q10"}
+        # German article is fine in Germany, not in Poland
+        elements = [FakeElement(1, tags, 52.5, 13.4), FakeElement(2, tags, 52.2, 21.0), FakeElement(3, tags, 52.4, 13.5)]
+        wikimedia_connection.set_cache_location(self.location)
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(**detector_arguments)
+        # workers are forked, so they also use stubbed download
+        with unittest.mock.patch.object(wikimedia_connection, "download", stubbed_download):
+            expected = []
+            for element in elements:
+                problem = detector.get_problem_for_given_element(element)
+                expected.append(None if problem == None else problem.data())
+            runner = ShardedRunner(process_count=2, shard_size=1, cache_location=self.location, detector_arguments=detector_arguments, mp_context=multiprocessing.get_context("fork"))
+            problems = runner.run([entry_of_element(detector, element) for element in elements])
+        self.assertEqual([None, "wikipedia tag unexpected language", None], [None if problem == None else problem["error_id"] for problem in expected])
+        self.assertEqual(expected, [None if problem == None else problem.data() for problem in problems])
+
+    def test_workers_use_cache_store_of_detector(self):
+        path = os.path.join(self.location, "cache.sqlite")
+        with cache_store.SqliteCacheStore(path) as store:
+            runner = ShardedRunner(process_count=1, cache_location=self.location, detector_arguments={"cache_store": store, "expected_language_code": "pl"})
+            self.assertEqual(path, runner.cache_store_path)
+            self.assertEqual({"expected_language_code": "pl"}, runner.detector_arguments)
+            problems = runner.run([(tags, None, object_type, object_description) for tags, object_type, object_description in self.cases])
+        self.assertEqual(len(self.cases), len(problems))
+
+    def test_caches_passed_to_workers_keep_only_data_sources(self):
+        index = CountryIndex()
+        caches = pickle.loads(pickle.dumps(DetectorCaches.private(country_index=index)))
+        self.assertEqual(index.cell_size, caches.country_index.cell_size)
+        self.assertEqual(None, caches.ontology_graph)
+        self.assertIs(entity_projection.shared_entity_projection_cache, caches.entity_projection_cache)
+
+    def test_concurrent_writes_leave_complete_file(self):
+        filename = os.path.join(self.location, "Q42.wikidata_entity.txt")
+        contents = ["a" * 100000, "b" * 100000]
+        processes = [multiprocessing.Process(target=write_many_times, args=(filename, content)) for content in contents]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertIn(wikimedia_connection.get_entire_file_content(filename), contents)
+        self.assertEqual(["Q42.wikidata_entity.txt"], os.listdir(self.location))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+from wikimedia_connection import wikimedia_connection
+from wikibrain.entity_projection import EntityProjectionCache
+from wikibrain.sitelink_index import SitelinkIndex
+from wikibrain.sitelink_index import best_interwiki_link
+from wikibrain.sitelink_index import interwiki_rank_map
+from wikibrain.wikipedia_knowledge import WikipediaKnowledge
+
+
+def entity(wikidata_id, sitelinks):
+    return {"type": "item", "id": wikidata_id, "labels": {}, "claims": {}, "sitelinks": {site: {"site": site, "title": title, "badges": []} for site, title in sitelinks.items()}}
+
+
+ENTITIES = {
+    "Q1492": entity("Q1492", {"cawiki": "Barcelona", "dewiki": "Barcelona (Spanien)", "plwiki": "Barcelona", "commonswiki": "Category:Barcelona"}),
+    "Q2": entity("Q2", {"yowiki": "Ayé", "zh_min_nanwiki": "Tē-kiû"}),
+    "Q3": entity("Q3", {}),
+}
+
+
+def legacy_best_link(wikidata_id, languages_ordered_by_preference):
+    # the original approach, one lookup per language
+    for language_code in languages_ordered_by_preference + WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance():
+        if language_code != None:
+            title = wikimedia_connection.get_interwiki_article_name_by_id(wikidata_id, language_code)
+            if title != None:
+                return language_code + ':' + title
+    return None
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        wikimedia_connection.set_cache_location(self.location)
+        self.downloaded = []
+
+        def download(url, timeout=360):
+            self.downloaded.append(url)
+            wikidata_id = url.split("ids=")[1].split("&")[0]
+            response = {"entities": {wikidata_id: ENTITIES[wikidata_id]}, "success": 1}
+            return wikimedia_connection.UrlResponse(json.dumps(response).encode("utf-8"), 200)
+        self.patch = unittest.mock.patch.object(wikimedia_connection, "download", download)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(self.location)
+
+    def test_first_occurrence_of_language_decides_rank(self):
+        rank_map = interwiki_rank_map(["pl", None, "de"], ["en", "de", "pl", "fr"])
+        self.assertEqual({"plwiki": (0, "pl"), "dewiki": (1, "de"), "enwiki": (2, "en"), "frwiki": (3, "fr")}, rank_map)
+        self.assertEqual("de:B", best_interwiki_link({"frwiki": "F", "dewiki": "B", "commonswiki": "C"}, rank_map))
+        self.assertEqual(None, best_interwiki_link({"commonswiki": "C"}, rank_map))
+
+    def test_best_link_matches_lookup_per_language(self):
+        for preferences in [[], ["pl"], ["ca", "pl"], [None, "yo"]]:
+            index = SitelinkIndex(entity_projection_cache=EntityProjectionCache())
+            rank_map = interwiki_rank_map(preferences, WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance())
+            for wikidata_id in ENTITIES:
+                self.assertEqual(legacy_best_link(wikidata_id, preferences), index.best_link(wikidata_id, tuple(preferences), rank_map))
+        self.assertEqual(None, index.best_link(None, (), rank_map))
+
+    def test_best_link_is_memoized_per_preference_profile(self):
+        index = SitelinkIndex(entity_projection_cache=EntityProjectionCache())
+        all_languages = WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance()
+        self.assertEqual("de:Barcelona (Spanien)", index.best_link("Q1492", (), interwiki_rank_map([], all_languages)))
+        self.assertEqual("pl:Barcelona", index.best_link("Q1492", ("pl",), interwiki_rank_map(["pl"], all_languages)))
+        self.assertEqual("de:Barcelona (Spanien)", index.best_link("Q1492", (), interwiki_rank_map([], all_languages)))
+        self.assertEqual(1, index.hits)
+        self.assertEqual(1, len(self.downloaded))
+
+
+if __name__ == '__main__':
+    unittest.main()
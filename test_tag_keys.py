@@ -0,0 +1,41 @@
+import unittest
+from wikibrain.tag_keys import ParsedKeys
+from wikibrain.tag_keys import kind_of_key
+import wikibrain.wikimedia_link_issue_reporter
+
+
+class Tests(unittest.TestCase):
+    def test_keys_are_grouped_in_order_of_tags(self):
+        tags = {
+            "name": "Tower Bridge",
+            "wikipedia": "en:Tower Bridge",
+            "brand:wikidata": "Q1",
+            "wikidata": "Q2",
+            "brand:wikipedia": "en:Brand",
+            "wikipedia:de": "Tower Bridge",
+            "not:brand:wikidata": "Q3",
+            "not:name": "London Bridge",
+        }
+        parsed = ParsedKeys(tags)
+        self.assertEqual(["wikipedia", "brand:wikidata", "wikidata", "brand:wikipedia", "wikipedia:de", "not:brand:wikidata"], [kind.key for kind in parsed.linked_keys])
+        self.assertEqual(["wikipedia", "wikidata"], parsed.primary_keys)
+        self.assertEqual(["brand:wikidata", "brand:wikipedia", "not:brand:wikidata"], parsed.prefixed_secondary_keys)
+        self.assertEqual(["wikipedia:de"], parsed.old_style_wikipedia_keys)
+        self.assertEqual([("not:brand:wikidata", "brand:wikidata"), ("not:name", "name")], [(kind.key, negated) for kind, negated in parsed.negated_keys])
+        self.assertEqual([("brand:wikidata", "brand:wikipedia"), ("wikidata", "wikipedia")], parsed.paired_keys)
+
+    def test_kinds_of_keys_are_shared(self):
+        self.assertIs(kind_of_key("operator:wikidata"), kind_of_key("operator:wikidata"))
+        self.assertEqual("operator:wikipedia", kind_of_key("operator:wikidata").paired_wikipedia_key)
+        self.assertEqual(None, kind_of_key("operator:wikipedia").paired_wikipedia_key)
+
+    def test_structural_checks_use_parsed_keys(self):
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector()
+        self.assertEqual(["wikipedia:de", "brand:wikipedia:en"], detector.get_old_style_wikipedia_keys({"wikipedia:de": "Berlin", "name": "x", "brand:wikipedia:en": "Brand"}))
+        problem = detector.get_problem_based_on_not_prefixed_tags("fake test object", {"operator:wikidata": "Q1", "not:operator:wikidata": "Q1"})
+        self.assertEqual("wikipedia/wikidata type tag that is incorrect according to not:* tag", problem.error_id)
+        self.assertNotEqual(None, detector.critical_structural_issue_report('node', {'operator:wikidata': '#'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import copy
+import pickle
+import unittest
+from wikibrain.text_catalog import TextCatalog
+from wikibrain.wikimedia_link_issue_reporter import ErrorReport
+
+
+class FakeElement:
+    def __init__(self, tags):
+        self.tags = tags
+
+    def get_tag_dictionary(self):
+        return dict(self.tags)
+
+    def get_link(self):
+        return "https://www.openstreetmap.org/node/1"
+
+    def get_coords(self):
+        return None
+
+
+def report(instructions="Wikidata claims that this object no longer exists."):
+    problem = ErrorReport(error_id="no longer existing object", error_message="message", error_general_intructions=instructions, prerequisite={"wikidata": "Q1"}, proposed_tagging_changes=[{"from": {"wikidata": "Q1"}, "to": {"wikidata": None}}])
+    problem.bind_to_element(FakeElement({"wikidata": "Q1", "name": "Kraków", "description": "x" * 100}))
+    return problem
+
+
+class Tests(unittest.TestCase):
+    def test_catalog_stores_each_text_once(self):
+        catalog = TextCatalog()
+        self.assertEqual(catalog.id_of("instructions"), catalog.id_of("instruc" + "tions"))
+        self.assertNotEqual(catalog.id_of("instructions"), catalog.id_of("other"))
+        self.assertEqual(None, catalog.id_of(None))
+        self.assertEqual("other", catalog.text(catalog.id_of("other")))
+        self.assertEqual(2, len(catalog))
+
+    def test_data_is_unchanged(self):
+        self.assertEqual({
+            "error_id": "no longer existing object",
+            "error_message": "message",
+            "error_general_intructions": "Wikidata claims that this object no longer exists.",
+            "debug_log": None,
+            "osm_object_url": "https://www.openstreetmap.org/node/1",
+            "proposed_tagging_changes": [{"from": {"wikidata": "Q1"}, "to": {"wikidata": None}}],
+            "extra_data": None,
+            "prerequisite": {"wikidata": "Q1"},
+            "location": (None, None),
+            "tags": {"wikidata": "Q1", "name": "Kraków", "description": "x" * 100},
+        }, report().data())
+        self.assertEqual(None, ErrorReport(error_id="unbound").data()["tags"])
+
+    def test_reports_are_compact(self):
+        first, second = report(), report("Wikidata claims that this object no longer " + "exists.")
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIs(first.error_id, second.error_id)
+        self.assertEqual(first.instructions_id, second.instructions_id)
+
+    def test_tags_of_report_can_be_changed(self):
+        problem = report()
+        problem.tags["name"] = "changed"
+        problem.tags.update({"wikidata": "Q2"})
+        self.assertEqual("changed", problem.data()["tags"]["name"])
+        self.assertEqual("Q2", problem.data()["tags"]["wikidata"])
+        # serialized tags are a copy
+        problem.data()["tags"]["name"] = "not saved"
+        self.assertEqual("changed", problem.tags["name"])
+
+    def test_reports_are_copied_and_pickled_with_texts(self):
+        problem = report()
+        problem.error_id = "changed " + "error id"
+        for copied in [copy.deepcopy(problem), pickle.loads(pickle.dumps(problem))]:
+            self.assertEqual(problem.data(), copied.data())
+        state = problem.__getstate__()
+        self.assertEqual("Wikidata claims that this object no longer exists.", state["error_general_intructions"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+from wikibrain.verdict_cache import RecordingTags
+from wikibrain.verdict_cache import TagSetVerdictCache
+from wikibrain.wikimedia_link_issue_reporter import DetectorCaches
+import wikibrain.wikimedia_link_issue_reporter
+
+
+class Tests(unittest.TestCase):
+    def detector(self, cache, **arguments):
+        detector = wikibrain.wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(caches=DetectorCaches(tag_set_verdict_cache=cache), **arguments)
+        detector.bridge_checks = 0
+        original = detector.get_problem_based_on_bridge_prefixed_tags
+
+        def counted(tags):
+            detector.bridge_checks += 1
+            return original(tags)
+        detector.get_problem_based_on_bridge_prefixed_tags = counted
+        return detector
+
+    def test_repeated_tag_set_is_not_checked_again(self):
+        detector = self.detector(TagSetVerdictCache())
+        first = detector.get_problem_for_given_tags({"bridge:wikipedia": "en:Tower Bridge", "name": "A"}, "way", "fake test object")
+        second = detector.get_problem_for_given_tags({"bridge:wikipedia": "en:Tower Bridge", "name": "B"}, "way", "fake test object")
+        self.assertEqual(1, detector.bridge_checks)
+        self.assertEqual(first.data(), second.data())
+        self.assertIsNot(first, second)
+        detector.get_problem_for_given_tags({"bridge:wikipedia": "en:Tower Bridge"}, "node", "fake test object")
+        detector.get_all_problems_for_given_tags({"bridge:wikipedia": "en:Tower Bridge"}, "way", "fake test object")
+        self.assertEqual(3, detector.bridge_checks)
+
+    def test_configuration_of_detector_is_part_of_key(self):
+        cache = TagSetVerdictCache()
+        tags = {"bridge:wikipedia": "en:Tower Bridge"}
+        self.detector(cache).get_problem_for_given_tags(tags, "way", "fake test object")
+        detector = self.detector(cache, expected_language_code="pl")
+        detector.get_problem_for_given_tags(tags, "way", "fake test object")
+        self.assertEqual(1, detector.bridge_checks)
+
+    def test_location_dependent_verdict_is_not_stored(self):
+        detector = self.detector(TagSetVerdictCache())
+        original = detector.get_problem_based_on_bridge_prefixed_tags
+
+        def depending_on_location(tags):
+            if detector.evaluation_state.context.location != None:
+                detector.note_location_dependence()
+            return original(tags)
+        detector.get_problem_based_on_bridge_prefixed_tags = depending_on_location
+        tags = {"bridge:wikipedia": "en:Tower Bridge"}
+        for location in [(51.5, -0.07), (51.5, -0.07), None, None]:
+            detector.get_the_most_important_problem_generic(tags, location, "way", "fake test object")
+        self.assertEqual(3, detector.bridge_checks)
+
+    def test_other_looked_up_tags_select_variant(self):
+        cache = TagSetVerdictCache()
+        recorded = RecordingTags({"wikipedia": "en:Sign", "information": "board", "name": "Sign"})
+        recorded.get("wikipedia")
+        self.assertEqual(True, "information" in recorded)
+        self.assertEqual((("information", "board"),), recorded.other_looked_up_tags())
+        key = cache.verdict_key(recorded, "node", None, ())
+        cache.store(key, recorded.other_looked_up_tags(), ["board"])
+        self.assertEqual((True, ["board"]), cache.lookup(key, {"wikipedia": "en:Sign", "information": "board"}))
+        self.assertEqual((False, None), cache.lookup(key, {"wikipedia": "en:Sign", "information": "guidepost"}))
+        self.assertEqual((False, None), cache.lookup(key, {"wikipedia": "en:Sign"}))
+        self.assertNotEqual(key, cache.verdict_key({"wikipedia": "en:Other"}, "node", None, ()))
+        self.assertEqual(key, cache.verdict_key({"wikipedia": "en:Sign", "name": "Other"}, "node", None, ()))
+
+    def test_access_to_all_tags_is_recorded(self):
+        cache = TagSetVerdictCache()
+        tags = {"wikipedia": "en:Sign", "information": "board", "name": "Sign"}
+        for access in [lambda tags: tags.items(), lambda tags: tags.copy(), lambda tags: dict(tags), lambda tags: list(tags), lambda tags: tags.values()]:
+            recorded = RecordingTags(tags)
+            access(recorded)
+            key = cache.verdict_key(tags, "node", None, ())
+            cache.store(key, recorded.other_looked_up_tags(), ["all tags"])
+            self.assertEqual((True, ["all tags"]), cache.lookup(key, {"wikipedia": "en:Sign", "information": "board", "name": "Sign"}))
+            self.assertEqual((False, None), cache.lookup(key, {"wikipedia": "en:Sign", "information": "board", "name": "Other"}))
+            self.assertEqual((False, None), cache.lookup(key, {"wikipedia": "en:Sign", "information": "board", "name": "Sign", "ref": "1"}))
+            cache.clear()
+
+    def test_verdicts_are_not_reused_after_consulted_entity_changed(self):
+        cache = TagSetVerdictCache()
+        key = cache.verdict_key({"wikidata": "Q5"}, "node", None, ())
+        cache.store(key, (), ["human"], {"Q5": 1})
+        self.assertEqual((True, ["human"]), cache.lookup(key, {"wikidata": "Q5"}, lambda wikidata_ids: {"Q5": 1}))
+        self.assertEqual((False, None), cache.lookup(key, {"wikidata": "Q5"}, lambda wikidata_ids: {"Q5": 2}))
+        cache.store(key, (), ["changed human"], {"Q5": 2})
+        self.assertEqual((True, ["changed human"]), cache.lookup(key, {"wikidata": "Q5"}, lambda wikidata_ids: {"Q5": 2}))
+        self.assertEqual(1, len(cache.get(key)))
+
+    def test_verdicts_follow_refreshed_entities(self):
+        revisions = {"Q5": 1}
+
+        class FakeProjections:
+            def entity(self, wikidata_id, forced_refresh=False):
+                return {"id": wikidata_id, "lastrevid": revisions[wikidata_id]}
+
+            def property(self, wikidata_id, property, forced_refresh=False):
+                return None
+        detector = self.detector(TagSetVerdictCache())
+        detector.entity_projection_cache = FakeProjections()
+        original = detector.get_problem_based_on_bridge_prefixed_tags
+
+        def consulting_wikidata(tags):
+            detector.wikidata_property("Q5", "P31")
+            return original(tags)
+        detector.get_problem_based_on_bridge_prefixed_tags = consulting_wikidata
+        tags = {"bridge:wikipedia": "en:Tower Bridge"}
+        detector.get_problem_for_given_tags(tags, "way", "fake test object")
+        detector.get_problem_for_given_tags(tags, "way", "fake test object")
+        self.assertEqual(1, detector.bridge_checks)
+        revisions["Q5"] = 2
+        detector.get_problem_for_given_tags(tags, "way", "fake test object")
+        self.assertEqual(2, detector.bridge_checks)
+
+    def test_forced_refresh_does_not_reuse_verdicts(self):
+        detector = self.detector(TagSetVerdictCache(), forced_refresh=True)
+        for _ in range(2):
+            detector.get_problem_for_given_tags({"bridge:wikipedia": "en:Tower Bridge"}, "way", "fake test object")
+        self.assertEqual(2, detector.bridge_checks)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -727,6 +727,20 @@ class Tests(unittest.TestCase):
         problem = self.detector().get_wikipedia_language_issues(object_description, tags, wikipedia, effective_wikidata_id)
         self.assertEqual(None, 1)
 
+    def test_compiled_ontology_rules_match_rule_definitions(self):
+        detector = self.detector()
+        self.assertEqual(set(detector.ignored_entries_in_wikidata_ontology()), detector.ontology_rules.ignored_entries)
+        self.assertEqual(detector.invalid_types()['Q5'], dict(detector.get_reason_why_type_makes_object_invalid_primary_link('Q5')))
+        self.assertEqual(None, detector.get_reason_why_type_makes_object_invalid_primary_link('Q42'))
+        self.assertEqual(True, detector.ontology_rules.is_ignored('Q167270'))
+
+    def test_compiled_ontology_rules_are_immutable(self):
+        rules = self.detector().ontology_rules
+        with self.assertRaises(TypeError):
+            rules.invalid_types['Q42'] = {'what': 'a writer', 'replacement': None}
+        with self.assertRaises(TypeError):
+            rules.invalid_types['Q5']['what'] = 'a writer'
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,127 @@
+import http.server
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from wikimedia_connection import wikimedia_connection
+from wikibrain.wikimedia_prefetch import WikimediaPrefetcher
+from wikibrain.wikimedia_prefetch import links_in_tags
+
+
+def entity(wikidata_id, instance_of=(), sitelinks=None):
+    claims = {"P31": [{"mainsnak": {"datavalue": {"value": {"id": value}}}} for value in instance_of]}
+    returned = {"type": "item", "id": wikidata_id, "claims": claims, "sitelinks": {}}
+    for site, title in (sitelinks or {}).items():
+        returned["sitelinks"][site] = {"site": site, "title": title}
+    return returned
+
+
+class FakeWikidataApi(http.server.BaseHTTPRequestHandler):
+    entities = {}
+    requests = []
+
+    def do_GET(self):
+        parameters = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+        FakeWikidataApi.requests.append(parameters)
+        if "ids" in parameters:
+            response = self.by_ids(parameters["ids"][0].split("|"))
+        else:
+            response = self.by_titles(parameters["sites"][0], parameters["titles"][0].split("|"))
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def by_ids(self, ids):
+        for wikidata_id in ids:
+            if wikidata_id not in self.entities:
+                return {"error": {"code": "no-such-entity", "info": "Could not find an entity with the ID \"" + wikidata_id + "\".", "id": wikidata_id}}
+        return {"entities": {wikidata_id: self.entities[wikidata_id] for wikidata_id in ids}, "success": 1}
+
+    def by_titles(self, site, titles):
+        returned = {}
+        for index, title in enumerate(titles):
+            for wikidata_id, data in self.entities.items():
+                if data["sitelinks"].get(site, {}).get("title") == title:
+                    returned[wikidata_id] = data
+                    break
+            else:
+                returned[str(-1 - index)] = {"site": site, "title": title, "missing": ""}
+        return {"entities": returned, "success": 1}
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Tests(unittest.TestCase):
+    def setUp(self):
+        self.cache = tempfile.mkdtemp()
+        wikimedia_connection.set_cache_location(self.cache)
+        FakeWikidataApi.requests = []
+        FakeWikidataApi.entities = {
+            "Q31": entity("Q31", instance_of=["Q6256"], sitelinks={"enwiki": "Belgium", "plwiki": "Belgia"}),
+            "Q6256": entity("Q6256", sitelinks={"enwiki": "Country"}),
+            "Q515": entity("Q515"),
+            "Q1490": entity("Q1490", instance_of=["Q515"], sitelinks={"plwiki": "Tokio"}),
+        }
+        for number in range(1000, 1060):
+            FakeWikidataApi.entities["Q" + str(number)] = entity("Q" + str(number), instance_of=["Q515"])
+        self.server = http.server.HTTPServer(("127.0.0.1", 0), FakeWikidataApi)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.prefetcher = WikimediaPrefetcher(api_url="http://127.0.0.1:" + str(self.server.server_port) + "/w/api.php")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache)
+
+    def test_links_are_collected_from_all_supported_keys(self):
+        tags = {"wikidata": "Q31", "subject:wikidata": "Q1;Q2", "wikipedia": "en:Belgium", "brand:wikipedia": "pl:Tokio", "wikipedia:de": "Berlin", "wikipedia:fr": "fr:Paris", "name": "Q5"}
+        wikidata_ids, articles = links_in_tags(tags)
+        self.assertEqual({"Q31", "Q1", "Q2"}, wikidata_ids)
+        self.assertEqual({("en", "Belgium"), ("pl", "Tokio"), ("de", "Berlin"), ("fr", "Paris")}, articles)
+
+    def test_entities_are_fetched_in_batches(self):
+        elements = [{"wikidata": "Q" + str(number)} for number in range(1000, 1060)]
+        self.prefetcher.prefetch(elements)
+        # 60 entities in two batches, then shared P31 root
+        self.assertEqual(3, len(FakeWikidataApi.requests))
+        self.assertEqual(50, len(FakeWikidataApi.requests[0]["ids"][0].split("|")))
+        self.assertEqual(["Q515"], FakeWikidataApi.requests[2]["ids"])
+
+    def test_prefetched_data_is_used_by_wikimedia_connection(self):
+        self.prefetcher.prefetch([{"wikipedia": "pl:Tokio", "wikidata": "Q31"}])
+        requests = len(FakeWikidataApi.requests)
+        self.assertEqual("Q1490", wikimedia_connection.get_wikidata_object_id_from_article("pl", "Tokio"))
+        self.assertEqual("Q1490", wikimedia_connection.get_data_from_wikidata_by_id("Q1490")["entities"]["Q1490"]["id"])
+        self.assertEqual("Q31", wikimedia_connection.get_data_from_wikidata_by_id("Q31")["entities"]["Q31"]["id"])
+        # P31 roots
+        self.assertNotEqual(None, wikimedia_connection.get_data_from_wikidata_by_id("Q515"))
+        self.assertNotEqual(None, wikimedia_connection.get_data_from_wikidata_by_id("Q6256"))
+        self.assertEqual(requests, len(FakeWikidataApi.requests))
+
+    def test_missing_entities_and_articles_are_cached_as_missing(self):
+        self.prefetcher.prefetch([{"wikidata": "Q31;Q999999999", "wikipedia": "en:No such article"}])
+        requests = len(FakeWikidataApi.requests)
+        self.assertEqual(None, wikimedia_connection.get_data_from_wikidata_by_id("Q999999999"))
+        self.assertEqual(None, wikimedia_connection.get_wikidata_object_id_from_article("en", "No such article"))
+        self.assertEqual(requests, len(FakeWikidataApi.requests))
+
+    def test_cached_data_is_not_requested_again(self):
+        self.prefetcher.prefetch([{"wikidata": "Q1490"}])
+        requests = len(FakeWikidataApi.requests)
+        self.prefetcher.prefetch([{"wikidata": "Q1490"}, {"wikipedia": "pl:Tokio"}])
+        # only title lookup was not cached yet
+        self.assertEqual(requests + 1, len(FakeWikidataApi.requests))
+
+    def test_revisions_are_fetched_without_entity_data(self):
+        FakeWikidataApi.entities["Q31"]["lastrevid"] = 7
+        self.assertEqual({"Q31": 7, "Q515": None, "Q999999999": None}, self.prefetcher.fetch_revisions(["Q31", "Q515", "Q999999999"]))
+        self.assertEqual(["info"], FakeWikidataApi.requests[0]["props"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+from wikibrain.wikipedia_knowledge import WikipediaKnowledge
+from wikibrain.wikipedia_knowledge import language_codes
+
+
+class Tests(unittest.TestCase):
+    def test_registry_matches_language_lists(self):
+        ordered = WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance()
+        self.assertEqual(set(ordered), language_codes.codes)
+        self.assertEqual(set(WikipediaKnowledge.wikipedia_language_code_redirects()), language_codes.redirects)
+        for code in ordered:
+            self.assertEqual(ordered.index(code), language_codes.rank_of(code))
+            self.assertEqual(True, language_codes.is_valid_old_style_wikipedia_key("wikipedia:" + code))
+        self.assertEqual(None, language_codes.rank_of("xx-unknown"))
+        self.assertEqual(False, language_codes.is_valid_old_style_wikipedia_key("wikipedia:xx-unknown"))
+        self.assertEqual(False, language_codes.is_valid_old_style_wikipedia_key("wikipedia"))
+        self.assertEqual(True, language_codes.is_redirect("nb"))
+        self.assertEqual(False, language_codes.is_known_code("nb"))
+
+    def test_returned_lists_are_independent_copies(self):
+        WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance().append("broken")
+        self.assertEqual(False, "broken" in WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance())
+        self.assertEqual(False, language_codes.is_known_code("broken"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,3 +2,24 @@ import wikibrain.wikipedia_knowledge
 import wikibrain.wikidata_knowledge
 import wikibrain.wikimedia_link_issue_reporter
 import wikibrain.apply_changes
+import wikibrain.ontology_closure_cache
+import wikibrain.ontology_graph
+import wikibrain.wikimedia_prefetch
+import wikibrain.parallel_evaluation
+import wikibrain.async_detector
+import wikibrain.sharded_runner
+import wikibrain.cache_store
+import wikibrain.entity_projection
+import wikibrain.sitelink_index
+import wikibrain.official_languages
+import wikibrain.country_lookup
+import wikibrain.check_registry
+import wikibrain.element_filter
+import wikibrain.tag_keys
+import wikibrain.verdict_cache
+import wikibrain.revalidation_store
+# wikibrain.osm_change is not imported here - it is a command line entry point
+# and needs osm_iterator and lxml, which are not required by wikibrain itself
+import wikibrain.report_sink
+import wikibrain.text_catalog
+import wikibrain.report_aggregation
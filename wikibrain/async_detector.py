@@ -0,0 +1,164 @@
+import asyncio
+import concurrent.futures
+from wikimedia_connection import wikimedia_connection
+from wikibrain import parallel_evaluation
+from wikibrain import wikimedia_link_issue_reporter
+from wikibrain import wikimedia_prefetch
+
+# number of lookups and checks that may be in progress at the same time
+CONCURRENCY = 200
+
+# requests running at the same time to a single host, higher than
+# parallel_evaluation.REQUESTS_PER_HOST as otherwise almost all threads would
+# wait for the limiter - lower it to be more polite to Wikimedia servers
+ASYNC_REQUESTS_PER_HOST = 50
+
+
+class AsyncWikimediaFetcher:
+    """
+    async access to data from Wikidata and Wikipedia
+
+    this is a thread pool bridge, not an async HTTP client - wikimedia_connection
+    is synchronous, so each lookup is a blocking call run on a thread from a
+    dedicated pool. Event loop is never blocked, number of lookups in flight is
+    limited by size of pool and by limit of requests per host of shared cache,
+    which also deduplicates concurrent lookups of the same entity or article
+    """
+    def __init__(self, executor, forced_refresh=False):
+        self.executor = executor
+        self.forced_refresh = forced_refresh
+
+    async def run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def get_entity(self, wikidata_id):
+        return await self.run(wikimedia_connection.get_data_from_wikidata_by_id, wikidata_id, self.forced_refresh)
+
+    async def get_article_entity(self, language_code, article_name):
+        return await self.run(wikimedia_connection.get_data_from_wikidata, language_code, article_name, self.forced_refresh)
+
+    async def get_instance_of_roots(self, wikidata_id):
+        data = await self.get_entity(wikidata_id)
+        if data == None or wikidata_id not in data.get('entities', {}):
+            return []
+        return wikimedia_prefetch.instance_of_ids_of_entity(data['entities'][wikidata_id])
+
+    async def warm_for_tags(self, tags):
+        # fetches data linked from tags concurrently, so checks that run later
+        # find it in cache rather than waiting for responses one by one
+        wikidata_ids, articles = wikimedia_prefetch.links_in_tags(tags)
+        lookups = [self.get_instance_of_roots(wikidata_id) for wikidata_id in wikidata_ids]
+        lookups += [self.get_article_entity(language_code, article_name) for language_code, article_name in articles]
+        results = await asyncio.gather(*lookups, return_exceptions=True)
+        roots = set()
+        for result in results[:len(wikidata_ids)]:
+            if isinstance(result, list):
+                roots.update(result)
+        await asyncio.gather(*[self.get_entity(root) for root in roots - wikidata_ids], return_exceptions=True)
+
+
+class AsyncWikimediaLinkIssueDetector:
+    """
+    asyncio interface of WikimediaLinkIssueDetector, bridged to a thread pool
+
+    checks are the same as in WikimediaLinkIssueDetector (and run by it, on a
+    thread pool), so reported problems are identical - data needed by checks is
+    fetched ahead by AsyncWikimediaFetcher, also on the thread pool
+
+    at most concurrency lookups and checks run at once, with at most
+    requests_per_host of them waiting for response from a single host
+
+    cancelling a check stops waiting for it, but already started lookup
+    completes in background (and its result lands in cache)
+    """
+    def __init__(self, detector=None, concurrency=CONCURRENCY, shared_cache=None, requests_per_host=ASYNC_REQUESTS_PER_HOST, **detector_arguments):
+        if detector == None:
+            detector = wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(**detector_arguments)
+        self.detector = detector
+        self.concurrency = concurrency
+        if shared_cache == None:
+            shared_cache = parallel_evaluation.SharedWikimediaCache(requests_per_host=requests_per_host)
+        self.shared_cache = shared_cache
+        self.executor = None
+        self.fetcher = None
+        self.semaphore = None
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exception_type, exception_value, traceback):
+        await self.aclose()
+
+    def open(self):
+        if self.executor != None:
+            return
+        self.shared_cache.install()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency)
+        self.fetcher = AsyncWikimediaFetcher(self.executor, self.detector.forced_refresh)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    def close(self):
+        # blocks until lookups running in background are completed, use aclose from event loop
+        if self.executor == None:
+            return
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.after_shutdown()
+
+    async def aclose(self):
+        # waits for lookups running in background without blocking event loop
+        if self.executor == None:
+            return
+        executor = self.executor
+        await asyncio.get_running_loop().run_in_executor(None, lambda: executor.shutdown(wait=True, cancel_futures=True))
+        self.after_shutdown()
+
+    def after_shutdown(self):
+        self.shared_cache.uninstall()
+        self.executor = None
+        self.fetcher = None
+        self.semaphore = None
+
+    async def check(self, tags, function, *args):
+        self.open()
+        async with self.semaphore:
+            await self.fetcher.warm_for_tags(tags)
+            return await self.fetcher.run(function, *args)
+
+    async def get_problem_for_given_tags(self, tags, object_type, object_description):
+        return await self.check(tags, self.detector.get_problem_for_given_tags, tags, object_type, object_description)
+
+    async def get_problem_for_given_element(self, element):
+        return await self.check(element.get_tag_dictionary(), self.detector.get_problem_for_given_element, element)
+
+    async def iterate_problems(self, elements):
+        """
+        async generator yielding problem (or None) for each element, in the same
+        order as elements - which may be a normal or async iterable
+
+        at most concurrency elements are checked at once, closing generator
+        cancels checks that are still running
+        """
+        self.open()
+        pending = []
+        try:
+            async for element in iterate_as_async(elements):
+                pending.append(asyncio.ensure_future(self.get_problem_for_given_element(element)))
+                if len(pending) >= self.concurrency:
+                    yield await pending.pop(0)
+            while pending != []:
+                yield await pending.pop(0)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending != []:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def iterate_as_async(iterable):
+    if hasattr(iterable, "__aiter__"):
+        async for element in iterable:
+            yield element
+    else:
+        for element in iterable:
+            yield element
@@ -0,0 +1,370 @@
+import dbm
+import os
+import sqlite3
+import sys
+import threading
+from wikimedia_connection import wikimedia_connection
+
+# keys are paths of files in wikimedia_connection cache, relative to cache location
+# for example wikimedia-connection-cache/wikidata_by_id/Q42.wikidata_entity.txt
+# so the same keys are used by all backends, including the original directory layout
+
+KINDS = [
+    # order matters, longer suffixes first
+    (".wikidata_entity.code.txt", "wikidata entity response code"),
+    (".wikidata_entity.txt", "wikidata entity"),
+    (".code.txt", "response code"),
+    (".txt", "article or url response"),
+]
+
+
+def kind_of_key(key):
+    for suffix, kind in KINDS:
+        if key.endswith(suffix):
+            return kind
+    return "other"
+
+
+def key_of_path(path, cache_location):
+    return os.path.relpath(path, cache_location).replace(os.sep, "/")
+
+
+def key_of_filename(filename):
+    return key_of_path(filename, wikimedia_connection.cache_location())
+
+
+def keys_for_wikidata_id(wikidata_id):
+    return [
+        key_of_filename(wikimedia_connection.get_filename_with_wikidata_entity_by_id(wikidata_id)),
+        key_of_filename(wikimedia_connection.get_filename_with_wikidata_by_id_response_code(wikidata_id)),
+    ]
+
+
+def keys_for_article(language_code, article_name):
+    return [
+        key_of_filename(wikimedia_connection.get_filename_with_wikidata_entity(language_code, article_name)),
+        key_of_filename(wikimedia_connection.get_filename_with_wikidata_response_code(language_code, article_name)),
+        key_of_filename(wikimedia_connection.get_filename_with_article(language_code, article_name)),
+        key_of_filename(wikimedia_connection.get_filename_with_wikipedia_response_code(language_code, article_name)),
+    ]
+
+
+class CacheStore:
+    """
+    interface of cache backends, keys and values are strings
+
+    subclasses must implement get_many, put_many, delete_many and keys
+    """
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def __contains__(self, key):
+        return self.get(key) != None
+
+    def __len__(self):
+        return sum(1 for _ in self.keys())
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+
+class DirectoryCacheStore(CacheStore):
+    """
+    the original layout of wikimedia_connection - one file per entry
+    """
+    def __init__(self, cache_location):
+        self.cache_location = cache_location
+        self.path = cache_location
+
+    def filename(self, key):
+        return os.path.join(self.cache_location, *key.split("/"))
+
+    def get_many(self, keys):
+        returned = {}
+        for key in keys:
+            filename = self.filename(key)
+            if os.path.isfile(filename):
+                with open(filename, 'r') as file:
+                    returned[key] = file.read()
+        return returned
+
+    def put_many(self, items):
+        for key, value in items:
+            filename = self.filename(key)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(filename, 'w') as file:
+                file.write(value)
+
+    def delete_many(self, keys):
+        for key in keys:
+            filename = self.filename(key)
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def keys(self):
+        root = os.path.join(self.cache_location, wikimedia_connection.cache_folder_name())
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                yield key_of_path(os.path.join(directory, filename), self.cache_location)
+
+
+class SqliteCacheStore(CacheStore):
+    """
+    single file store, indexed by key and by kind of entry
+
+    may be shared by several processes (write-ahead log is used) and threads
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_by_kind ON entries (kind)")
+        self.connection.commit()
+
+    def get_many(self, keys):
+        keys = list(keys)
+        returned = {}
+        with self.lock:
+            # stays below limit of number of parameters in a query
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                query = "SELECT key, value FROM entries WHERE key IN (" + ",".join("?" * len(batch)) + ")"
+                for key, value in self.connection.execute(query, batch):
+                    returned[key] = value
+        return returned
+
+    def put_many(self, items):
+        with self.lock:
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO entries (key, kind, value) VALUES (?, ?, ?)", ((key, kind_of_key(key), value) for key, value in items))
+
+    def delete_many(self, keys):
+        with self.lock:
+            with self.connection:
+                self.connection.executemany("DELETE FROM entries WHERE key = ?", ((key,) for key in keys))
+
+    def keys(self, kind=None):
+        with self.lock:
+            if kind == None:
+                return [row[0] for row in self.connection.execute("SELECT key FROM entries ORDER BY key")]
+            return [row[0] for row in self.connection.execute("SELECT key FROM entries WHERE kind = ? ORDER BY key", (kind,))]
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class DbmCacheStore(CacheStore):
+    """
+    single file store using dbm, for use by a single process
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.database = dbm.open(path, 'c')
+
+    def get_many(self, keys):
+        returned = {}
+        with self.lock:
+            for key in keys:
+                value = self.database.get(key.encode('utf-8'))
+                if value != None:
+                    returned[key] = value.decode('utf-8')
+        return returned
+
+    def put_many(self, items):
+        with self.lock:
+            for key, value in items:
+                self.database[key.encode('utf-8')] = value.encode('utf-8')
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                encoded = key.encode('utf-8')
+                if encoded in self.database:
+                    del self.database[encoded]
+
+    def keys(self):
+        with self.lock:
+            return sorted(key.decode('utf-8') for key in self.database.keys())
+
+    def close(self):
+        with self.lock:
+            self.database.close()
+
+
+def open_cache_store(path):
+    if path.endswith(".sqlite"):
+        return SqliteCacheStore(path)
+    if path.endswith(".dbm"):
+        return DbmCacheStore(path)
+    if os.path.isdir(path):
+        return DirectoryCacheStore(path)
+    raise ValueError("unable to recognise type of cache store " + path + " (expected .sqlite, .dbm or a directory)")
+
+
+def is_in_cache_folder(filename):
+    return key_of_filename(filename).startswith(wikimedia_connection.cache_folder_name() + "/")
+
+
+class StoreBackedPath:
+    """
+    os.path as seen by wikimedia_connection, files in its cache folder are
+    looked up in store - other paths are not affected
+    """
+    def __init__(self, binding):
+        self.binding = binding
+
+    def isfile(self, filename):
+        if is_in_cache_folder(filename):
+            return key_of_filename(filename) in self.binding.store
+        return os.path.isfile(filename)
+
+    def __getattr__(self, name):
+        return getattr(os.path, name)
+
+
+class StoreBackedOs:
+    def __init__(self, binding):
+        self.path = StoreBackedPath(binding)
+
+    def __getattr__(self, name):
+        return getattr(os, name)
+
+
+class CacheStoreBinding:
+    """
+    makes wikimedia_connection keep its cache in given store rather than in
+    one file per entry, use set_cache_store rather than installing it directly
+
+    wikimedia_connection accesses its cache directly through files, so while
+    installed its file access functions are replaced - for files outside of
+    its cache folder original ones are still used
+    """
+    def __init__(self, store):
+        self.store = store
+        self.originals = None
+
+    def write_to_file(self, filename, content, access_mode):
+        if not is_in_cache_folder(filename):
+            return self.originals["write_to_file"](filename, content, access_mode)
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        self.store.put(key_of_filename(filename), content)
+
+    def get_entire_file_content(self, filename):
+        if not is_in_cache_folder(filename):
+            return self.originals["get_entire_file_content"](filename)
+        content = self.store.get(key_of_filename(filename))
+        if content == None:
+            raise FileNotFoundError(filename)
+        return content
+
+    def ensure_that_cache_folder_exists(self, language_code):
+        # store has no folders
+        pass
+
+    def install(self):
+        self.originals = {}
+        for name in ["os", "write_to_file", "get_entire_file_content", "ensure_that_cache_folder_exists"]:
+            self.originals[name] = getattr(wikimedia_connection, name)
+        wikimedia_connection.os = StoreBackedOs(self)
+        wikimedia_connection.write_to_file = self.write_to_file
+        wikimedia_connection.get_entire_file_content = self.get_entire_file_content
+        wikimedia_connection.ensure_that_cache_folder_exists = self.ensure_that_cache_folder_exists
+
+    def uninstall(self):
+        for name, value in self.originals.items():
+            setattr(wikimedia_connection, name, value)
+        self.originals = None
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.uninstall()
+
+
+# binding of store used by wikimedia_connection, see set_cache_store
+installed_binding = None
+
+
+def set_cache_store(store):
+    """
+    makes wikimedia_connection keep its cache in given store, for the whole
+    process - None restores the original directory layout
+
+    should be called at startup, after cache location is set and before
+    anything is fetched
+    """
+    global installed_binding
+    if installed_binding != None:
+        installed_binding.uninstall()
+        installed_binding = None
+    if store != None:
+        installed_binding = CacheStoreBinding(store)
+        installed_binding.install()
+
+
+def current_cache_store():
+    # store used by wikimedia_connection
+    if installed_binding != None:
+        return installed_binding.store
+    return DirectoryCacheStore(wikimedia_connection.cache_location())
+
+
+def current_cache_store_path():
+    # None when the original directory layout is used
+    if installed_binding != None:
+        return installed_binding.store.path
+    return None
+
+
+def migrate_directory_cache(cache_location, store, batch_size=1000, show_progress=False):
+    """
+    copies all entries from cache in the original directory layout into store
+
+    returns number of copied entries
+    """
+    source = DirectoryCacheStore(cache_location)
+    batch = []
+    count = 0
+    for key in source.keys():
+        batch.append(key)
+        if len(batch) >= batch_size:
+            store.put_many(source.get_many(batch).items())
+            count += len(batch)
+            batch = []
+            if show_progress:
+                print(count, "entries migrated")
+    store.put_many(source.get_many(batch).items())
+    count += len(batch)
+    return count
+
+
+if __name__ == "__main__":
+    # python3 -m wikibrain.cache_store /path/to/cache/location /path/to/cache/location/wikimedia-connection-cache.sqlite
+    if len(sys.argv) != 3:
+        print("usage: python3 -m wikibrain.cache_store <cache location with wikimedia-connection-cache folder> <target .sqlite or .dbm file>")
+        sys.exit(1)
+    with open_cache_store(sys.argv[2]) as target:
+        print(migrate_directory_cache(sys.argv[1], target, show_progress=True), "entries migrated")
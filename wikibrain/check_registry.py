@@ -0,0 +1,174 @@
+import threading
+
+# cost classes of checks
+LOCAL = "local"  # uses only tags of element, never fetches anything
+REMOTE = "remote"  # may need Wikidata or Wikipedia data
+
+
+class CheckContext:
+    """
+    element being checked, with derived values computed once and only when needed
+
+    lives for evaluation of a single element, so values derived from fetched
+    data (Wikidata IDs of linked articles, properties, best interwiki link...)
+    are looked up and parsed once even if needed by many checks
+    """
+    def __init__(self, detector, tags, location, object_type, object_description):
+        self.detector = detector
+        self.tags = tags
+        self.location = location
+        self.object_type = object_type
+        self.object_description = object_description
+        self.derived = {}
+        # set when result of some check was affected by actual location of element
+        self.location_dependent = False
+        # IDs of Wikidata entities with data used by checks
+        self.consulted_entities = set()
+
+    def memoized(self, name, compute):
+        if name not in self.derived:
+            self.derived[name] = compute()
+        return self.derived[name]
+
+    def effective_wikidata_id(self):
+        # may be None - maybe Wikidata entry was not created yet!
+        return self.memoized("effective_wikidata_id", lambda: self.detector.get_effective_wikidata_tag(self.tags))
+
+    def effective_wikipedia(self):
+        # may be None - maybe there is just a Wikidata entry!
+        return self.memoized("effective_wikipedia", lambda: self.detector.get_effective_wikipedia_tag(self.tags))
+
+
+class EvaluationState(threading.local):
+    # context of element currently evaluated in this thread, if any
+    context = None
+    # if set, IDs of Wikidata entities consulted by checks are added to it
+    consulted_entities = None
+
+
+class Check:
+    def __init__(self, name, priority, cost, run, applies=None, group=None, gate=False, uses_linked_data=True):
+        """
+        run is called with detector and CheckContext, returns ErrorReport or None
+
+        applies is an optional function called with tags, returning False
+        for elements where check is known to have nothing to report
+
+        gate is set for checks of links themselves (malformed links, links to
+        missing pages) - once gate reported a problem, data of linked entities
+        and articles is not usable and less important checks with
+        uses_linked_data are not run
+        """
+        self.name = name
+        self.priority = priority
+        self.cost = cost
+        self.run = run
+        self.applies = applies
+        self.group = group
+        self.gate = gate
+        self.uses_linked_data = uses_linked_data
+
+    def is_applicable(self, tags):
+        return self.applies == None or self.applies(tags)
+
+
+class CheckRegistry:
+    """
+    checks of elements, each with priority (lower value is more important),
+    cost class and a group
+
+    reported problem is always from the most important check reporting anything,
+    but checks are not run in priority order - all local checks are run first
+    and remote checks are run only if they are more important than problem
+    found by local checks
+
+    group may have a guard, called with detector and CheckContext - if it returns
+    False then checks in group are treated as reporting nothing
+    """
+    def __init__(self):
+        self.checks = []
+        self.guards = {}
+
+    def add(self, name, priority, cost, run, applies=None, group=None, gate=False, uses_linked_data=True):
+        if cost not in [LOCAL, REMOTE]:
+            raise ValueError("unknown cost class " + str(cost) + " of " + name)
+        for check in self.checks:
+            if check.priority == priority:
+                raise ValueError(name + " has the same priority as " + check.name)
+        self.checks.append(Check(name, priority, cost, run, applies, group, gate, uses_linked_data))
+        self.checks.sort(key=lambda check: check.priority)
+
+    def set_group_guard(self, group, guard):
+        self.guards[group] = guard
+
+    def ordered_checks(self, groups=None):
+        if groups == None:
+            return self.checks
+        return [check for check in self.checks if check.group in groups]
+
+    def group_guard(self, detector, context):
+        # returns function checking whether group is allowed, guards are evaluated at most once
+        verdicts = {}
+
+        def is_group_allowed(group):
+            if group not in self.guards:
+                return True
+            if group not in verdicts:
+                verdicts[group] = self.guards[group](detector, context)
+            return verdicts[group]
+        return is_group_allowed
+
+    def run_all(self, detector, context, groups=None):
+        """
+        returns problems reported by all checks, the most important first
+
+        all checks use the same context, and fetched data is cached - so entity,
+        article and ontology data are fetched once even if used by many checks
+
+        after a gate reported a problem, checks using linked data are skipped -
+        as are group guards, these also look at linked data
+
+        """
+        is_group_allowed = self.group_guard(detector, context)
+        links_are_broken = False
+        returned = []
+        for check in self.ordered_checks(groups):
+            if links_are_broken and check.uses_linked_data:
+                continue
+            if not check.is_applicable(context.tags):
+                continue
+            if not links_are_broken and not is_group_allowed(check.group):
+                continue
+            report = check.run(detector, context)
+            if report != None:
+                returned.append(report)
+                if check.gate:
+                    links_are_broken = True
+        return returned
+
+    def run(self, detector, context, groups=None):
+        checks = self.ordered_checks(groups)
+        is_group_allowed = self.group_guard(detector, context)
+
+        local_priority = None
+        local_report = None
+        for check in checks:
+            if check.cost != LOCAL or not check.is_applicable(context.tags):
+                continue
+            report = check.run(detector, context)
+            if report != None and is_group_allowed(check.group):
+                local_priority = check.priority
+                local_report = report
+                break
+
+        for check in checks:
+            if local_priority != None and check.priority >= local_priority:
+                break
+            if check.cost == LOCAL or not check.is_applicable(context.tags):
+                continue
+            if not is_group_allowed(check.group):
+                continue
+            report = check.run(detector, context)
+            if report != None:
+                return report
+        return local_report
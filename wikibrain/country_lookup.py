@@ -0,0 +1,139 @@
+import json
+import math
+
+# size of grid cells, in degrees
+CELL_SIZE = 1.0
+
+
+def feature_property(feature, names):
+    # plain GeoJSON properties or OSM exports with tags stored as a nested dictionary
+    properties = feature.get("properties") or {}
+    for source in [properties, properties.get("tags") or {}]:
+        for name in names:
+            value = source.get(name)
+            if value not in [None, ""]:
+                return value
+    return None
+
+
+def polygons_of_geometry(geometry):
+    """
+    returns list of polygons, each is a list of rings (outer ring first, then holes)
+    with (longitude, latitude) vertices
+    """
+    if geometry == None:
+        return []
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    if geometry["type"] == "GeometryCollection":
+        returned = []
+        for part in geometry["geometries"]:
+            returned += polygons_of_geometry(part)
+        return returned
+    return []
+
+
+def is_inside_ring(ring, lon, lat):
+    # ray casting, points exactly on boundary may be reported either way
+    inside = False
+    previous_lon, previous_lat = ring[-1]
+    for vertex_lon, vertex_lat in ring:
+        if (vertex_lat > lat) != (previous_lat > lat):
+            crossing_lon = vertex_lon + (lat - vertex_lat) * (previous_lon - vertex_lon) / (previous_lat - vertex_lat)
+            if lon < crossing_lon:
+                inside = not inside
+        previous_lon, previous_lat = vertex_lon, vertex_lat
+    return inside
+
+
+class CountryPolygon:
+    def __init__(self, country_id, rings):
+        self.country_id = country_id
+        self.rings = [tuple((float(vertex[0]), float(vertex[1])) for vertex in ring) for ring in rings]
+        outer = self.rings[0]
+        self.min_lon = min(vertex[0] for vertex in outer)
+        self.max_lon = max(vertex[0] for vertex in outer)
+        self.min_lat = min(vertex[1] for vertex in outer)
+        self.max_lat = max(vertex[1] for vertex in outer)
+
+    def contains(self, lat, lon):
+        if lon < self.min_lon or lon > self.max_lon or lat < self.min_lat or lat > self.max_lat:
+            return False
+        if not is_inside_ring(self.rings[0], lon, lat):
+            return False
+        for hole in self.rings[1:]:
+            if is_inside_ring(hole, lon, lat):
+                return False
+        return True
+
+
+class CountryIndex:
+    """
+    offline lookup of countries containing a given point, without any Wikidata access
+
+    polygons are registered in all cells of a regular grid overlapped by their
+    bounding box, so query checks only polygons from a single cell
+    """
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.names = {}
+        self.polygon_count = 0
+
+    def cell_of(self, lat, lon):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def add_polygon(self, country_id, rings):
+        rings = [ring for ring in rings if len(ring) > 2]
+        if rings == []:
+            return
+        polygon = CountryPolygon(country_id, rings)
+        min_cell = self.cell_of(polygon.min_lat, polygon.min_lon)
+        max_cell = self.cell_of(polygon.max_lat, polygon.max_lon)
+        for lat_cell in range(min_cell[0], max_cell[0] + 1):
+            for lon_cell in range(min_cell[1], max_cell[1] + 1):
+                self.cells.setdefault((lat_cell, lon_cell), []).append(polygon)
+        self.polygon_count += 1
+
+    def add_feature(self, feature, id_properties=("wikidata",), name_properties=("name:en", "name")):
+        country_id = feature_property(feature, id_properties)
+        if country_id == None:
+            return False
+        name = feature_property(feature, name_properties)
+        if name != None:
+            self.names.setdefault(country_id, name)
+        for rings in polygons_of_geometry(feature.get("geometry")):
+            self.add_polygon(country_id, rings)
+        return True
+
+    def countries_at(self, lat, lon):
+        """
+        returns list of Wikidata IDs of countries containing the point,
+        empty list if point is not inside any of them
+        """
+        returned = []
+        for polygon in self.cells.get(self.cell_of(lat, lon), []):
+            if polygon.country_id not in returned and polygon.contains(lat, lon):
+                returned.append(polygon.country_id)
+        return returned
+
+    def country_name(self, country_id):
+        return self.names.get(country_id)
+
+
+def load_country_index(path, id_properties=("wikidata",), name_properties=("name:en", "name"), cell_size=CELL_SIZE):
+    """
+    builds index from GeoJSON file with country boundaries, for example
+    OSM boundary=administrative admin_level=2 relations exported to GeoJSON
+
+    features without Wikidata ID are skipped
+    """
+    with open(path, encoding="utf-8") as data:
+        loaded = json.load(data)
+    features = loaded.get("features", []) if loaded.get("type") == "FeatureCollection" else [loaded]
+    index = CountryIndex(cell_size)
+    for feature in features:
+        index.add_feature(feature, id_properties, name_properties)
+    return index
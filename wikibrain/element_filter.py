@@ -0,0 +1,84 @@
+import re
+import threading
+from wikibrain import wikimedia_prefetch
+
+# all checks of WikimediaLinkIssueDetector are based on keys matching this,
+# such as wikipedia, brand:wikidata, wikipedia:de, not:operator:wikidata
+RELEVANT_KEY_PATTERN = re.compile("wikipedia|wikidata")
+
+
+class KeyClassifier:
+    """
+    decides whether tags may have anything reportable, with a single pass over keys
+
+    the same keys appear in very many elements, so verdicts for keys are memoized
+    """
+    def __init__(self, pattern=RELEVANT_KEY_PATTERN, maximum_size=100000):
+        self.pattern = pattern
+        self.maximum_size = maximum_size
+        self.verdicts = {}
+
+    def is_relevant_key(self, key):
+        verdict = self.verdicts.get(key)
+        if verdict == None:
+            verdict = self.pattern.search(key) != None
+            if len(self.verdicts) >= self.maximum_size:
+                # rare, keys are highly repetitive
+                self.verdicts = {}
+            self.verdicts[key] = verdict
+        return verdict
+
+    def is_relevant(self, tags):
+        for key in tags:
+            if self.is_relevant_key(key):
+                return True
+        return False
+
+
+shared_key_classifier = KeyClassifier()
+
+
+def is_relevant(tags):
+    return shared_key_classifier.is_relevant(tags)
+
+
+class RelevantElementFilter:
+    """
+    drops elements that cannot have any reportable problem before they reach detector
+
+    keeps count of skipped elements, it is safe to share between threads
+    """
+    def __init__(self, classifier=None, tags_of=wikimedia_prefetch.tags_of):
+        if classifier == None:
+            classifier = shared_key_classifier
+        self.classifier = classifier
+        self.tags_of = tags_of
+        self.lock = threading.Lock()
+        self.seen = 0
+        self.skipped = 0
+
+    def is_relevant(self, element):
+        relevant = self.classifier.is_relevant(self.tags_of(element))
+        with self.lock:
+            self.seen += 1
+            if not relevant:
+                self.skipped += 1
+        return relevant
+
+    def filter(self, elements):
+        for element in elements:
+            if self.is_relevant(element):
+                yield element
+
+    def skipped_share(self):
+        # None if nothing was processed yet
+        with self.lock:
+            if self.seen == 0:
+                return None
+            return self.skipped / self.seen
+
+    def summary(self):
+        share = self.skipped_share()
+        if share == None:
+            return "no elements processed"
+        return str(self.skipped) + " of " + str(self.seen) + " elements skipped as irrelevant (" + str(round(share * 100, 1)) + "%)"
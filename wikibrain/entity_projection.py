@@ -0,0 +1,259 @@
+import json
+from wikimedia_connection import wikimedia_connection
+from wikibrain import cache_store
+from wikibrain import ontology_closure_cache
+
+# properties read by wikibrain, everything else is dropped from projected entities
+PROJECTED_PROPERTIES = frozenset([
+    'P31',  # instance of
+    'P279',  # subclass of
+    'P17',  # country
+    'P576',  # dissolved, abolished or demolished date
+    'P159',  # headquarters location
+    'P625',  # coordinate location
+    'P105',  # taxon rank
+    'P2046',  # area
+    'P247',  # COSPAR ID
+    'P4046',  # SIMC place code
+])
+
+# qualifiers read by wikibrain
+PROJECTED_QUALIFIERS = frozenset([
+    'P1011',  # excluding, on P576
+    'P2241',  # reason for deprecated rank, on P31 and P279
+    'P625',  # coordinate location, on P159
+    'P582',  # end time, on P17
+])
+
+NOT_CACHED = object()
+
+# marks entities that were already projected, bump if projected fields change
+PROJECTION_VERSION = 2
+
+
+def project_claim(claim):
+    projected = {'mainsnak': {key: value for key, value in claim.get('mainsnak', {}).items() if key in ['snaktype', 'datatype', 'datavalue']}}
+    if 'rank' in claim:
+        projected['rank'] = claim['rank']
+    qualifiers = {property: values for property, values in claim.get('qualifiers', {}).items() if property in PROJECTED_QUALIFIERS}
+    if qualifiers != {}:
+        projected['qualifiers'] = qualifiers
+    return projected
+
+
+def project_entity(entity):
+    """
+    compact record of entity, in the same format as full entity JSON
+    but with only data that is used by wikibrain
+    """
+    if entity.get('wikibrain_projection') == PROJECTION_VERSION:
+        return entity
+    if 'missing' in entity:
+        return entity
+    projected = {
+        'wikibrain_projection': PROJECTION_VERSION,
+        'type': entity.get('type'),
+        'id': entity.get('id'),
+        'lastrevid': entity.get('lastrevid'),
+        'labels': entity.get('labels', {}),
+        # used by wikidata_processing.wikidata_description
+        'descriptions': entity.get('descriptions', {}),
+        'sitelinks': {site: {'site': site, 'title': sitelink['title']} for site, sitelink in entity.get('sitelinks', {}).items()},
+        'claims': {},
+    }
+    for property, claims in entity.get('claims', {}).items():
+        if property in PROJECTED_PROPERTIES:
+            projected['claims'][property] = [project_claim(claim) for claim in claims]
+    return projected
+
+
+def project_response(response):
+    # response of wbgetentities, as cached by wikimedia_connection
+    if response == None or 'entities' not in response:
+        return response
+    projected = dict(response)
+    projected['entities'] = {key: project_entity(entity) for key, entity in response['entities'].items()}
+    return projected
+
+
+class EntityProjectionCache(ontology_closure_cache.LeastRecentlyUsedStore):
+    """
+    in-memory cache of projected entities, so entity JSON is parsed and
+    projected once per process rather than once per property lookup
+    """
+    def __init__(self, maximum_size=100000):
+        super().__init__(maximum_size)
+
+    def entity(self, wikidata_id, forced_refresh=False):
+        """
+        returns projected entity or None for entities that are not existing
+        """
+        if wikidata_id == None:
+            return None
+        if not forced_refresh:
+            cached = self.get(wikidata_id, NOT_CACHED)
+            self.record_lookup(cached is not NOT_CACHED)
+            if cached is not NOT_CACHED:
+                return cached
+        response = wikimedia_connection.get_data_from_wikidata_by_id(wikidata_id, forced_refresh)
+        entity = None
+        if response != None and wikidata_id in response.get('entities', {}):
+            entity = project_entity(response['entities'][wikidata_id])
+        self.put(wikidata_id, entity)
+        return entity
+
+    def property(self, wikidata_id, property, forced_refresh=False):
+        """
+        the same as wikimedia_connection.get_property_from_wikidata
+        """
+        if property not in PROJECTED_PROPERTIES:
+            # not available in projections, note that it will be missing also
+            # in full data if cache was compacted
+            return wikimedia_connection.get_property_from_wikidata(wikidata_id, property, forced_refresh)
+        entity = self.entity(wikidata_id, forced_refresh)
+        if entity == None:
+            return None
+        return entity['claims'].get(property)
+
+    def location(self, wikidata_id):
+        """
+        the same as wikimedia_connection.get_location_from_wikidata
+        """
+        data = self.property(wikidata_id, 'P625')
+        if data == None:
+            return (None, None)
+        data = data[0]['mainsnak']
+        if data == None:
+            return (None, None)
+        data = data['datavalue']['value']
+        return data['latitude'], data['longitude']
+
+    def label(self, wikidata_id, language):
+        entity = self.entity(wikidata_id)
+        if entity == None:
+            return None
+        try:
+            return entity['labels'][language]['value']
+        except KeyError:
+            return None
+
+    def instance_of_ids(self, wikidata_id):
+        """
+        the same as wikidata_processing.get_wikidata_type_ids_of_entry
+        """
+        entity = self.entity(wikidata_id)
+        if entity == None:
+            raise ValueError("got none for " + wikidata_id)
+        if 'P31' not in entity['claims']:
+            return None
+        return useful_claim_targets(entity['claims']['P31'])
+
+    def direct_superclasses(self, wikidata_id):
+        """
+        the same as wikidata_processing.get_useful_direct_parents(wikidata_id, forbidden=[])
+        """
+        return useful_claim_targets(self.property(wikidata_id, 'P279') or [])
+
+
+def revisions_from_cache(entity_projection_cache, wikidata_ids):
+    """
+    revisions (lastrevid) of entities as present in cache, so revisions of data
+    that was actually used by checks - None for entities that are not existing
+    """
+    returned = {}
+    for wikidata_id in wikidata_ids:
+        entity = entity_projection_cache.entity(wikidata_id)
+        if entity == None:
+            returned[wikidata_id] = None
+        else:
+            returned[wikidata_id] = entity.get('lastrevid')
+    return returned
+
+
+def useful_claim_targets(claims):
+    returned = []
+    for claim in claims:
+        if 'datavalue' not in claim['mainsnak']:
+            # "no value" claims
+            continue
+        if 'qualifiers' in claim and 'P2241' in claim['qualifiers']:
+            # skip ones marked as deprecated, see https://www.wikidata.org/w/index.php?title=Q2309609&oldid=1752686751
+            continue
+        if claim.get('rank') == "deprecated":
+            continue
+        returned.append(claim['mainsnak']['datavalue']['value']['id'])
+    return returned
+
+
+class ProjectingDownloads:
+    """
+    while installed, entities downloaded by wikimedia_connection are written
+    to cache as projections rather than as full entity JSON
+    """
+    def __init__(self):
+        self.originals = None
+
+    def project_cached_file(self, response_filename):
+        try:
+            content = wikimedia_connection.get_entire_file_content(response_filename)
+            response = json.loads(content)
+        except (OSError, ValueError):
+            return
+        wikimedia_connection.write_to_text_file(response_filename, json.dumps(project_response(response)))
+
+    def install(self):
+        self.originals = {
+            "download_data_from_wikidata_by_id": wikimedia_connection.download_data_from_wikidata_by_id,
+            "download_data_from_wikidata": wikimedia_connection.download_data_from_wikidata,
+        }
+
+        def download_data_from_wikidata_by_id(wikidata_id):
+            self.originals["download_data_from_wikidata_by_id"](wikidata_id)
+            self.project_cached_file(wikimedia_connection.get_filename_with_wikidata_entity_by_id(wikidata_id))
+
+        def download_data_from_wikidata(language_code, article_name):
+            self.originals["download_data_from_wikidata"](language_code, article_name)
+            self.project_cached_file(wikimedia_connection.get_filename_with_wikidata_entity(language_code, article_name))
+
+        wikimedia_connection.download_data_from_wikidata_by_id = download_data_from_wikidata_by_id
+        wikimedia_connection.download_data_from_wikidata = download_data_from_wikidata
+
+    def uninstall(self):
+        for name, function in self.originals.items():
+            setattr(wikimedia_connection, name, function)
+        self.originals = None
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.uninstall()
+
+
+def compact_cache_store(store, batch_size=1000):
+    """
+    replaces full entities in cache store by their projections
+
+    returns (size before, size after) of compacted entries, in characters
+    """
+    size_before = 0
+    size_after = 0
+    keys = [key for key in store.keys() if cache_store.kind_of_key(key) == "wikidata entity"]
+    for start in range(0, len(keys), batch_size):
+        compacted = []
+        for key, content in store.get_many(keys[start:start + batch_size]).items():
+            try:
+                response = json.loads(content)
+            except ValueError:
+                continue
+            projected = json.dumps(project_response(response))
+            size_before += len(content)
+            size_after += len(projected)
+            compacted.append((key, projected))
+        store.put_many(compacted)
+    return size_before, size_after
+
+
+# shared by all detectors in a process
+shared_entity_projection_cache = EntityProjectionCache()
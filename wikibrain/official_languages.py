@@ -0,0 +1,40 @@
+import json
+import os
+import types
+
+# generated by generate_official_language_list.py in top level of repository
+# from data in Wikidata
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "official_languages.json")
+
+
+def load_countries_by_language(path=DATA_PATH):
+    """
+    returns read-only mapping of language code to frozenset of Wikidata IDs
+    of countries where it is an official language
+    """
+    with open(path, encoding="utf-8") as data:
+        loaded = json.load(data)
+    return types.MappingProxyType({language_code: frozenset(country_ids) for language_code, country_ids in loaded.items()})
+
+
+def index_languages_by_country(countries_by_language):
+    returned = {}
+    for language_code, country_ids in countries_by_language.items():
+        for country_id in country_ids:
+            returned.setdefault(country_id, set()).add(language_code)
+    return types.MappingProxyType({country_id: frozenset(language_codes) for country_id, language_codes in returned.items()})
+
+
+countries_by_language = load_countries_by_language()
+languages_by_country = index_languages_by_country(countries_by_language)
+
+
+def countries_with_official_language(language_code):
+    """
+    frozenset of Wikidata IDs of countries, None for languages without data
+    """
+    return countries_by_language.get(language_code)
+
+
+def official_languages_of_country(country_id):
+    return languages_by_country.get(country_id, frozenset())
@@ -0,0 +1,311 @@
+import collections
+import threading
+
+
+def visit_components_bottom_up(start_id, get_direct_parents, is_completed, on_component):
+    """
+    walks superclass graph starting from start_id and groups it into strongly
+    connected components (cycles present in Wikidata ontology), using an iterative
+    version of Tarjan's algorithm
+
+    on_component(members, parents_of) is called for every component in reverse
+    topological order - so all parents outside of component are already processed
+
+    nodes for which is_completed(node) returns True are treated as already
+    processed and are not expanded
+    """
+    index_of = {}
+    lowlink = {}
+    parents_of = {}
+    component_stack = []
+    on_component_stack = set()
+    call_stack = []
+
+    def enter(node):
+        index_of[node] = len(index_of)
+        lowlink[node] = index_of[node]
+        component_stack.append(node)
+        on_component_stack.add(node)
+        parents = []
+        for parent in get_direct_parents(node):
+            if parent not in parents:
+                parents.append(parent)
+        parents_of[node] = parents
+        call_stack.append((node, iter(parents)))
+
+    enter(start_id)
+    while call_stack != []:
+        node, remaining_parents = call_stack[-1]
+        descended = False
+        for parent in remaining_parents:
+            if parent not in index_of:
+                if is_completed(parent):
+                    continue
+                enter(parent)
+                descended = True
+                break
+            if parent in on_component_stack:
+                lowlink[node] = min(lowlink[node], index_of[parent])
+        if descended:
+            continue
+        call_stack.pop()
+        if call_stack != []:
+            caller = call_stack[-1][0]
+            lowlink[caller] = min(lowlink[caller], lowlink[node])
+        if lowlink[node] == index_of[node]:
+            members = []
+            while True:
+                member = component_stack.pop()
+                on_component_stack.discard(member)
+                members.append(member)
+                if member == node:
+                    break
+            on_component(members, parents_of)
+
+
+class LeastRecentlyUsedStore:
+    def __init__(self, maximum_size):
+        self.maximum_size = maximum_size
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maximum_size:
+                self.entries.popitem(last=False)
+
+    def record_lookup(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+class AncestorClosureCache(LeastRecentlyUsedStore):
+    """
+    memoized sets of all superclasses (closure of P279 - subclass of) of Wikidata classes
+
+    closures are built bottom-up, so superclasses shared by many classes
+    (building, human activity, ...) are expanded only once, also cycles present
+    in Wikidata ontology are handled - all members of a cycle share the same closure
+
+    entries are keyed by class ID and version of ignored entries, as ignored
+    entries are not expanded and so change results - and by source of ontology
+    data (Wikidata or specific offline ontology graph)
+
+    memory use is bounded, least recently used closures are evicted
+    """
+    def __init__(self, maximum_size=200000):
+        super().__init__(maximum_size)
+
+    def get_cached(self, class_id, ignored_entries_version, source="wikidata"):
+        return self.get((source, ignored_entries_version, class_id))
+
+    def store(self, class_id, ignored_entries_version, closure, source="wikidata"):
+        self.put((source, ignored_entries_version, class_id), closure)
+
+    def ancestors(self, class_id, ignored_entries, ignored_entries_version, get_direct_parents, source="wikidata"):
+        """
+        returns frozenset with class_id and all its direct and indirect superclasses
+
+        ignored entries are neither included nor expanded, with exception of
+        class_id itself - to match wikidata_processing.get_recursive_all_subclass_of
+
+        get_direct_parents(class_id) must return list of IDs of direct superclasses
+        source identifies where get_direct_parents takes data from
+        """
+        closure = self.get_cached(class_id, ignored_entries_version, source)
+        self.record_lookup(closure != None)
+        if closure != None:
+            return closure
+        return self.build_closures(class_id, ignored_entries, ignored_entries_version, get_direct_parents, source)[class_id]
+
+    def build_closures(self, start_id, ignored_entries, ignored_entries_version, get_direct_parents, source="wikidata"):
+        completed = {}
+
+        def useful_direct_parents(class_id):
+            return [parent for parent in get_direct_parents(class_id) if parent not in ignored_entries]
+
+        def is_completed(class_id):
+            # copied, so eviction during this walk will not lose it
+            cached = self.get_cached(class_id, ignored_entries_version, source)
+            if cached != None:
+                completed[class_id] = cached
+            return class_id in completed
+
+        def on_component(members, parents_of):
+            closure = set(members)
+            for member in members:
+                for parent in parents_of[member]:
+                    if parent not in closure:
+                        closure |= completed[parent]
+            closure = frozenset(closure)
+            for member in members:
+                completed[member] = closure
+                self.store(member, ignored_entries_version, closure, source)
+
+        visit_components_bottom_up(start_id, useful_direct_parents, is_completed, on_component)
+        return completed
+
+
+class ClassVerdict:
+    """
+    outcome of checking whether being subclass of given class makes object
+    invalid as a target of primary wikipedia/wikidata link
+
+    reason is None for clean classes, otherwise it is entry from invalid types
+    distance is number of subclass of steps to the banned class
+    """
+    def __init__(self, type_id=None, reason=None, distance=0, ambiguous=False):
+        self.type_id = type_id
+        self.reason = reason
+        self.distance = distance
+        self.ambiguous = ambiguous
+
+    def is_clean(self):
+        return self.reason == None and not self.ambiguous
+
+    def is_extremely_broad(self):
+        return self.reason != None and self.reason.get('extremely_broad_and_unspecific') == True
+
+    def preference_key(self):
+        # specific reasons are preferred over extremely broad ones, then closer ones
+        return (self.is_extremely_broad(), self.distance, self.type_id)
+
+    def one_step_further(self):
+        if self.is_clean() or self.ambiguous:
+            return self
+        return ClassVerdict(self.type_id, self.reason, self.distance + 1)
+
+    def __eq__(self, other):
+        if not isinstance(other, ClassVerdict):
+            return False
+        return (self.type_id, self.distance, self.ambiguous) == (other.type_id, other.distance, other.ambiguous)
+
+    def __repr__(self):
+        if self.ambiguous:
+            return "ClassVerdict(ambiguous)"
+        if self.is_clean():
+            return "ClassVerdict(clean)"
+        return "ClassVerdict(" + self.type_id + ", " + self.reason['what'] + ", distance=" + str(self.distance) + ")"
+
+
+CLEAN = ClassVerdict()
+AMBIGUOUS = ClassVerdict(ambiguous=True)
+
+
+def more_important_verdict(first, second):
+    if first.ambiguous or second.ambiguous:
+        return AMBIGUOUS
+    if first.is_clean():
+        return second
+    if second.is_clean():
+        return first
+    if second.preference_key() < first.preference_key():
+        return second
+    return first
+
+
+class ClassVerdictCache(LeastRecentlyUsedStore):
+    """
+    memoized verdicts for Wikidata classes, computed once per class and propagated
+    through subclass of graph - so checking an object requires looking up verdicts
+    of its instance of values only
+
+    keyed by version of rule tables (including ignored entries), so changing rules
+    invalidates all verdicts - and by source of ontology data
+    """
+    def __init__(self, maximum_size=200000):
+        super().__init__(maximum_size)
+
+    def get_cached(self, class_id, rules_version, excluded_reasons, source="wikidata"):
+        return self.get((source, rules_version, excluded_reasons, class_id))
+
+    def store(self, class_id, rules_version, excluded_reasons, verdict, source="wikidata"):
+        self.put((source, rules_version, excluded_reasons, class_id), verdict)
+
+    def verdict(self, class_id, rules, get_direct_parents, excluded_reasons=frozenset(), source="wikidata"):
+        """
+        rules is OntologyRules instance
+        excluded_reasons is frozenset of 'what' values of reasons that should be skipped
+        source identifies where get_direct_parents takes data from
+        """
+        verdict = self.get_cached(class_id, rules.version, excluded_reasons, source)
+        self.record_lookup(verdict != None)
+        if verdict != None:
+            return verdict
+        return self.build_verdicts(class_id, rules, get_direct_parents, excluded_reasons, source)[class_id]
+
+    def build_verdicts(self, start_id, rules, get_direct_parents, excluded_reasons, source="wikidata"):
+        completed = {}
+
+        def useful_direct_parents(class_id):
+            return [parent for parent in get_direct_parents(class_id) if not rules.is_ignored(parent)]
+
+        def is_completed(class_id):
+            cached = self.get_cached(class_id, rules.version, excluded_reasons, source)
+            if cached != None:
+                completed[class_id] = cached
+            return class_id in completed
+
+        def own_verdict(class_id):
+            if class_id in rules.ambiguous_entries:
+                return AMBIGUOUS
+            reason = rules.reason_why_type_is_invalid(class_id)
+            if reason == None or reason['what'] in excluded_reasons:
+                return CLEAN
+            return ClassVerdict(class_id, reason)
+
+        def on_component(members, parents_of):
+            member_set = set(members)
+            verdicts = {}
+            for member in members:
+                verdict = own_verdict(member)
+                for parent in parents_of[member]:
+                    if parent not in member_set:
+                        verdict = more_important_verdict(verdict, completed[parent].one_step_further())
+                verdicts[member] = verdict
+            # cycle in ontology - propagate within it until nothing changes
+            changed = len(members) > 1
+            while changed:
+                changed = False
+                for member in members:
+                    verdict = verdicts[member]
+                    for parent in parents_of[member]:
+                        if parent in member_set:
+                            verdict = more_important_verdict(verdict, verdicts[parent].one_step_further())
+                    if verdict != verdicts[member]:
+                        verdicts[member] = verdict
+                        changed = True
+            for member in members:
+                completed[member] = verdicts[member]
+                self.store(member, rules.version, excluded_reasons, verdicts[member], source)
+
+        visit_components_bottom_up(start_id, useful_direct_parents, is_completed, on_component)
+        return completed
+
+
+# shared by all detectors in a process
+shared_ancestor_closure_cache = AncestorClosureCache()
+shared_class_verdict_cache = ClassVerdictCache()
@@ -0,0 +1,314 @@
+import array
+import bisect
+import bz2
+import gzip
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+# on-disk format of ontology graph
+#
+# header: magic, then number of nodes, number of P31 edges, number of P279 edges (little endian int64)
+# followed by little endian int64 arrays:
+#   nodes - numeric part of Q-ids of entities with at least one edge, sorted
+#   instance_of_offsets - node_count + 1 entries, CSR offsets into instance_of_targets
+#   instance_of_targets - numeric part of Q-ids
+#   subclass_of_offsets - node_count + 1 entries, CSR offsets into subclass_of_targets
+#   subclass_of_targets - numeric part of Q-ids
+MAGIC = b"WBONTG01"
+HEADER = struct.Struct("<8sqqq")
+ITEM_SIZE = 8
+
+# (node, property, position, target) records of edges while graph is built
+RECORD_SIZE = 4
+RECORDS_IN_MEMORY = 2000000
+SPILL_CHUNK_RECORDS = 100000
+
+
+def open_dump(dump_path):
+    if dump_path.endswith(".gz"):
+        return gzip.open(dump_path, "rt", encoding="utf-8")
+    if dump_path.endswith(".bz2"):
+        return bz2.open(dump_path, "rt", encoding="utf-8")
+    return open(dump_path, "r", encoding="utf-8")
+
+
+def iterate_dump_entities(dump_path):
+    # Wikidata JSON dumps are a single JSON array with one entity per line
+    # see https://www.wikidata.org/wiki/Wikidata:Database_download#JSON_dumps_(recommended)
+    # so it can be streamed without loading everything into memory
+    with open_dump(dump_path) as dump:
+        for line in dump:
+            line = line.strip()
+            if line in ["", "[", "]"]:
+                continue
+            if line[-1] == ",":
+                line = line[:-1]
+            yield json.loads(line)
+
+
+def numeric_id(wikidata_id):
+    return int(wikidata_id[1:])
+
+
+def is_item_id(wikidata_id):
+    return isinstance(wikidata_id, str) and len(wikidata_id) > 1 and wikidata_id[0] == "Q" and wikidata_id[1:].isdigit()
+
+
+def claim_targets(entity, property):
+    # skips the same statements as wikidata_processing.get_useful_direct_parents
+    # and wikidata_processing.get_wikidata_type_ids_of_entry
+    returned = []
+    for claim in entity.get('claims', {}).get(property, []):
+        if 'qualifiers' in claim and 'P2241' in claim['qualifiers']:
+            continue
+        if claim.get('rank') == "deprecated":
+            continue
+        try:
+            target = claim['mainsnak']['datavalue']['value']['id']
+        except (KeyError, TypeError):
+            # "no value" and "unknown value" claims
+            continue
+        if is_item_id(target) and numeric_id(target) not in returned:
+            returned.append(numeric_id(target))
+    return returned
+
+
+def to_little_endian_bytes(values):
+    values = array.array("q", values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+class SpilledRecords:
+    """
+    (node, property, position, target) records, sorted externally - records are
+    buffered in a flat array and each full buffer is sorted and written into
+    a temporary spill file, spill files are merged while reading
+
+    property is 0 for P31 and 1 for P279, position keeps order of claims
+    """
+    def __init__(self, records_in_memory, directory):
+        self.records_in_memory = records_in_memory
+        self.directory = directory
+        self.buffer = array.array("q")
+        self.spill_files = []
+
+    def add(self, node, property, position, target):
+        self.buffer.extend((node, property, position, target))
+        if len(self.buffer) >= RECORD_SIZE * self.records_in_memory:
+            self.spill()
+
+    def spill(self):
+        if len(self.buffer) == 0:
+            return
+        records = sorted(zip(*[iter(self.buffer)] * RECORD_SIZE))
+        self.buffer = array.array("q")
+        spill_file = tempfile.TemporaryFile(dir=self.directory)
+        for start in range(0, len(records), SPILL_CHUNK_RECORDS):
+            sorted_values = array.array("q")
+            for record in records[start:start + SPILL_CHUNK_RECORDS]:
+                sorted_values.extend(record)
+            sorted_values.tofile(spill_file)
+        del records
+        spill_file.seek(0)
+        self.spill_files.append(spill_file)
+
+    def read_spill_file(self, spill_file):
+        while True:
+            values = array.array("q")
+            try:
+                values.fromfile(spill_file, RECORD_SIZE * SPILL_CHUNK_RECORDS)
+            except EOFError:
+                # remaining values are still read
+                pass
+            if len(values) == 0:
+                return
+            yield from zip(*[iter(values)] * RECORD_SIZE)
+
+    def sorted_records(self):
+        self.spill()
+        return heapq.merge(*[self.read_spill_file(spill_file) for spill_file in self.spill_files])
+
+    def close(self):
+        for spill_file in self.spill_files:
+            spill_file.close()
+        self.spill_files = []
+
+
+class SectionWriter:
+    # one array of the graph file, written into a temporary file in little endian int64
+    def __init__(self, directory):
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.buffer = array.array("q")
+        self.count = 0
+
+    def append(self, value):
+        self.buffer.append(value)
+        self.count += 1
+        if len(self.buffer) >= SPILL_CHUNK_RECORDS:
+            self.flush()
+
+    def flush(self):
+        self.file.write(to_little_endian_bytes(self.buffer))
+        self.buffer = array.array("q")
+
+    def copy_into(self, output):
+        self.flush()
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, output)
+        self.file.close()
+
+
+def build_ontology_graph(dump_path, output_path, entity_filter=None, show_progress=False, records_in_memory=RECORDS_IN_MEMORY):
+    """
+    streams local Wikidata JSON dump (latest-all.json.gz, latest-all.json.bz2
+    or a filtered subset of it) and writes compact graph of
+    instance of (P31) and subclass of (P279) edges into output_path
+
+    entity_filter(entity) may be used to skip entities, returning False
+    excludes given entity from the graph
+
+    edges are sorted externally, with at most records_in_memory of them held
+    in memory - so also a full dump may be processed with bounded memory use,
+    temporary files are created next to output_path
+
+    returns number of nodes in the graph
+    """
+    directory = os.path.dirname(os.path.abspath(output_path))
+    records = SpilledRecords(records_in_memory, directory)
+    try:
+        for index, entity in enumerate(iterate_dump_entities(dump_path)):
+            if show_progress and index % 1000000 == 0:
+                print(index, "entities processed")
+            if not is_item_id(entity.get('id')):
+                continue
+            if entity_filter != None and not entity_filter(entity):
+                continue
+            node = numeric_id(entity['id'])
+            for property_index, property in enumerate(['P31', 'P279']):
+                for position, target in enumerate(claim_targets(entity, property)):
+                    records.add(node, property_index, position, target)
+        return write_graph(records.sorted_records(), output_path, directory)
+    finally:
+        records.close()
+
+
+def end_node(offsets, targets):
+    for section_offsets, section_targets in zip(offsets, targets):
+        section_offsets.append(section_targets.count)
+
+
+def write_graph(sorted_records, output_path, directory):
+    nodes = SectionWriter(directory)
+    # offsets start with 0, further ones are appended once node is complete
+    offsets = [SectionWriter(directory), SectionWriter(directory)]
+    targets = [SectionWriter(directory), SectionWriter(directory)]
+    for section in offsets:
+        section.append(0)
+    current = None
+    for node, property_index, _, target in sorted_records:
+        if node != current:
+            if current != None:
+                end_node(offsets, targets)
+            nodes.append(node)
+            current = node
+        targets[property_index].append(target)
+    if current != None:
+        end_node(offsets, targets)
+
+    node_count = nodes.count
+    temporary_path = output_path + ".tmp"
+    with open(temporary_path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, node_count, targets[0].count, targets[1].count))
+        for section in [nodes, offsets[0], targets[0], offsets[1], targets[1]]:
+            section.copy_into(output)
+    os.replace(temporary_path, output_path)
+    return node_count
+
+
+class OntologyGraph:
+    """
+    read-only view of graph written by build_ontology_graph
+
+    file is memory mapped, so loading is fast also for graph built from a full dump
+    answers queries without any network access
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as source:
+            header = source.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError(path + " is not an ontology graph file (truncated header)")
+            magic, self.node_count, self.instance_of_edge_count, self.subclass_of_edge_count = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(path + " is not an ontology graph file (unexpected magic bytes)")
+            expected_size = HEADER.size + ITEM_SIZE * (3 * self.node_count + 2 + self.instance_of_edge_count + self.subclass_of_edge_count)
+            if os.fstat(source.fileno()).st_size != expected_size:
+                raise ValueError(path + " is not an ontology graph file (unexpected size)")
+            self.mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            data = memoryview(self.mapped)[HEADER.size:]
+            if sys.byteorder == "little":
+                data = data.cast("q")
+            else:
+                values = array.array("q", data.tobytes())
+                values.byteswap()
+                data = memoryview(values)
+        position = 0
+        sizes = [self.node_count, self.node_count + 1, self.instance_of_edge_count, self.node_count + 1, self.subclass_of_edge_count]
+        parts = []
+        for size in sizes:
+            parts.append(data[position:position + size])
+            position += size
+        self.nodes, self.instance_of_offsets, self.instance_of_targets, self.subclass_of_offsets, self.subclass_of_targets = parts
+        digest = hashlib.sha256()
+        digest.update(header)
+        digest.update(str(os.stat(path).st_mtime_ns).encode('utf-8'))
+        self.version = "graph:" + digest.hexdigest()[:16]
+
+    def __reduce__(self):
+        # memory map can not be passed to other process, it maps the file again
+        return (OntologyGraph, (self.path,))
+
+    def node_index(self, wikidata_id):
+        if not is_item_id(wikidata_id):
+            return None
+        wanted = numeric_id(wikidata_id)
+        index = bisect.bisect_left(self.nodes, wanted)
+        if index < len(self.nodes) and self.nodes[index] == wanted:
+            return index
+        return None
+
+    def __contains__(self, wikidata_id):
+        return self.node_index(wikidata_id) != None
+
+    def targets(self, wikidata_id, offsets, targets):
+        index = self.node_index(wikidata_id)
+        if index == None:
+            return []
+        return ["Q" + str(target) for target in targets[offsets[index]:offsets[index + 1]]]
+
+    def instance_of_ids(self, wikidata_id):
+        # matches wikidata_processing.get_wikidata_type_ids_of_entry - None if there are no P31 values
+        returned = self.targets(wikidata_id, self.instance_of_offsets, self.instance_of_targets)
+        if returned == []:
+            return None
+        return returned
+
+    def direct_superclasses(self, wikidata_id):
+        return self.targets(wikidata_id, self.subclass_of_offsets, self.subclass_of_targets)
+
+
+if __name__ == "__main__":
+    # python3 -m wikibrain.ontology_graph latest-all.json.gz ontology.graph
+    if len(sys.argv) != 3:
+        print("usage: python3 -m wikibrain.ontology_graph <wikidata dump> <output graph file>")
+        sys.exit(1)
+    print(build_ontology_graph(sys.argv[1], sys.argv[2], show_progress=True), "nodes in the ontology graph")
@@ -0,0 +1,173 @@
+import os
+import sys
+import osm_iterator
+from lxml import etree
+from wikibrain import element_filter
+from wikibrain import report_sink
+from wikibrain import wikimedia_link_issue_reporter
+
+ACTIONS = ["create", "modify", "delete"]
+OSM_TYPES = ["node", "way", "relation"]
+
+
+def link_of(osm_type, osm_id):
+    # the same as osm_iterator.Element.get_link
+    return "https://www.openstreetmap.org/" + osm_type + "/" + str(osm_id)
+
+
+def iterate_changes(source):
+    """
+    source is path or file object with OsmChange (.osc) data
+
+    yields (action, lxml element) for every changed node, way and relation,
+    element is cleared after it is processed - so even huge diffs are streamed
+    """
+    action = None
+    for event, lxml_element in etree.iterparse(source, events=("start", "end")):
+        if lxml_element.tag in ACTIONS:
+            if event == "start":
+                action = lxml_element.tag
+            else:
+                action = None
+                lxml_element.clear()
+            continue
+        if event != "end" or lxml_element.tag not in OSM_TYPES or action == None:
+            continue
+        yield action, lxml_element
+        lxml_element.clear()
+
+
+class ChangeLocations:
+    """
+    used by osm_iterator.Element to locate ways and relations, OsmChange has
+    no geometry of them - only nodes changed in the same diff are known
+
+    known_locations maps links of objects to (lat, lon), for example locations
+    of already reported problems - used if nodes are not part of diff
+    """
+    def __init__(self, known_locations=None):
+        self.node_coordinates = {}
+        if known_locations == None:
+            known_locations = {}
+        self.known_locations = known_locations
+
+    def add_node(self, lxml_element):
+        if "lat" in lxml_element.attrib and "lon" in lxml_element.attrib:
+            self.node_coordinates[lxml_element.attrib["id"]] = (float(lxml_element.attrib["lat"]), float(lxml_element.attrib["lon"]))
+
+    def get_coords_of_complex_object(self, lxml_element):
+        coordinates = []
+        for member in lxml_element:
+            if member.tag == "nd" or (member.tag == "member" and member.attrib.get("type") == "node"):
+                coordinates.append(self.node_coordinates.get(member.attrib["ref"]))
+        if coordinates != [] and None not in coordinates:
+            lats = [lat for lat, _ in coordinates]
+            lons = [lon for _, lon in coordinates]
+            return osm_iterator.Coord((min(lats) + max(lats)) / 2, (min(lons) + max(lons)) / 2)
+        lat, lon = self.known_locations.get(link_of(lxml_element.tag, lxml_element.attrib["id"]), (None, None))
+        return osm_iterator.Coord(lat, lon)
+
+
+class ReportSet:
+    """
+    reported problems (ErrorReport.data() dictionaries), keyed by link of OSM object
+
+    stored in any format supported by report_sink, recognised by extension
+    """
+    def __init__(self, reports=None):
+        self.reports = {}
+        for report in reports or []:
+            self.reports[report["osm_object_url"]] = report
+
+    @staticmethod
+    def load(filepath):
+        if not os.path.isfile(filepath):
+            return ReportSet()
+        return ReportSet(report_sink.iterate_reports(filepath))
+
+    def save(self, filepath):
+        # written atomically, so readers never see partially updated reports
+        with report_sink.open_report_sink(filepath) as sink:
+            sink.write_all(self.reports.values())
+
+    def replace(self, report):
+        self.reports[report["osm_object_url"]] = report
+
+    def drop(self, osm_object_url):
+        # returns whether report was present
+        return self.reports.pop(osm_object_url, None) != None
+
+    def known_locations(self):
+        returned = {}
+        for link, report in self.reports.items():
+            if report.get("location") != None:
+                returned[link] = tuple(report["location"])
+        return returned
+
+    def __len__(self):
+        return len(self.reports)
+
+
+class DeltaProcessor:
+    """
+    updates report set based on OsmChange diff - only created and modified
+    objects with wikipedia or wikidata tags are checked
+
+    reports of deleted objects and of objects without problems are dropped
+    """
+    def __init__(self, detector, report_set):
+        self.detector = detector
+        self.report_set = report_set
+        self.checked = 0
+        self.skipped = 0
+        self.reported = 0
+        self.dropped = 0
+
+    def process(self, source):
+        locations = ChangeLocations(self.report_set.known_locations())
+        for action, lxml_element in iterate_changes(source):
+            if lxml_element.tag == "node" and action != "delete":
+                locations.add_node(lxml_element)
+            link = link_of(lxml_element.tag, lxml_element.attrib["id"])
+            if action == "delete":
+                self.drop(link)
+                continue
+            element = osm_iterator.Element(lxml_element, locations)
+            if not element_filter.is_relevant(element.get_tag_dictionary()):
+                # wiki tags may have been removed, also fixing reported problem
+                self.skipped += 1
+                self.drop(link)
+                continue
+            self.checked += 1
+            problem = self.detector.get_problem_for_given_element(element)
+            if problem == None:
+                self.drop(link)
+                continue
+            problem.bind_to_element(element)
+            self.report_set.replace(problem.data())
+            self.reported += 1
+
+    def drop(self, link):
+        if self.report_set.drop(link):
+            self.dropped += 1
+
+    def summary(self):
+        return str(self.checked) + " changed objects checked, " + str(self.skipped) + " without wiki tags skipped, " + str(self.reported) + " reported, " + str(self.dropped) + " reports dropped"
+
+
+def update_reports(report_filepath, change_filepath, detector=None):
+    if detector == None:
+        detector = wikimedia_link_issue_reporter.WikimediaLinkIssueDetector()
+    report_set = ReportSet.load(report_filepath)
+    processor = DeltaProcessor(detector, report_set)
+    processor.process(change_filepath)
+    report_set.save(report_filepath)
+    return processor
+
+
+if __name__ == "__main__":
+    # python3 -m wikibrain.osm_change reports.yaml changes.osc
+    if len(sys.argv) != 3:
+        print("usage: python3 -m wikibrain.osm_change <file with reports (.yaml, .jsonl or .csv), updated in place> <OsmChange .osc file>")
+        sys.exit(1)
+    print(update_reports(sys.argv[1], sys.argv[2]).summary())
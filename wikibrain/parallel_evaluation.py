@@ -0,0 +1,190 @@
+import collections
+import concurrent.futures
+import inspect
+import threading
+import urllib.parse
+from wikimedia_connection import wikimedia_connection
+from wikibrain import ontology_closure_cache
+
+# polite default, see https://www.mediawiki.org/wiki/API:Etiquette
+REQUESTS_PER_HOST = 4
+
+NOT_CACHED = object()
+
+
+class SingleFlightCache:
+    """
+    thread-safe in-memory cache, where concurrent requests for the same key
+    are deduplicated - only the first one computes value, others wait for it
+
+    failures are not cached, exception is passed to all waiting threads
+    """
+    def __init__(self, maximum_size=100000):
+        self.store = ontology_closure_cache.LeastRecentlyUsedStore(maximum_size)
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.computed = 0
+
+    def __len__(self):
+        return len(self.store)
+
+    def get_or_compute(self, key, compute):
+        value = self.store.get(key, NOT_CACHED)
+        self.store.record_lookup(value is not NOT_CACHED)
+        if value is not NOT_CACHED:
+            return value
+        with self.lock:
+            # may be completed since lookup above
+            value = self.store.get(key, NOT_CACHED)
+            if value is not NOT_CACHED:
+                return value
+            future = self.in_flight.get(key)
+            owner = future == None
+            if owner:
+                future = concurrent.futures.Future()
+                self.in_flight[key] = future
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+        self.store.put(key, value)
+        with self.lock:
+            self.computed += 1
+            del self.in_flight[key]
+        future.set_result(value)
+        return value
+
+
+class HostConcurrencyLimiter:
+    """
+    limits number of requests running at the same time to a single host
+    """
+    def __init__(self, requests_per_host=REQUESTS_PER_HOST):
+        self.requests_per_host = requests_per_host
+        self.lock = threading.Lock()
+        self.semaphores = {}
+
+    def semaphore_for(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            if host not in self.semaphores:
+                self.semaphores[host] = threading.BoundedSemaphore(self.requests_per_host)
+            return self.semaphores[host]
+
+    def wrap(self, download):
+        def limited_download(url, *args, **kwargs):
+            with self.semaphore_for(url):
+                return download(url, *args, **kwargs)
+        return limited_download
+
+
+class SharedWikimediaCache:
+    """
+    in-memory cache layer in front of wikimedia_connection, shared by all threads
+
+    wikimedia_connection is a module with a global state, so while installed
+    its cached getters and download function are replaced by wrapped versions -
+    also calls made internally by wikimedia_connection go through them
+
+    returned data is shared between threads and must be treated as read-only
+    """
+    cached_functions = ["get_data_from_wikidata_by_id", "get_data_from_wikidata", "get_wikipedia_page", "get_from_generic_url"]
+
+    def __init__(self, maximum_size=100000, requests_per_host=REQUESTS_PER_HOST):
+        self.cache = SingleFlightCache(maximum_size)
+        self.limiter = HostConcurrencyLimiter(requests_per_host)
+        self.originals = None
+        self.lock = threading.Lock()
+        self.install_count = 0
+
+    def wrap(self, name, function):
+        signature = inspect.signature(function)
+
+        def cached_function(*args, **kwargs):
+            # get(id) and get(id, False) and get(id, forced_refresh=False) are the same request
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            key = (name, tuple(arguments.arguments.items()))
+            return self.cache.get_or_compute(key, lambda: function(*args, **kwargs))
+        return cached_function
+
+    def install(self):
+        with self.lock:
+            self.install_count += 1
+            if self.install_count > 1:
+                return
+            self.originals = {}
+            for name in self.cached_functions + ["download"]:
+                self.originals[name] = getattr(wikimedia_connection, name)
+            for name in self.cached_functions:
+                setattr(wikimedia_connection, name, self.wrap(name, self.originals[name]))
+            wikimedia_connection.download = self.limiter.wrap(self.originals["download"])
+
+    def uninstall(self):
+        with self.lock:
+            self.install_count -= 1
+            if self.install_count > 0:
+                return
+            for name, function in self.originals.items():
+                setattr(wikimedia_connection, name, function)
+            self.originals = None
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.uninstall()
+
+
+class ParallelElementEvaluator:
+    """
+    checks elements on a thread pool, reports are returned in input order
+
+    checking is dominated by waiting for Wikidata and Wikipedia responses,
+    so threads are useful despite GIL
+
+    single detector is shared by all threads
+    """
+    def __init__(self, detector, thread_count=8, shared_cache=None, requests_per_host=REQUESTS_PER_HOST):
+        self.detector = detector
+        self.thread_count = thread_count
+        if shared_cache == None:
+            shared_cache = SharedWikimediaCache(requests_per_host=requests_per_host)
+        self.shared_cache = shared_cache
+
+    def iterate_results(self, function, items):
+        # bounded number of queued items, so also very long streams may be processed
+        maximum_queued = self.thread_count * 4
+        with self.shared_cache:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.thread_count) as executor:
+                queued = collections.deque()
+                for item in items:
+                    queued.append(executor.submit(function, item))
+                    if len(queued) >= maximum_queued:
+                        yield queued.popleft().result()
+                while len(queued) > 0:
+                    yield queued.popleft().result()
+
+    def iterate_reports(self, elements):
+        """
+        yields report (or None) for each element, in the same order as elements
+        """
+        return self.iterate_results(self.detector.get_problem_for_given_element, elements)
+
+    def evaluate(self, elements):
+        return list(self.iterate_reports(elements))
+
+    def evaluate_tags(self, tag_entries):
+        """
+        tag_entries are (tags, object_type, object_description) tuples
+        """
+        def check(entry):
+            tags, object_type, object_description = entry
+            return self.detector.get_problem_for_given_tags(tags, object_type, object_description)
+        return list(self.iterate_results(check, tag_entries))
@@ -0,0 +1,159 @@
+import random
+import yaml
+from wikibrain import report_sink
+
+
+def linked_wikidata_ids(data):
+    # Wikidata IDs that report is about, from prerequisite and from tags of element
+    returned = []
+    for source in [data.get("prerequisite") or {}, data.get("tags") or {}]:
+        for key, value in source.items():
+            if key.endswith("wikidata") and isinstance(value, str) and value not in returned:
+                returned.append(value)
+    return returned
+
+
+def country_lookup_by_location(country_index):
+    """
+    returns function locating reports in countries of country_lookup.CountryIndex,
+    it returns None for reports outside all countries or without location
+    """
+    def country_of(data):
+        location = data.get("location")
+        if location == None or None in location:
+            return None
+        countries = country_index.countries_at(location[0], location[1])
+        if countries == []:
+            return None
+        return countries[0]
+    return country_of
+
+
+class SpaceSavingCounter:
+    """
+    approximate counts of the most frequent values, using at most capacity entries
+
+    (Metwally, Agrawal, El Abbadi "Efficient computation of frequent and top-k
+    elements in data streams") - each count may be overestimated by at most
+    its error, values counted more often than total/capacity are always present
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # value -> [count, error]
+        self.counters = {}
+
+    def add(self, value):
+        counter = self.counters.get(value)
+        if counter != None:
+            counter[0] += 1
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[value] = [1, 0]
+            return
+        evicted = min(self.counters, key=lambda key: self.counters[key][0])
+        minimum = self.counters.pop(evicted)[0]
+        self.counters[value] = [minimum + 1, minimum]
+
+    def top(self, count):
+        # list of (value, count, maximum overestimation), the most frequent first
+        ordered = sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))
+        return [(value, counter[0], counter[1]) for value, counter in ordered[:count]]
+
+
+class ReservoirSample:
+    # uniform sample of fixed size from a stream of unknown length
+    def __init__(self, size, generator):
+        self.size = size
+        self.generator = generator
+        self.seen = 0
+        self.values = []
+
+    def add(self, value):
+        self.seen += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+            return
+        index = self.generator.randrange(self.seen)
+        if index < self.size:
+            self.values[index] = value
+
+
+class ErrorClassStatistics:
+    def __init__(self, top_k, sample_size, generator):
+        self.count = 0
+        self.wikidata_ids = SpaceSavingCounter(top_k * 10)
+        self.examples = ReservoirSample(sample_size, generator)
+
+
+class ReportAggregator:
+    """
+    statistics of reports gathered while they are produced, without keeping them
+
+    memory use is bounded regardless of number of reports - counts per error
+    class and per country are exact, the most frequent Wikidata IDs per error
+    class are approximated with bounded counters, also a small random sample
+    of examples is kept per error class
+
+    country_of is optional function called with ErrorReport.data() dictionary,
+    returning country of report or None, see country_lookup_by_location
+    """
+    def __init__(self, top_k=10, sample_size=5, country_of=None, seed=None):
+        self.top_k = top_k
+        self.sample_size = sample_size
+        self.country_of = country_of
+        self.generator = random.Random(seed)
+        self.total = 0
+        self.error_classes = {}
+        self.countries = {}
+
+    def add(self, report):
+        data = report_sink.data_of(report)
+        self.total += 1
+        statistics = self.error_classes.get(data["error_id"])
+        if statistics == None:
+            statistics = ErrorClassStatistics(self.top_k, self.sample_size, self.generator)
+            self.error_classes[data["error_id"]] = statistics
+        statistics.count += 1
+        for wikidata_id in linked_wikidata_ids(data):
+            statistics.wikidata_ids.add(wikidata_id)
+        statistics.examples.add(data)
+        if self.country_of != None:
+            country = self.country_of(data)
+            self.countries[country] = self.countries.get(country, 0) + 1
+
+    def add_all(self, reports):
+        for report in reports:
+            self.add(report)
+
+    def observe(self, reports):
+        # passes reports through, so aggregation may be chained with writing them
+        for report in reports:
+            self.add(report)
+            yield report
+
+    def statistics(self):
+        error_classes = {}
+        for error_id in sorted(self.error_classes, key=lambda error_id: (-self.error_classes[error_id].count, error_id)):
+            statistics = self.error_classes[error_id]
+            error_classes[error_id] = {
+                "count": statistics.count,
+                "top_wikidata_ids": [{"wikidata": value, "count": count, "maximum_overestimation": error} for value, count, error in statistics.wikidata_ids.top(self.top_k)],
+                "examples": list(statistics.examples.values),
+            }
+        returned = {"total": self.total, "error_classes": error_classes}
+        if self.country_of != None:
+            returned["countries"] = {str(country): count for country, count in sorted(self.countries.items(), key=lambda entry: (-entry[1], str(entry[0])))}
+        return returned
+
+    def summary(self):
+        lines = [str(self.total) + " reports"]
+        for error_id, statistics in self.statistics()["error_classes"].items():
+            lines.append(str(statistics["count"]) + " " + error_id)
+            for entry in statistics["top_wikidata_ids"]:
+                lines.append("    " + str(entry["count"]) + " " + entry["wikidata"])
+        return "\n".join(lines)
+
+    def write_statistics(self, filepath):
+        # emitted once at the end of run
+        with open(filepath, 'w') as outfile:
+            yaml.dump(self.statistics(), outfile, Dumper=report_sink.yaml_dumper(), default_flow_style=False, sort_keys=False)
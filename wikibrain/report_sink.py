@@ -0,0 +1,186 @@
+import csv
+import json
+import os
+import threading
+import yaml
+
+# the same fields as in ErrorReport.data()
+REPORT_COLUMNS = ["error_id", "error_message", "error_general_intructions", "debug_log", "osm_object_url", "proposed_tagging_changes", "extra_data", "prerequisite", "location", "tags"]
+
+BUFFER_SIZE = 1000
+
+
+class ReportDumper(getattr(yaml, "CDumper", yaml.Dumper)):
+    # C implementation is many times faster, but it is not always compiled
+    def ignore_aliases(self, data):
+        # values shared between reports are written in full, so every
+        # report may be parsed on its own
+        return True
+
+
+def yaml_dumper():
+    return ReportDumper
+
+
+def yaml_loader():
+    # locations are dumped as Python tuples, so safe loader is not enough
+    return getattr(yaml, "CFullLoader", yaml.FullLoader)
+
+
+def data_of(report):
+    # ErrorReport or already serialized ErrorReport.data() dictionary
+    if isinstance(report, dict):
+        return report
+    return report.data()
+
+
+def normalized(data):
+    # formats without tuples return location as list
+    if isinstance(data.get("location"), list):
+        data["location"] = tuple(data["location"])
+    return data
+
+
+class ReportSink:
+    """
+    writes reports in batches, to a temporary file that replaces target
+    file once sink is closed - so readers never see partially written output
+
+    if sink is closed due to an exception, target file is left unchanged
+
+    subclasses must implement write_batch and may implement write_header
+    """
+    def __init__(self, filepath, buffer_size=BUFFER_SIZE):
+        self.filepath = filepath
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.written = 0
+        self.temporary_filepath = filepath + ".tmp" + str(os.getpid()) + "_" + str(threading.get_ident())
+        self.file = open(self.temporary_filepath, 'w', encoding='utf-8', newline='')
+        self.write_header()
+
+    def write_header(self):
+        pass
+
+    def write(self, report):
+        self.buffer.append(data_of(report))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_all(self, reports):
+        for report in reports:
+            self.write(report)
+
+    def flush(self):
+        if self.buffer != []:
+            self.write_batch(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        os.replace(self.temporary_filepath, self.filepath)
+
+    def discard(self):
+        self.file.close()
+        os.remove(self.temporary_filepath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        if exception_type == None:
+            self.close()
+        else:
+            self.discard()
+
+
+class YamlReportSink(ReportSink):
+    """
+    YAML list, the same as produced by repeated ErrorReport.yaml_output
+    """
+    def write_batch(self, batch):
+        yaml.dump(batch, self.file, Dumper=yaml_dumper(), default_flow_style=False)
+
+
+class JsonLinesReportSink(ReportSink):
+    def write_batch(self, batch):
+        self.file.write("".join(json.dumps(data, ensure_ascii=False) + "\n" for data in batch))
+
+
+class CsvReportSink(ReportSink):
+    """
+    one column per field, structured values (tags, prerequisite, location...)
+    are stored as JSON
+    """
+    def write_header(self):
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(REPORT_COLUMNS)
+
+    def write_batch(self, batch):
+        self.writer.writerows([json.dumps(data.get(column), ensure_ascii=False) for column in REPORT_COLUMNS] for data in batch)
+
+
+SINKS = {
+    ".yaml": YamlReportSink,
+    ".yml": YamlReportSink,
+    ".jsonl": JsonLinesReportSink,
+    ".csv": CsvReportSink,
+}
+
+
+def format_of(filepath):
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in SINKS:
+        raise ValueError("unable to recognise format of reports in " + filepath + " (expected " + ", ".join(sorted(SINKS)) + ")")
+    return extension
+
+
+def open_report_sink(filepath, buffer_size=BUFFER_SIZE):
+    return SINKS[format_of(filepath)](filepath, buffer_size)
+
+
+def iterate_yaml_reports(infile):
+    # every top level list entry is parsed on its own, so whole file is never loaded at once
+    entry = []
+    for line in infile:
+        if line.startswith("- ") or line.rstrip("\n") == "-":
+            if entry != []:
+                yield from yaml.load("".join(entry), Loader=yaml_loader())
+            entry = []
+        entry.append(line)
+    if entry != []:
+        loaded = yaml.load("".join(entry), Loader=yaml_loader())
+        if loaded != None:
+            yield from loaded
+
+
+def iterate_json_lines_reports(infile):
+    for line in infile:
+        if line.strip() != "":
+            yield json.loads(line)
+
+
+def iterate_csv_reports(infile):
+    for row in csv.DictReader(infile):
+        yield {column: json.loads(row[column]) for column in REPORT_COLUMNS}
+
+
+READERS = {
+    ".yaml": iterate_yaml_reports,
+    ".yml": iterate_yaml_reports,
+    ".jsonl": iterate_json_lines_reports,
+    ".csv": iterate_csv_reports,
+}
+
+
+def iterate_reports(filepath):
+    """
+    yields ErrorReport.data() dictionaries from file written by a report sink
+    (or by ErrorReport.yaml_output), format is recognised by extension
+    """
+    reader = READERS[format_of(filepath)]
+    with open(filepath, encoding='utf-8', newline='') as infile:
+        for data in reader(infile):
+            yield normalized(data)
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from wikibrain import sharded_runner
+from wikibrain import wikimedia_link_issue_reporter
+
+# marks revision of entities that could not be checked, never equal to a stored one
+UNKNOWN_REVISION = object()
+
+REPORT_FIELDS = ["error_id", "error_message", "error_general_intructions", "debug_log", "prerequisite", "extra_data", "proposed_tagging_changes"]
+
+
+def input_hash(tags, location, object_type):
+    # location is included as some problems depend on it
+    data = [sorted(tags.items()), location, object_type]
+    return hashlib.sha256(json.dumps(data).encode('utf-8')).hexdigest()[:32]
+
+
+def report_to_json(problem):
+    if problem == None:
+        return json.dumps(None)
+    return json.dumps({field: getattr(problem, field) for field in REPORT_FIELDS})
+
+
+def report_from_json(text):
+    fields = json.loads(text)
+    if fields == None:
+        return None
+    return wikimedia_link_issue_reporter.ErrorReport(**fields)
+
+
+def entry_of_element(detector, element):
+    # (element ID, tags, location, object type, object description), as used by IncrementalValidator
+    location = (element.get_coords().lat, element.get_coords().lon)
+    return (element.get_link(), element.get_tag_dictionary(), location, element.get_element().tag, detector.describe_osm_object(element))
+
+
+class RevalidationStore:
+    """
+    persistent results of checks, keyed by ID of OSM element
+
+    each entry has hash of checked input (tags, location, object type),
+    version of rules of detector, revisions (lastrevid) of all Wikidata
+    entities consulted while checking and reported problem
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (element_id TEXT PRIMARY KEY, input_hash TEXT NOT NULL, rules_version TEXT NOT NULL, revisions TEXT NOT NULL, problem TEXT NOT NULL)")
+        self.connection.commit()
+
+    def get_many(self, element_ids):
+        """
+        returns dictionary of element ID to entry, a dictionary with input_hash,
+        rules_version, revisions and problem (JSON text) - missing elements are skipped
+        """
+        element_ids = list(element_ids)
+        returned = {}
+        with self.lock:
+            # stays below limit of number of parameters in a query
+            for start in range(0, len(element_ids), 500):
+                batch = element_ids[start:start + 500]
+                query = "SELECT element_id, input_hash, rules_version, revisions, problem FROM results WHERE element_id IN (" + ",".join("?" * len(batch)) + ")"
+                for element_id, hashed, rules_version, revisions, problem in self.connection.execute(query, batch):
+                    returned[element_id] = {"input_hash": hashed, "rules_version": rules_version, "revisions": json.loads(revisions), "problem": problem}
+        return returned
+
+    def put_many(self, entries):
+        # entries are (element ID, entry) pairs
+        with self.lock:
+            with self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO results (element_id, input_hash, rules_version, revisions, problem) VALUES (?, ?, ?, ?, ?)", ((element_id, entry["input_hash"], entry["rules_version"], json.dumps(entry["revisions"], sort_keys=True), entry["problem"]) for element_id, entry in entries))
+
+    def delete_many(self, element_ids):
+        with self.lock:
+            with self.connection:
+                self.connection.executemany("DELETE FROM results WHERE element_id = ?", ((element_id,) for element_id in element_ids))
+
+    def element_ids(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT element_id FROM results ORDER BY element_id")]
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+
+class IncrementalValidator:
+    """
+    checks elements, reusing stored results for elements with the same input
+    where all consulted Wikidata entities are still at the same revision and
+    rules of detector are unchanged
+
+    revisions_of is called with list of Wikidata IDs and returns their current
+    revisions, for example WikimediaPrefetcher.fetch_revisions - by default
+    revisions present in cache are used, so only refreshed entities are noticed
+
+    superclasses of classes of linked entities are not tracked, as they are
+    shared by very many elements - changes in Wikidata ontology are picked up
+    after bumping RULES_VERSION or clearing the store
+    """
+    def __init__(self, detector, store, revisions_of=None, batch_size=500):
+        self.detector = detector
+        self.store = store
+        if revisions_of == None:
+            revisions_of = detector.revisions_of_entities
+        self.revisions_of = revisions_of
+        self.batch_size = batch_size
+        # revisions are checked once per run
+        self.current_revisions = {}
+        self.reused = 0
+        self.evaluated = 0
+
+    def check_revisions(self, wikidata_ids):
+        missing = sorted(set(wikidata_ids) - set(self.current_revisions))
+        if missing != []:
+            found = self.revisions_of(missing)
+            for wikidata_id in missing:
+                self.current_revisions[wikidata_id] = found.get(wikidata_id, UNKNOWN_REVISION)
+
+    def is_reusable(self, entry, hashed):
+        if entry == None or entry["input_hash"] != hashed or entry["rules_version"] != self.detector.rules_version:
+            return False
+        for wikidata_id, revision in entry["revisions"].items():
+            if self.current_revisions.get(wikidata_id, UNKNOWN_REVISION) != revision:
+                return False
+        return True
+
+    def iterate_problems(self, entries):
+        """
+        entries are (element ID, tags, location, object type, object description)
+        tuples, see entry_of_element
+
+        yields (element ID, problem) for each entry, in input order
+        """
+        for batch in sharded_runner.shards_of(entries, self.batch_size):
+            hashes = [input_hash(tags, location, object_type) for _, tags, location, object_type, _ in batch]
+            stored = self.store.get_many([entry[0] for entry in batch])
+            consulted = set()
+            for (element_id, _, _, _, _), hashed in zip(batch, hashes):
+                entry = stored.get(element_id)
+                if entry != None and entry["input_hash"] == hashed:
+                    consulted.update(entry["revisions"])
+            self.check_revisions(consulted)
+
+            updated = []
+            returned = []
+            for (element_id, tags, location, object_type, object_description), hashed in zip(batch, hashes):
+                entry = stored.get(element_id)
+                if self.is_reusable(entry, hashed):
+                    self.reused += 1
+                    returned.append((element_id, report_from_json(entry["problem"])))
+                    continue
+                self.evaluated += 1
+                problem, consulted_entities = self.detector.get_problem_and_consulted_entities_generic(tags, location, object_type, object_description)
+                revisions = self.detector.revisions_of_entities(consulted_entities)
+                updated.append((element_id, {"input_hash": hashed, "rules_version": self.detector.rules_version, "revisions": revisions, "problem": report_to_json(problem)}))
+                returned.append((element_id, problem))
+            self.store.put_many(updated)
+            yield from returned
+
+    def run(self, entries):
+        return list(self.iterate_problems(entries))
+
+    def summary(self):
+        return str(self.evaluated) + " elements checked, " + str(self.reused) + " results reused"
@@ -0,0 +1,129 @@
+import collections
+import concurrent.futures
+import itertools
+import os
+import threading
+from wikimedia_connection import wikimedia_connection
+from wikibrain import cache_store
+from wikibrain import wikimedia_link_issue_reporter
+
+SHARD_SIZE = 500
+
+# state of a worker process, set by initialize_worker
+worker_detector = None
+original_write_to_file = wikimedia_connection.write_to_file
+
+
+def write_to_file_atomically(filename, content, access_mode):
+    """
+    replacement for wikimedia_connection.write_to_file, safe when several
+    processes write and read the same cache file - readers see either old
+    or new content, never a partially written file
+    """
+    temporary_filename = filename + ".tmp" + str(os.getpid()) + "_" + str(threading.get_ident())
+    try:
+        with open(temporary_filename, access_mode) as temporary_file:
+            temporary_file.write(content)
+        os.replace(temporary_filename, filename)
+    except OSError:
+        if os.path.exists(temporary_filename):
+            os.remove(temporary_filename)
+        # handles and reports failures
+        original_write_to_file(filename, content, access_mode)
+
+
+def use_atomic_cache_writes():
+    wikimedia_connection.write_to_file = write_to_file_atomically
+
+
+def initialize_worker(cache_location, cache_store_path, detector_arguments):
+    global worker_detector
+    if cache_location != None:
+        wikimedia_connection.set_cache_location(cache_location)
+    if cache_store_path != None:
+        cache_store.set_cache_store(cache_store.open_cache_store(cache_store_path))
+    else:
+        use_atomic_cache_writes()
+    worker_detector = wikimedia_link_issue_reporter.WikimediaLinkIssueDetector(**detector_arguments)
+
+
+def check_shard(shard):
+    returned = []
+    for tags, location, object_type, object_description in shard:
+        returned.append(worker_detector.get_the_most_important_problem_generic(tags, location, object_type, object_description))
+    return returned
+
+
+def entry_of_element(detector, element):
+    # (tags, location, object type, object description), as used by ShardedRunner
+    location = (element.get_coords().lat, element.get_coords().lon)
+    return (element.get_tag_dictionary(), location, element.get_element().tag, detector.describe_osm_object(element))
+
+
+def current_cache_location():
+    return getattr(wikimedia_connection, "cache_location_store", None)
+
+
+def shards_of(entries, shard_size):
+    entries = iter(entries)
+    while True:
+        shard = list(itertools.islice(entries, shard_size))
+        if shard == []:
+            return
+        yield shard
+
+
+class ShardedRunner:
+    """
+    checks large number of objects on a process pool
+
+    entries are split into shards of consecutive entries, each worker process
+    has its own WikimediaLinkIssueDetector - workers share on-disk cache of
+    wikimedia_connection, written atomically, or cache store (by default one
+    set with cache_store.set_cache_store in this process)
+
+    results are merged in input order, so output does not depend on number of
+    processes or on which shard finished first
+    """
+    def __init__(self, process_count=None, shard_size=SHARD_SIZE, cache_location=None, detector_arguments=None, mp_context=None, cache_store_path=None):
+        if process_count == None:
+            process_count = os.cpu_count()
+        self.process_count = process_count
+        self.shard_size = shard_size
+        if cache_location == None:
+            cache_location = current_cache_location()
+        self.cache_location = cache_location
+        if detector_arguments == None:
+            detector_arguments = {}
+        if "cache_store" in detector_arguments:
+            # store can not be passed to other processes, workers open it again
+            detector_arguments = dict(detector_arguments)
+            cache_store_path = detector_arguments.pop("cache_store").path
+        self.detector_arguments = detector_arguments
+        if cache_store_path == None:
+            cache_store_path = cache_store.current_cache_store_path()
+        if cache_store_path != None and cache_store_path.endswith(".dbm"):
+            raise ValueError("dbm cache store can not be shared by worker processes, use .sqlite one")
+        self.cache_store_path = cache_store_path
+        self.mp_context = mp_context
+
+    def iterate_problems(self, entries):
+        """
+        entries are (tags, location, object_type, object_description) tuples,
+        see entry_of_element - location is (latitude, longitude) tuple or None
+
+        yields problem (ErrorReport or None) for each entry, in input order,
+        the same as get_problem_for_given_element would return
+        """
+        maximum_queued = self.process_count * 2
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.process_count, mp_context=self.mp_context, initializer=initialize_worker, initargs=(self.cache_location, self.cache_store_path, self.detector_arguments)) as executor:
+            queued = collections.deque()
+            for shard in shards_of(entries, self.shard_size):
+                queued.append(executor.submit(check_shard, shard))
+                if len(queued) >= maximum_queued:
+                    yield from queued.popleft().result()
+            while len(queued) > 0:
+                yield from queued.popleft().result()
+
+    def run(self, entries):
+        return list(self.iterate_problems(entries))
@@ -0,0 +1,78 @@
+from wikibrain import ontology_closure_cache
+from wikibrain import entity_projection
+
+NOT_CACHED = object()
+
+
+def interwiki_rank_map(languages_ordered_by_preference, all_languages):
+    """
+    maps sitelink site (for example "dewiki") to (rank, language code),
+    lower rank is preferred - the first occurrence of language decides its rank
+    """
+    returned = {}
+    for language_code in list(languages_ordered_by_preference) + list(all_languages):
+        if language_code == None:
+            continue
+        site = language_code + 'wiki'
+        if site not in returned:
+            returned[site] = (len(returned), language_code)
+    return returned
+
+
+def best_interwiki_link(sitelinks, rank_map):
+    """
+    sitelinks is a dictionary of site to title, as in Wikidata entity
+
+    returns the most preferred link in language_code:article form or None
+    """
+    best = None
+    for site, title in sitelinks.items():
+        ranked = rank_map.get(site)
+        if ranked == None:
+            continue
+        if best == None or ranked[0] < best[0][0]:
+            best = (ranked, title)
+    if best == None:
+        return None
+    return best[0][1] + ':' + best[1]
+
+
+class SitelinkIndex(ontology_closure_cache.LeastRecentlyUsedStore):
+    """
+    memoized best Wikipedia links of Wikidata entities
+
+    sitelinks of each entity are read once from its projection, entries are
+    keyed by entity and by preference profile - as detectors with different
+    language preferences pick different links
+    """
+    def __init__(self, maximum_size=100000, entity_projection_cache=None):
+        super().__init__(maximum_size)
+        if entity_projection_cache == None:
+            entity_projection_cache = entity_projection.shared_entity_projection_cache
+        self.entity_projection_cache = entity_projection_cache
+
+    def sitelinks(self, wikidata_id, forced_refresh=False):
+        entity = self.entity_projection_cache.entity(wikidata_id, forced_refresh)
+        if entity == None:
+            return {}
+        return {site: sitelink['title'] for site, sitelink in entity.get('sitelinks', {}).items()}
+
+    def best_link(self, wikidata_id, profile, rank_map, forced_refresh=False):
+        """
+        profile identifies rank_map, for example tuple of preferred languages
+        """
+        if wikidata_id == None:
+            return None
+        key = (wikidata_id, profile)
+        if not forced_refresh:
+            cached = self.get(key, NOT_CACHED)
+            self.record_lookup(cached is not NOT_CACHED)
+            if cached is not NOT_CACHED:
+                return cached
+        link = best_interwiki_link(self.sitelinks(wikidata_id, forced_refresh), rank_map)
+        self.put(key, link)
+        return link
+
+
+# shared by all detectors in a process
+shared_sitelink_index = SitelinkIndex()
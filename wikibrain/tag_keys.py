@@ -0,0 +1,71 @@
+class KeyKind:
+    """
+    what a single key means for checks of wikipedia and wikidata tags
+    """
+    def __init__(self, key):
+        self.key = key
+        self.mentions_wikidata = "wikidata" in key
+        self.mentions_wikipedia = "wikipedia" in key
+        # for example wikipedia:de, also brand:wikipedia:de
+        self.is_old_style_wikipedia = "wikipedia:" in key
+        # not:brand:wikidata -> brand:wikidata
+        self.negated_key = None
+        if key.startswith("not:"):
+            self.negated_key = key[4:]
+        # brand:wikidata -> brand:wikipedia
+        self.paired_wikipedia_key = None
+        if self.mentions_wikidata:
+            self.paired_wikipedia_key = key.replace("wikidata", "wikipedia")
+        self.is_primary = key in ["wikipedia", "wikidata"]
+        self.is_prefixed_secondary = not self.is_primary and (key.endswith(":wikipedia") or key.endswith(":wikidata"))
+
+
+# the same keys appear in very many elements, so they are parsed once
+kinds_of_keys = {}
+MAXIMUM_REMEMBERED_KEYS = 100000
+
+
+def kind_of_key(key):
+    global kinds_of_keys
+    kind = kinds_of_keys.get(key)
+    if kind == None:
+        kind = KeyKind(key)
+        if len(kinds_of_keys) >= MAXIMUM_REMEMBERED_KEYS:
+            kinds_of_keys = {}
+        kinds_of_keys[key] = kind
+    return kind
+
+
+class ParsedKeys:
+    """
+    keys of an element, parsed in a single pass into groups used by structural checks
+
+    all groups keep order of keys in tags
+    """
+    def __init__(self, tags):
+        self.tags = tags
+        # KeyKind of keys mentioning wikipedia or wikidata
+        self.linked_keys = []
+        self.primary_keys = []
+        self.prefixed_secondary_keys = []
+        self.old_style_wikipedia_keys = []
+        # (KeyKind of not:* key, negated key) pairs
+        self.negated_keys = []
+        # (wikidata key, wikipedia key) pairs where both are present
+        self.paired_keys = []
+        # only keys mentioning wikipedia or wikidata and not:* keys are collected, these are part
+        # of key of verdict_cache anyway - so iteration is not recorded by verdict_cache.RecordingTags
+        for key in dict.keys(tags):
+            kind = kind_of_key(key)
+            if kind.mentions_wikidata or kind.mentions_wikipedia:
+                self.linked_keys.append(kind)
+            if kind.is_primary:
+                self.primary_keys.append(key)
+            if kind.is_prefixed_secondary:
+                self.prefixed_secondary_keys.append(key)
+            if kind.is_old_style_wikipedia:
+                self.old_style_wikipedia_keys.append(key)
+            if kind.negated_key != None:
+                self.negated_keys.append((kind, kind.negated_key))
+            if kind.paired_wikipedia_key != None and kind.paired_wikipedia_key in tags:
+                self.paired_keys.append((key, kind.paired_wikipedia_key))
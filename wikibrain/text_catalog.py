@@ -0,0 +1,44 @@
+import threading
+
+
+class TextCatalog:
+    """
+    stores each distinct text once, texts are referenced by small integer IDs
+
+    long texts repeated in very many reports (such as general instructions)
+    take memory once rather than once per report
+
+    IDs are valid only within a process, texts must be used when reports
+    are passed elsewhere
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.texts = []
+        self.ids = {}
+
+    def id_of(self, text):
+        # None is not stored
+        if text == None:
+            return None
+        text_id = self.ids.get(text)
+        if text_id != None:
+            return text_id
+        with self.lock:
+            text_id = self.ids.get(text)
+            if text_id == None:
+                text_id = len(self.texts)
+                self.texts.append(text)
+                self.ids[text] = text_id
+            return text_id
+
+    def text(self, text_id):
+        if text_id == None:
+            return None
+        return self.texts[text_id]
+
+    def __len__(self):
+        return len(self.texts)
+
+
+# shared by all reports in a process
+shared_instruction_catalog = TextCatalog()
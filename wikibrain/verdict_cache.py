@@ -0,0 +1,177 @@
+import copy
+from wikibrain import ontology_closure_cache
+from wikibrain import tag_keys
+
+ABSENT = object()
+# marks verdicts depending on all tags of element, not only on looked up ones
+ALL_OTHER_TAGS = object()
+
+
+def is_keyed_tag(key):
+    # tags that are always part of verdict key - all checks iterate over them
+    kind = tag_keys.kind_of_key(key)
+    return kind.mentions_wikidata or kind.mentions_wikipedia or kind.negated_key != None
+
+
+def keyed_tags(tags):
+    # not recorded by RecordingTags, these tags are part of key
+    return tuple(sorted((key, value) for key, value in dict.items(tags) if is_keyed_tag(key)))
+
+
+def location_kind(location):
+    # verdicts for unknown location are the same for all elements, for known location
+    # only verdicts that turned out to not depend on it may be reused
+    if location == None:
+        return "none"
+    if None in location:
+        return "unknown"
+    return "known"
+
+
+def other_tags(tags):
+    return tuple(sorted((key, value) for key, value in dict.items(tags) if not is_keyed_tag(key)))
+
+
+def matches(tags, looked_up_tags):
+    for key, value in looked_up_tags:
+        if key is ALL_OTHER_TAGS:
+            if other_tags(tags) != value:
+                return False
+        elif tags.get(key, ABSENT) != value:
+            return False
+    return True
+
+
+class RecordingTags(dict):
+    """
+    tags of an element, remembering which keys were looked up by checks
+
+    keys mentioning wikipedia or wikidata and not:* keys are part of verdict key
+    anyway, so only lookups of other keys (such as information, historic, type)
+    are relevant
+
+    iteration, items(), values(), copy() and similar access to all tags make
+    result depend on all other tags
+    """
+    def __init__(self, tags):
+        super().__init__(tags)
+        self.looked_up = set()
+        self.all_tags_used = False
+
+    def __getitem__(self, key):
+        self.looked_up.add(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        self.looked_up.add(key)
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self.looked_up.add(key)
+        return super().get(key, default)
+
+    def __iter__(self):
+        self.all_tags_used = True
+        return super().__iter__()
+
+    def __len__(self):
+        self.all_tags_used = True
+        return super().__len__()
+
+    def __eq__(self, other):
+        self.all_tags_used = True
+        return super().__eq__(other)
+
+    # dict defines __hash__ = None, defining __eq__ would reset it anyway
+    __hash__ = None
+
+    def keys(self):
+        self.all_tags_used = True
+        return super().keys()
+
+    def values(self):
+        self.all_tags_used = True
+        return super().values()
+
+    def items(self):
+        self.all_tags_used = True
+        return super().items()
+
+    def copy(self):
+        self.all_tags_used = True
+        return super().copy()
+
+    def other_looked_up_tags(self):
+        # (key, value) pairs, with ABSENT value for missing keys
+        if self.all_tags_used:
+            return ((ALL_OTHER_TAGS, other_tags(self)),)
+        returned = []
+        for key in sorted(self.looked_up):
+            if not is_keyed_tag(key):
+                returned.append((key, super().get(key, ABSENT)))
+        return tuple(returned)
+
+
+class TagSetVerdictCache(ontology_closure_cache.LeastRecentlyUsedStore):
+    """
+    memoized results of checks for repeated tag sets - for example every shop of
+    a chain with the same brand:wikidata or every segment of a river
+
+    entries are keyed by wiki tags (keys mentioning wikipedia or wikidata and not:*
+    keys), object type, kind of location and detector configuration, as these
+    decide what is reported - each entry holds variants of result that differ
+    by values of other tags looked up by checks
+
+    each variant also holds revisions (lastrevid) of Wikidata entities consulted
+    while checking, variant is reused only while these are unchanged - so verdicts
+    follow refreshed Wikidata data
+
+    results depending on actual location of element (distance from headquarters,
+    distances in list of disambiguation fixes, country from coordinates) are not
+    stored, everything else is reused without running checks again
+
+    memory use is bounded, least recently used entries are evicted
+    """
+    def __init__(self, maximum_size=100000, maximum_variants=8):
+        super().__init__(maximum_size)
+        self.maximum_variants = maximum_variants
+
+    def verdict_key(self, tags, object_type, location, configuration):
+        return (configuration, object_type, location_kind(location), keyed_tags(tags))
+
+    def lookup(self, key, tags, revisions_of=None):
+        """
+        returns (True, result) if result is known, (False, None) otherwise
+
+        revisions_of is called with list of Wikidata IDs and returns dictionary
+        with their current revisions, see EntityProjectionCache.revisions
+
+        result is a copy, so it may be modified (for example bound to element)
+        """
+        variants = self.get(key)
+        if variants != None:
+            for looked_up_tags, result, revisions in variants:
+                if not matches(tags, looked_up_tags):
+                    continue
+                if revisions != {} and (revisions_of == None or revisions_of(list(revisions)) != revisions):
+                    # consulted data changed
+                    break
+                self.record_lookup(True)
+                return True, copy.deepcopy(result)
+        self.record_lookup(False)
+        return False, None
+
+    def store(self, key, looked_up_tags, result, revisions=None):
+        if revisions == None:
+            revisions = {}
+        variants = self.get(key)
+        if variants == None:
+            variants = ()
+        # replaces outdated variant for the same tags
+        variants = tuple(variant for variant in variants if variant[0] != looked_up_tags)
+        variants = ((looked_up_tags, copy.deepcopy(result), dict(revisions)),) + variants
+        self.put(key, variants[:self.maximum_variants])
+
+
+# shared by all detectors in a process, configuration of detector is part of key
+shared_verdict_cache = TagSetVerdictCache()
@@ -2,12 +2,35 @@ import wikimedia_connection
 from wikimedia_connection import wikimedia_connection
 from wikimedia_connection import wikidata_processing
 import geopy.distance
+import hashlib
 import re
+import sys
+import types
 import yaml
 from wikibrain import wikipedia_knowledge
 from wikibrain import wikidata_knowledge
+from wikibrain import official_languages
+from wikibrain import check_registry
+from wikibrain import element_filter
+from wikibrain import tag_keys
+from wikibrain import verdict_cache
+from wikibrain import ontology_closure_cache
+from wikibrain import entity_projection
+from wikibrain import sitelink_index
+from wikibrain import wikimedia_prefetch
+from wikibrain import report_sink
+from wikibrain import text_catalog
+from wikibrain.cache_store import set_cache_store
+
+# version of checks, bump when reported problems change for the same data
+# so that stored results (see revalidation_store) are not reused
+RULES_VERSION = 1
+
 
 class ErrorReport:
+    # slots and interned texts keep memory use low even with all reports of a run in memory
+    __slots__ = ["interned_error_id", "error_message", "instructions_id", "debug_log", "prerequisite", "extra_data", "proposed_tagging_changes", "osm_object_url", "location", "tags"]
+
     def __init__(self, error_message=None, error_general_intructions=None, debug_log=None, error_id=None, prerequisite=None, extra_data=None, proposed_tagging_changes=None):
         # to include something in serialization - modify data function
         self.error_id = error_id
@@ -21,6 +44,35 @@ class ErrorReport:
         self.location = None
         self.tags = None
 
+    @property
+    def error_id(self):
+        return self.interned_error_id
+
+    @error_id.setter
+    def error_id(self, value):
+        # the same error IDs are repeated in very many reports
+        if value != None:
+            value = sys.intern(value)
+        self.interned_error_id = value
+
+    @property
+    def error_general_intructions(self):
+        return text_catalog.shared_instruction_catalog.text(self.instructions_id)
+
+    @error_general_intructions.setter
+    def error_general_intructions(self, value):
+        self.instructions_id = text_catalog.shared_instruction_catalog.id_of(value)
+
+    def __getstate__(self):
+        # catalog IDs are valid only in this process, so texts are pickled and copied
+        return self.data()
+
+    def __setstate__(self, state):
+        self.__init__(error_message=state["error_message"], error_general_intructions=state["error_general_intructions"], debug_log=state["debug_log"], error_id=state["error_id"], prerequisite=state["prerequisite"], extra_data=state["extra_data"], proposed_tagging_changes=state["proposed_tagging_changes"])
+        self.osm_object_url = state["osm_object_url"]
+        self.location = state["location"]
+        self.tags = state["tags"]
+
     def bind_to_element(self, element):
         self.tags = element.get_tag_dictionary()
         self.osm_object_url = element.get_link()
@@ -40,22 +92,136 @@ class ErrorReport:
             extra_data=self.extra_data,
             prerequisite=self.prerequisite,
             location=self.location,
-            tags=self.tags,
+            # tags of element are referenced by report, copied only here
+            tags=None if self.tags == None else dict(self.tags),
         )
 
     def yaml_output(self, filepath):
+        # for many reports use report_sink, it writes them in batches
         with open(filepath, 'a') as outfile:
-            yaml.dump([self.data()], outfile, default_flow_style=False)
+            yaml.dump([self.data()], outfile, Dumper=report_sink.yaml_dumper(), default_flow_style=False)
+
+
+class OntologyRules:
+    """
+    immutable, compiled form of ontology rule tables
+
+    built once per detector so that classifying elements does not rebuild
+    lists and dictionaries for every checked ancestor
+    """
+    def __init__(self, ignored_entries, invalid_types, ambiguous_entries=()):
+        self.ignored_entries = frozenset(ignored_entries)
+        # objects classified as any of these are known to be broken on Wikidata and are not reported
+        self.ambiguous_entries = frozenset(ambiguous_entries)
+        # wikidata_processing concatenates this with lists, so it needs a list form
+        # it must not be modified by callers
+        self.ignored_entries_as_list = sorted(self.ignored_entries)
+        self.invalid_types = types.MappingProxyType({type_id: types.MappingProxyType(dict(reason)) for type_id, reason in invalid_types.items()})
+        self.ignored_entries_version = self.fingerprint(self.ignored_entries_as_list)
+        self.version = self.fingerprint([self.ignored_entries_version, sorted(self.ambiguous_entries)] + sorted((type_id, sorted(reason.items())) for type_id, reason in self.invalid_types.items()))
+
+    @staticmethod
+    def fingerprint(data):
+        return hashlib.sha256(repr(data).encode('utf-8')).hexdigest()[:16]
+
+    def is_ignored(self, wikidata_id):
+        return wikidata_id in self.ignored_entries
+
+    def reason_why_type_is_invalid(self, type_id):
+        return self.invalid_types.get(type_id, None)
+
+
+class DetectorCaches:
+    """
+    caches and optional data sources used by WikimediaLinkIssueDetector
+
+    caches which are not given are shared by all detectors in the process,
+    unless private entity_projection_cache is given - then caches depending
+    on it are private as well
+
+    ontology_graph is optional ontology_graph.OntologyGraph, if provided then
+    instance of and subclass of data is taken from it - without any network access
+
+    country_index is optional country_lookup.CountryIndex, if provided then
+    countries are located based on coordinates of element rather than P17
+    (country) in Wikidata
+
+    when passed to other process only data sources are kept, that process
+    uses its own caches
+    """
+    def __init__(self, ancestor_closure_cache=None, class_verdict_cache=None, entity_projection_cache=None, sitelink_index_cache=None, tag_set_verdict_cache=None, ontology_graph=None, country_index=None):
+        if ancestor_closure_cache == None:
+            ancestor_closure_cache = ontology_closure_cache.shared_ancestor_closure_cache
+        self.ancestor_closure_cache = ancestor_closure_cache
+        if class_verdict_cache == None:
+            class_verdict_cache = ontology_closure_cache.shared_class_verdict_cache
+        self.class_verdict_cache = class_verdict_cache
+        if entity_projection_cache == None:
+            entity_projection_cache = entity_projection.shared_entity_projection_cache
+        # all claims, labels and sitelinks of Wikidata entities are read from projections
+        self.entity_projection_cache = entity_projection_cache
+        shared_projections = entity_projection_cache is entity_projection.shared_entity_projection_cache
+        if sitelink_index_cache == None:
+            if shared_projections:
+                sitelink_index_cache = sitelink_index.shared_sitelink_index
+            else:
+                sitelink_index_cache = sitelink_index.SitelinkIndex(entity_projection_cache=entity_projection_cache)
+        self.sitelink_index_cache = sitelink_index_cache
+        if tag_set_verdict_cache == None:
+            if shared_projections:
+                tag_set_verdict_cache = verdict_cache.shared_verdict_cache
+            else:
+                tag_set_verdict_cache = verdict_cache.TagSetVerdictCache()
+        self.tag_set_verdict_cache = tag_set_verdict_cache
+        self.ontology_graph = ontology_graph
+        self.country_index = country_index
+
+    @classmethod
+    def private(cls, ontology_graph=None, country_index=None):
+        # caches not shared with any other detector
+        return cls(ancestor_closure_cache=ontology_closure_cache.AncestorClosureCache(), class_verdict_cache=ontology_closure_cache.ClassVerdictCache(), entity_projection_cache=entity_projection.EntityProjectionCache(), ontology_graph=ontology_graph, country_index=country_index)
+
+    def __reduce__(self):
+        return (DetectorCaches, (), {"ontology_graph": self.ontology_graph, "country_index": self.country_index})
+
+    def __setstate__(self, state):
+        self.__init__(**state)
 
 
 class WikimediaLinkIssueDetector:
-    def __init__(self, forced_refresh=False, expected_language_code=None, languages_ordered_by_preference=[], additional_debug=False, allow_requesting_edits_outside_osm=False, allow_false_positives=False):
+    def __init__(self, forced_refresh=False, expected_language_code=None, languages_ordered_by_preference=[], additional_debug=False, allow_requesting_edits_outside_osm=False, allow_false_positives=False, caches=None, cache_store=None):
+        if cache_store != None:
+            # optional cache_store.CacheStore, if provided then wikimedia_connection
+            # keeps its cache in it - for the whole process, not only for this detector
+            set_cache_store(cache_store)
         self.forced_refresh = forced_refresh
         self.expected_language_code = expected_language_code
         self.languages_ordered_by_preference = languages_ordered_by_preference
         self.additional_debug = additional_debug
         self.allow_requesting_edits_outside_osm = allow_requesting_edits_outside_osm
         self.allow_false_positives = allow_false_positives
+        self.ontology_rules = OntologyRules(self.ignored_entries_in_wikidata_ontology(), self.invalid_types(), self.ambiguous_entries_in_wikidata_ontology())
+        if caches == None:
+            caches = DetectorCaches()
+        self.caches = caches
+        self.ancestor_closure_cache = caches.ancestor_closure_cache
+        self.class_verdict_cache = caches.class_verdict_cache
+        self.ontology_graph = caches.ontology_graph
+        self.entity_projection_cache = caches.entity_projection_cache
+        self.sitelink_index_cache = caches.sitelink_index_cache
+        self.country_index = caches.country_index
+        self.tag_set_verdict_cache = caches.tag_set_verdict_cache
+        # preference order of Wikipedia links, computed once per detector
+        self.interwiki_preference_profile = tuple(languages_ordered_by_preference)
+        self.interwiki_rank_map = sitelink_index.interwiki_rank_map(languages_ordered_by_preference, wikipedia_knowledge.language_codes.codes_ordered_by_importance)
+        # per-thread, holds check_registry.CheckContext of element being evaluated
+        self.evaluation_state = check_registry.EvaluationState()
+        self.ontology_source = "wikidata"
+        if self.ontology_graph != None:
+            self.ontology_source = self.ontology_graph.version
+        # everything in configuration of detector that changes what is reported
+        self.verdict_configuration = (self.expected_language_code, self.interwiki_preference_profile, self.allow_requesting_edits_outside_osm, self.allow_false_positives, self.forced_refresh, self.ontology_source)
+        self.rules_version = OntologyRules.fingerprint([RULES_VERSION, self.ontology_rules.version, self.verdict_configuration])
 
     @staticmethod
     def reality_is_to_complicated_so_lets_ignore_that_parts_of_wikidata_ontology():
@@ -127,6 +293,12 @@ class WikimediaLinkIssueDetector:
         too_abstract_or_wikidata_bugs.append("Q11706236")  # also church festivals
         return too_abstract_or_wikidata_bugs
 
+    @staticmethod
+    def ambiguous_entries_in_wikidata_ontology():
+        return [
+            "Q122754124", # ambiguous Wikidata item - so known to be broken
+        ]
+
     @staticmethod
     def ignored_entries_in_wikidata_ontology():
         too_abstract_or_wikidata_bugs = WikimediaLinkIssueDetector.ignored_entries_in_wikidata_ontology_without_skipping_known_bugs()
@@ -213,6 +385,12 @@ class WikimediaLinkIssueDetector:
 
         return wikidata_bugs
 
+    def prefetch_data_for_elements(self, elements):
+        # optional, warms cache with bulk requests so checking elements one by one
+        # later is not making a separate request for each entity
+        # elements may be also tag dictionaries
+        wikimedia_prefetch.WikimediaPrefetcher(forced_refresh=self.forced_refresh).prefetch(elements)
+
     def get_problem_for_given_element(self, element):
         tags = element.get_tag_dictionary()
         object_type = element.get_element().tag
@@ -224,35 +402,96 @@ class WikimediaLinkIssueDetector:
         location = None
         return self.get_the_most_important_problem_generic(tags, location, object_type, object_description)
 
-    def get_the_most_important_problem_generic(self, tags, location, object_type, object_description):
-        if self.object_should_be_deleted_not_repaired(object_type, tags):
-            return None
-
-        something_reportable = self.use_special_properties_allowing_to_ignore_wikipedia_tags(tags)
-        if something_reportable != None:
-            return something_reportable
-
-        something_reportable = self.critical_structural_issue_report(object_type, tags)
-        if something_reportable != None:
-            if something_reportable.error_id == "wikipedia wikidata mismatch":
-                if "#" in tags.get("wikipedia"):
-                    something_reportable.error_id = "wikipedia wikidata mismatch, wikipedia links to section - high risk of false positive"
-            return something_reportable
+    def get_all_problems_for_given_element(self, element):
+        """
+        returns list of all problems, the most important first - the first one is
+        the same as returned by get_problem_for_given_element
+        """
+        tags = element.get_tag_dictionary()
+        object_type = element.get_element().tag
+        location = (element.get_coords().lat, element.get_coords().lon)
+        object_description = self.describe_osm_object(element)
+        return self.get_all_problems_generic(tags, location, object_type, object_description)
 
-        something_reportable = self.freely_reorderable_issue_reports(object_description, location, tags)
-        if something_reportable != None:
-            return something_reportable
+    def get_all_problems_for_given_tags(self, tags, object_type, object_description):
+        location = None
+        return self.get_all_problems_generic(tags, location, object_type, object_description)
 
-        something_reportable = self.add_wikipedia_and_wikidata_based_on_each_other(tags)
-        if something_reportable != None:
-            return something_reportable
+    def get_all_problems_generic(self, tags, location, object_type, object_description):
+        if not element_filter.is_relevant(tags):
+            return []
+        if self.object_should_be_deleted_not_repaired(object_type, tags):
+            return []
+        return self.evaluate_checks_with_verdict_cache(tags, location, object_type, object_description, all_problems=True)
 
-        return None
+    def get_the_most_important_problem_generic(self, tags, location, object_type, object_description):
+        if not element_filter.is_relevant(tags):
+            # fast path, no wikipedia or wikidata keys so nothing to report
+            return None
+        if self.object_should_be_deleted_not_repaired(object_type, tags):
+            return None
+        return self.evaluate_checks_with_verdict_cache(tags, location, object_type, object_description)
+
+    def evaluate_checks_with_verdict_cache(self, tags, location, object_type, object_description, all_problems=False):
+        # elements with the same wiki tags get the same result, unless it depends on their location
+        # or data of consulted Wikidata entities has changed since
+        if self.forced_refresh:
+            # everything is fetched again, so nothing may be reused
+            context = check_registry.CheckContext(self, tags, location, object_type, object_description)
+            result = self.evaluate_checks(context, all_problems)
+            self.record_consulted_entities(context.consulted_entities)
+            return result
+        key = self.tag_set_verdict_cache.verdict_key(tags, object_type, location, self.verdict_configuration + (all_problems,))
+        known, verdict = self.tag_set_verdict_cache.lookup(key, tags, self.revisions_of_entities)
+        if known:
+            result, consulted_entities = verdict
+            self.record_consulted_entities(consulted_entities)
+            return result
+        recording_tags = verdict_cache.RecordingTags(tags)
+        context = check_registry.CheckContext(self, recording_tags, location, object_type, object_description)
+        result = self.evaluate_checks(context, all_problems)
+        self.record_consulted_entities(context.consulted_entities)
+        if not context.location_dependent:
+            revisions = self.revisions_of_entities(context.consulted_entities)
+            self.tag_set_verdict_cache.store(key, recording_tags.other_looked_up_tags(), (result, frozenset(context.consulted_entities)), revisions)
+        return result
+
+    def revisions_of_entities(self, wikidata_ids):
+        return entity_projection.revisions_from_cache(self.entity_projection_cache, wikidata_ids)
+
+    def note_location_dependence(self):
+        # called when actual location of element affects result of a check
+        context = self.evaluation_state.context
+        if context != None:
+            context.location_dependent = True
+
+    def note_consulted_entity(self, wikidata_id):
+        # called when data of Wikidata entity is used by a check
+        context = self.evaluation_state.context
+        if context != None and wikidata_id != None:
+            context.consulted_entities.add(wikidata_id)
+
+    def record_consulted_entities(self, wikidata_ids):
+        if self.evaluation_state.consulted_entities != None:
+            self.evaluation_state.consulted_entities.update(wikidata_ids)
+
+    def get_problem_and_consulted_entities_generic(self, tags, location, object_type, object_description):
+        """
+        the same as get_the_most_important_problem_generic, also returns set
+        of IDs of Wikidata entities with data used to find the problem
+        """
+        previous = self.evaluation_state.consulted_entities
+        self.evaluation_state.consulted_entities = set()
+        try:
+            problem = self.get_the_most_important_problem_generic(tags, location, object_type, object_description)
+            return problem, self.evaluation_state.consulted_entities
+        finally:
+            self.evaluation_state.consulted_entities = previous
 
     def use_special_properties_allowing_to_ignore_wikipedia_tags(self, tags):
         if tags.get("wikidata") != None:
             if tags.get("teryt:simc") != None:
-                wikidata_simc_object = wikimedia_connection.get_property_from_wikidata(tags.get("wikidata"), 'P4046')
+                wikidata_simc_object = self.wikidata_property(tags.get("wikidata"), 'P4046')
                 if wikidata_simc_object == None:
                     return None
                 wikidata_simc = wikidata_simc_object[0]['mainsnak']['datavalue']['value']
@@ -267,7 +506,7 @@ class WikimediaLinkIssueDetector:
                         prerequisite={'wikidata': tags.get("wikidata"), "teryt:simc": tags.get("teryt:simc")},
                     )
                 wikipedia_expected = self.get_best_interwiki_link_by_id(tags.get("wikidata"))
-                all_languages = wikipedia_knowledge.WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance()
+                all_languages = list(wikipedia_knowledge.language_codes.codes_ordered_by_importance)
                 if self.languages_ordered_by_preference == []:
                     raise Exception("WAT, simc found and languages_ordered_by_preference is unset? Polish was expected")
                 if (self.languages_ordered_by_preference + all_languages)[0] != "pl":
@@ -295,12 +534,21 @@ class WikimediaLinkIssueDetector:
         #if tags.get("wikipedia").find("#") != -1:
         #    return "link to section (\"only provide links to articles which are 'about the feature'\" - http://wiki.openstreetmap.org/wiki/Key:wikipedia):"
 
+        something_reportable = self.broken_link_issue_report(tags)
+        if something_reportable != None:
+            return something_reportable
+        return self.wikipedia_wikidata_collision_report(tags)
+
+    def broken_link_issue_report(self, tags):
+        # if anything is reported, linked data cannot be used by further checks
         something_reportable = self.remove_old_style_wikipedia_tags(tags)
         if something_reportable != None:
             return something_reportable
 
-        for key in tags.keys():
-            if "wikidata" in key:
+        parsed_keys = self.parsed_keys(tags)
+        for kind in parsed_keys.linked_keys:
+            key = kind.key
+            if kind.mentions_wikidata:
                 something_reportable = self.check_is_wikidata_link_clearly_malformed(key, tags.get(key))
                 if something_reportable != None:
                     return something_reportable
@@ -309,7 +557,7 @@ class WikimediaLinkIssueDetector:
                 if something_reportable != None:
                     return something_reportable
 
-            if "wikipedia" in key:
+            if kind.mentions_wikipedia:
                 something_reportable = self.check_is_wikipedia_link_clearly_malformed(key, tags.get(key))
                 if something_reportable != None:
                     return something_reportable
@@ -323,7 +571,9 @@ class WikimediaLinkIssueDetector:
                         return something_reportable
                 else:
                     pass # TODO, make check_is_wikipedia_page_existing support also secondary wikipedia tags
+        return None
 
+    def wikipedia_wikidata_collision_report(self, tags):
         if tags.get("wikipedia") != None:
             language_code = wikimedia_connection.get_language_code_from_link(tags.get("wikipedia"))
             article_name = wikimedia_connection.get_article_name_from_link(tags.get("wikipedia"))
@@ -335,19 +585,16 @@ class WikimediaLinkIssueDetector:
                 something_reportable = self.check_for_wikipedia_wikidata_collision(tags, "wikidata", "wikipedia")
                 if something_reportable != None:
                     return something_reportable
-        for wikidata_key in tags.keys():
-            if wikidata_key.find("wikidata") != -1:
-                wikipedia_key = wikidata_key.replace("wikidata", "wikipedia")
-                if wikipedia_key in tags:
-                    something_reportable = self.check_for_wikipedia_wikidata_collision(tags, wikidata_key, wikipedia_key)
-                    if something_reportable != None:
-                        return something_reportable
+        for wikidata_key, wikipedia_key in self.parsed_keys(tags).paired_keys:
+            something_reportable = self.check_for_wikipedia_wikidata_collision(tags, wikidata_key, wikipedia_key)
+            if something_reportable != None:
+                return something_reportable
         return None
 
     def add_wikipedia_and_wikidata_based_on_each_other(self, tags):
         wikidata_id = None
         if tags.get("wikipedia") != None:
-            wikidata_id = wikimedia_connection.get_wikidata_object_id_from_link(tags.get("wikipedia"))
+            wikidata_id = self.wikidata_id_from_link(tags.get("wikipedia"))
         something_reportable = self.check_is_wikidata_tag_is_misssing(tags.get('wikipedia'), tags.get('wikidata'), wikidata_id)
         if something_reportable != None:
             return something_reportable
@@ -374,7 +621,7 @@ class WikimediaLinkIssueDetector:
             return wikidata_id
         wikipedia = tags.get('wikipedia')
         if wikipedia != None:
-            return wikimedia_connection.get_wikidata_object_id_from_link(tags.get("wikipedia"))
+            return self.wikidata_id_from_link(tags.get("wikipedia"))
         return None
 
     def replace_prerequisites_to_match_actual_tags(self, something_reportable, tags):
@@ -398,20 +645,23 @@ class WikimediaLinkIssueDetector:
         return something_reportable
 
     def freely_reorderable_issue_reports(self, object_description, location, tags):
-        effective_wikipedia = self.get_effective_wikipedia_tag(tags)
-        effective_wikidata_id = self.get_effective_wikidata_tag(tags)
-        # Note that wikipedia may be None - maybe there is just a Wikidata entry!
-        # Note that effective_wikidata_id may be None - maybe it was not created yet!
-
         # IDEA links from buildings to parish are wrong - but from religious admin are OK https://www.wikidata.org/wiki/Q11808149
+        context = check_registry.CheckContext(self, tags, location, None, object_description)
+        return self.evaluate_checks(context, groups=["freely reorderable"])
+
+    def evaluate_checks(self, context, all_problems=False, groups=None):
+        # derived values (Wikidata IDs of links, properties, ...) are memoized in context
+        # while checks of this element are running
+        previous = self.evaluation_state.context
+        self.evaluation_state.context = context
+        try:
+            if all_problems:
+                return unique_reports(issue_checks.run_all(self, context, groups))
+            return issue_checks.run(self, context, groups)
+        finally:
+            self.evaluation_state.context = previous
 
-        if effective_wikidata_id in wikidata_knowledge.skipped_cases():
-            return None  # manually excluded
-
-        something_reportable = self.get_problem_based_on_wikidata_blacklist(effective_wikidata_id, tags.get('wikidata'), effective_wikipedia)
-        if something_reportable != None:
-            return self.replace_prerequisites_to_match_actual_tags(something_reportable, tags)
-
+    def get_problem_based_on_information_board_tagging(self, tags):
         if tags.get("information") == "board":
             if tags.get("wikipedia") != None:
                 return ErrorReport(
@@ -425,42 +675,24 @@ class WikimediaLinkIssueDetector:
                     error_message="information board topic must be tagged with subject:wikidata tag - not with wikipedia tag",
                     prerequisite={'wikidata': tags.get("wikidata"), "information": tags.get("information")},
                 )
+        return None
 
-        for key in tags.keys():
-            if key.find("not:") == 0:
-                being_checked_key = key[4:]
-                if being_checked_key in tags:
-                    if tags[being_checked_key] == tags[key]:
-                        if "wikipedia" in key or "wikidata" in key:
-                            return ErrorReport(
-                                error_id="wikipedia/wikidata type tag that is incorrect according to not:* tag",
-                                error_message=being_checked_key + "=" + tags.get(being_checked_key) + " is present despite that " + key + "=" + tags[key] + " is also present - at least one of them is wrong",
-                                prerequisite={being_checked_key: tags.get(being_checked_key), key: tags.get(key)},
-                            )
-                        else:
-                            print("not: key (not concerning wikipedia/wikidata) is being ignored in", object_description)
-
-        something_reportable = self.get_problem_based_on_wikidata_and_osm_element(object_description, location, effective_wikidata_id, tags)
-        if something_reportable != None:
-            if something_reportable.error_id == "link to a list" and tags.get("wikipedia") != None and "#" in tags.get("wikipedia"):
-                pass
-                # not actually a real error, I think
-            else:
-                return self.replace_prerequisites_to_match_actual_tags(something_reportable, tags)
-
-        something_reportable = self.get_wikipedia_language_issues(object_description, tags, tags.get("wikipedia"), effective_wikidata_id)
-        if something_reportable != None:
-            return something_reportable
-
-        something_reportable = self.check_is_object_is_existing(effective_wikidata_id)
-        if something_reportable != None:
-            return something_reportable
-
-        if "brand:wikidata" in tags:
-            something_reportable = self.check_is_object_brand_is_existing(tags)
-            if something_reportable != None:
-                return something_reportable
+    def get_problem_based_on_not_prefixed_tags(self, object_description, tags):
+        for kind, being_checked_key in self.parsed_keys(tags).negated_keys:
+            key = kind.key
+            if being_checked_key in tags:
+                if tags[being_checked_key] == tags[key]:
+                    if kind.mentions_wikipedia or kind.mentions_wikidata:
+                        return ErrorReport(
+                            error_id="wikipedia/wikidata type tag that is incorrect according to not:* tag",
+                            error_message=being_checked_key + "=" + tags.get(being_checked_key) + " is present despite that " + key + "=" + tags[key] + " is also present - at least one of them is wrong",
+                            prerequisite={being_checked_key: tags.get(being_checked_key), key: tags.get(key)},
+                        )
+                    else:
+                        print("not: key (not concerning wikipedia/wikidata) is being ignored in", object_description)
+        return None
 
+    def get_problem_based_on_bridge_prefixed_tags(self, tags):
         if "bridge:wikipedia" in tags and "bridge:wikidata" in tags:
             return ErrorReport(
                 error_id="bridge:wikipedia and bridge:wikidata - move to bridge outline",
@@ -481,7 +713,6 @@ class WikimediaLinkIssueDetector:
                 error_message="bridge:wikidata link should be tagged on man_made=bridge outline - without prefix, as just wikidata=*, not on way across bridge. man_made=bridge object may be missing and it may be necessary to draw it, it may be useful to move also some other bridge tags",
                 prerequisite={'bridge:wikipedia': tags.get("bridge:wikipedia"), 'bridge:wikidata': tags.get("bridge:wikipedia")},
             )
-
         return None
 
     def get_problem_based_on_wikidata_blacklist(self, wikidata_id, present_wikidata_id, link):
@@ -509,7 +740,8 @@ class WikimediaLinkIssueDetector:
             return None
         if present_wikidata_id == None:
             raise Exception("check_is_wikidata_page_existing null pointer exception on " + key)
-        wikidata = wikimedia_connection.get_data_from_wikidata_by_id(present_wikidata_id)
+        self.note_consulted_entity(present_wikidata_id)
+        wikidata = self.entity_projection_cache.entity(present_wikidata_id)
         if wikidata != None:
             return None
         error_id_description = "wikidata tag links to 404"
@@ -533,7 +765,7 @@ class WikimediaLinkIssueDetector:
             return self.malformed_secondary_link_error("wikipedia", key, link)
         else:
             language_code = wikimedia_connection.get_language_code_from_link(link)
-            if language_code in wikipedia_knowledge.WikipediaKnowledge.wikipedia_language_code_redirects():
+            if wikipedia_knowledge.language_codes.is_redirect(language_code):
                 return ErrorReport(
                     error_id="wikipedia tag using redirecting language code",
                     error_message="language code (" + language_code + ") in wikipedia tag (" + link + ") points to redirecting language code, see https://en.wikipedia.org/wiki/List_of_Wikipedias#Redirects",
@@ -610,17 +842,45 @@ class WikimediaLinkIssueDetector:
             return None
         page = wikimedia_connection.get_wikipedia_page(language_code, article_name, self.forced_refresh)
         if page == None:
-            wikidata_id = wikimedia_connection.get_wikidata_object_id_from_article(language_code, article_name)
+            wikidata_id = self.wikidata_id_from_article(language_code, article_name)
             return self.report_failed_wikipedia_page_link(language_code, article_name, wikidata_id)
 
     def get_best_interwiki_link_by_id(self, wikidata_id):
-        all_languages = wikipedia_knowledge.WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance()
-        for potential_language_code in (self.languages_ordered_by_preference + all_languages):
-            if potential_language_code != None:
-                potential_article_name = wikimedia_connection.get_interwiki_article_name_by_id(wikidata_id, potential_language_code, self.forced_refresh)
-                if potential_article_name != None:
-                    return potential_language_code + ':' + potential_article_name
-        return None
+        self.note_consulted_entity(wikidata_id)
+        return self.memoized_for_element(("best interwiki link", wikidata_id), lambda: self.sitelink_index_cache.best_link(wikidata_id, self.interwiki_preference_profile, self.interwiki_rank_map, self.forced_refresh))
+
+    def memoized_for_element(self, key, compute):
+        # values are memoized only while an element is being evaluated, see evaluate_checks
+        context = self.evaluation_state.context
+        if context == None:
+            return compute()
+        return context.memoized(key, compute)
+
+    def wikidata_id_from_link(self, link, forced_refresh=False):
+        wikidata_id = self.memoized_for_element(("wikidata id from link", link, forced_refresh), lambda: wikimedia_connection.get_wikidata_object_id_from_link(link, forced_refresh))
+        self.note_consulted_entity(wikidata_id)
+        return wikidata_id
+
+    def wikidata_id_from_article(self, language_code, article_name, forced_refresh=False):
+        wikidata_id = self.memoized_for_element(("wikidata id from article", language_code, article_name, forced_refresh), lambda: wikimedia_connection.get_wikidata_object_id_from_article(language_code, article_name, forced_refresh))
+        self.note_consulted_entity(wikidata_id)
+        return wikidata_id
+
+    def wikidata_property(self, wikidata_id, property):
+        self.note_consulted_entity(wikidata_id)
+        return self.memoized_for_element(("wikidata property", wikidata_id, property), lambda: self.entity_projection_cache.property(wikidata_id, property))
+
+    def interwiki_article_name_by_id(self, wikidata_id, language_code):
+        """
+        the same as wikimedia_connection.get_interwiki_article_name_by_id
+        """
+        if wikidata_id == None:
+            return None
+        if language_code == None:
+            raise ValueError("null pointer exception, language_code==None")
+        self.note_consulted_entity(wikidata_id)
+        sitelinks = self.memoized_for_element(("sitelinks", wikidata_id), lambda: self.sitelink_index_cache.sitelinks(wikidata_id, self.forced_refresh))
+        return sitelinks.get(language_code + 'wiki')
 
     def report_failed_wikipedia_page_link(self, language_code, article_name, wikidata_id):
         error_general_intructions = ""
@@ -645,7 +905,7 @@ class WikimediaLinkIssueDetector:
     def check_is_object_is_existing(self, present_wikidata_id):
         if present_wikidata_id == None:
             return None
-        no_longer_existing = wikimedia_connection.get_property_from_wikidata(present_wikidata_id, 'P576')
+        no_longer_existing = self.wikidata_property(present_wikidata_id, 'P576')
         if no_longer_existing != None:
             error_general_intructions = "Wikidata claims that this object no longer exists. Historical, no longer existing object should not be mapped in OSM (except temporary marking to avoid remapping them from aerial imagery or similar sources) - so it means that either Wikidata is mistaken or has only partial data - for example it is fine to link ruins of a church to its wikipedia entry ( see https://www.wikidata.org/w/index.php?title=Wikidata:Project_chat&oldid=1361617968#Tagging_ruins/remains_left_after_object ) or wikipedia/wikidata tag is wrong or OSM has an outdated object that should be removed." + " " + self.wikidata_data_quality_warning()
             message = ""
@@ -656,11 +916,10 @@ class WikimediaLinkIssueDetector:
                 prerequisite={'wikidata': present_wikidata_id}
             )
 
-    @staticmethod
-    def get_dissolved_brands(present_wikidata_ids: list):
+    def get_dissolved_brands(self, present_wikidata_ids: list):
         dissolved_brands = []
         for present_wikidata_id in present_wikidata_ids:
-            no_longer_existing = wikimedia_connection.get_property_from_wikidata(present_wikidata_id, 'P576')
+            no_longer_existing = self.wikidata_property(present_wikidata_id, 'P576')
             if no_longer_existing is None:
                 continue
 
@@ -717,7 +976,7 @@ class WikimediaLinkIssueDetector:
             )
 
     def tag_from_wikidata(self, present_wikidata_id, wikidata_property):
-        from_wikidata = wikimedia_connection.get_property_from_wikidata(present_wikidata_id, wikidata_property)
+        from_wikidata = self.wikidata_property(present_wikidata_id, wikidata_property)
         if from_wikidata == None:
             return None
         returned = wikidata_processing.decapsulate_wikidata_value(from_wikidata)
@@ -745,11 +1004,11 @@ class WikimediaLinkIssueDetector:
             )
 
     def get_old_style_wikipedia_keys(self, tags):
-        old_style_wikipedia_tags = []
-        for key in tags.keys():
-            if key.find("wikipedia:") != -1:
-                old_style_wikipedia_tags.append(key)
-        return old_style_wikipedia_tags
+        return list(self.parsed_keys(tags).old_style_wikipedia_keys)
+
+    def parsed_keys(self, tags):
+        # keys are parsed once per element, parsed keys keep reference to tags so id is not reused
+        return self.memoized_for_element(("parsed keys", id(tags)), lambda: tag_keys.ParsedKeys(tags))
 
     def remove_old_style_wikipedia_tags(self, tags):
         old_style_wikipedia_tags = self.get_old_style_wikipedia_keys(tags)
@@ -773,10 +1032,7 @@ class WikimediaLinkIssueDetector:
         return None
 
     def check_is_it_valid_key_for_old_style_wikipedia_tag(self, key):
-        for lang in wikipedia_knowledge.WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance():
-            if "wikipedia:" + lang == key:
-                return True
-        return False
+        return wikipedia_knowledge.language_codes.is_valid_old_style_wikipedia_key(key)
 
     def normalized_id_with_conflicts_list(self, links, wikidata_id):
         normalized_link_form = wikidata_id  # may be None
@@ -785,7 +1041,7 @@ class WikimediaLinkIssueDetector:
             if link == None:
                 conflict_list.append("one of links has value None")
             else:
-                id_from_link = wikimedia_connection.get_wikidata_object_id_from_link(link, self.forced_refresh)
+                id_from_link = self.wikidata_id_from_link(link, self.forced_refresh)
 
                 if normalized_link_form == None and id_from_link != None:
                     normalized_link_form = id_from_link
@@ -802,7 +1058,7 @@ class WikimediaLinkIssueDetector:
                     title_after_possible_redirects = self.get_article_name_after_redirect(language_code, article_name)
                     is_article_redirected = (article_name != title_after_possible_redirects and article_name.find("#") == -1)
                     if is_article_redirected:
-                        id_from_link = wikimedia_connection.get_wikidata_object_id_from_article(language_code, title_after_possible_redirects, self.forced_refresh)
+                        id_from_link = self.wikidata_id_from_article(language_code, title_after_possible_redirects, self.forced_refresh)
                 except wikimedia_connection.TitleViolatesKnownLimits:
                     pass # redirected link is invalied and not reported as noexsiting - typically due to "feature" of special handling invalid ling with lang: prefixes 
                          # for example asking about en:name article on Polish-language will return info whethere "name" article exists on enwiki!
@@ -905,7 +1161,7 @@ class WikimediaLinkIssueDetector:
                     language_code = wikimedia_connection.get_text_before_first_colon(article_name)
                     article_name = wikimedia_connection.get_text_after_first_colon(article_name)
 
-            wikidata_id = wikimedia_connection.get_wikidata_object_id_from_article(language_code, article_name)
+            wikidata_id = self.wikidata_id_from_article(language_code, article_name)
             if wikidata_id == None:
                 links.append(article_link_from_old_style_tag)
                 continue
@@ -919,14 +1175,12 @@ class WikimediaLinkIssueDetector:
         return list(set(links))
 
     def get_wikidata_id_after_redirect(self, wikidata_id, forced_refresh=False):
-        wikidata_data = wikimedia_connection.get_data_from_wikidata_by_id(wikidata_id, forced_refresh)
-        try:
-            return wikidata_data['entities'][wikidata_id]['id']
-        except (TypeError, KeyError) as e:
-            print(e)
-            print("requested <" + str(wikidata_id) + ">)")
-            print(wikidata_data)
+        # entity of redirect is the redirect target, with its own ID
+        entity = self.entity_projection_cache.entity(wikidata_id, forced_refresh)
+        if entity == None or 'id' not in entity:
+            print("requested <" + str(wikidata_id) + ">), no entity found")
             return None
+        return entity['id']
 
     def get_article_name_after_redirect(self, language_code, article_name):
         try:
@@ -964,7 +1218,7 @@ class WikimediaLinkIssueDetector:
         if article_name.find("#") != -1:
             article_name_with_section_stripped = re.match('([^#]*)#(.*)', article_name).group(1)
 
-        wikidata_id_from_article = wikimedia_connection.get_wikidata_object_id_from_article(language_code, article_name_with_section_stripped, self.forced_refresh)
+        wikidata_id_from_article = self.wikidata_id_from_article(language_code, article_name_with_section_stripped, self.forced_refresh)
         if present_wikidata_id == wikidata_id_from_article:
             return None
 
@@ -993,7 +1247,7 @@ class WikimediaLinkIssueDetector:
 
         is_article_redirected = (article_name != title_after_possible_redirects and article_name.find("#") == -1)
         if is_article_redirected:
-            wikidata_id_from_redirect = wikimedia_connection.get_wikidata_object_id_from_article(language_code, title_after_possible_redirects, self.forced_refresh)
+            wikidata_id_from_redirect = self.wikidata_id_from_article(language_code, title_after_possible_redirects, self.forced_refresh)
             if present_wikidata_id == wikidata_id_from_redirect:
                 common_message = base_message + ", because " + wikipedia_key + " tag points to a redirect that should be followed"
                 message = self.compare_wikidata_ids(present_wikidata_id, wikidata_id_from_article)
@@ -1022,7 +1276,7 @@ class WikimediaLinkIssueDetector:
             link = language_code + ":" + article_name
             language_code_redirected = wikimedia_connection.get_language_code_from_link(link)
             article_name_redirected = wikimedia_connection.get_article_name_from_link(link)
-            wikidata_of_redirected = wikimedia_connection.get_wikidata_object_id_from_article(language_code_redirected, article_name_redirected, self.forced_refresh)
+            wikidata_of_redirected = self.wikidata_id_from_article(language_code_redirected, article_name_redirected, self.forced_refresh)
             if self.is_first_wikidata_disambig_while_second_points_to_something_not_disambig(wikidata_of_redirected, present_wikidata_id):
                 new_wikipedia = self.get_best_interwiki_link_by_id(present_wikidata_id)
                 message = "article claims to redirect to disambig, " + wikidata_key + " does not. " + wikidata_key + " tag is likely to be correct, " + wikipedia_key + " tag almost certainly is not"
@@ -1054,12 +1308,10 @@ class WikimediaLinkIssueDetector:
             return False
         if first == None:
             return False
-        for type_id in wikidata_processing.get_all_types_describing_wikidata_object(second, self.ignored_entries_in_wikidata_ontology()):
-            if type_id == self.disambig_type_id():
-                return False
-        for type_id in wikidata_processing.get_all_types_describing_wikidata_object(first, self.ignored_entries_in_wikidata_ontology()):
-            if type_id == self.disambig_type_id():
-                return True
+        if self.disambig_type_id() in self.wikidata_entries_classifying_entry(second):
+            return False
+        if self.disambig_type_id() in self.wikidata_entries_classifying_entry(first):
+            return True
 
     def compare_wikidata_ids(self, id1, id2):
         if id1 == None:
@@ -1106,7 +1358,7 @@ class WikimediaLinkIssueDetector:
 
         # https://en.wikipedia.org/wiki/Wikipedia:Naming_conventions_(technical_restrictions)#Colons
         if language_code != None:
-            if language_code in wikipedia_knowledge.WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance():
+            if wikipedia_knowledge.language_codes.is_known_code(language_code):
                 return True
         if "?" in link:
             return True
@@ -1118,9 +1370,9 @@ class WikimediaLinkIssueDetector:
         #         broken language code "pl|"
         if language_code is None:
             return True
-        if language_code in wikipedia_knowledge.WikipediaKnowledge.all_wikipedia_language_codes_order_by_importance():
+        if wikipedia_knowledge.language_codes.is_known_code(language_code):
             return False
-        if language_code in wikipedia_knowledge.WikipediaKnowledge.wikipedia_language_code_redirects():
+        if wikipedia_knowledge.language_codes.is_redirect(language_code):
             return False
         if len(language_code) > 3:
             return True
@@ -1128,7 +1380,7 @@ class WikimediaLinkIssueDetector:
             return True
         return False
 
-    def get_wikipedia_language_issues(self, object_description, tags, wikipedia, effective_wikidata_id):
+    def get_wikipedia_language_issues(self, object_description, tags, wikipedia, effective_wikidata_id, location=None):
         botpedia_message = None
         prerequisite = {'wikipedia': wikipedia, 'wikidata': tags.get("wikidata")}
 
@@ -1154,7 +1406,7 @@ class WikimediaLinkIssueDetector:
             # further checks are useless
             return
 
-        recommended_article_name = wikimedia_connection.get_interwiki_article_name_by_id(effective_wikidata_id, self.expected_language_code, self.forced_refresh)
+        recommended_article_name = self.interwiki_article_name_by_id(effective_wikidata_id, self.expected_language_code)
         if recommended_article_name == None:
             if current_language_code in bot_wikipedias:
                 return ErrorReport(
@@ -1175,7 +1427,7 @@ class WikimediaLinkIssueDetector:
             else:
                 raise Exception("why botpedia got recommended?")
 
-        reason = self.why_object_is_allowed_to_have_foreign_language_label(object_description, effective_wikidata_id)
+        reason = self.why_object_is_allowed_to_have_foreign_language_label(object_description, effective_wikidata_id, location)
         if reason != None:
             if self.additional_debug:
                 print(object_description + " is allowed to have foreign wikipedia link, because " + reason)
@@ -1290,7 +1542,8 @@ class WikimediaLinkIssueDetector:
         # coords_given are (latititude, longitude) tuple
         if wikidata_id == None:
             return None
-        location_from_wikidata = wikimedia_connection.get_location_from_wikidata(wikidata_id)
+        self.note_consulted_entity(wikidata_id)
+        location_from_wikidata = self.entity_projection_cache.location(wikidata_id)
         # recommended by https://stackoverflow.com/a/43211266/4130619
         # documentation on https://github.com/geopy/geopy#measuring-distance
         # geopy.distance.distance((latititude, longitude), (latititude, longitude))
@@ -1300,6 +1553,7 @@ class WikimediaLinkIssueDetector:
         # location is (latititude, longitude) tuple
         if location == (None, None):
             return " <no location data>"
+        self.note_location_dependence()
         distance = self.distance_in_km_of_wikidata_object_from_location(location, wikidata_id)
         if distance == None:
             return " <no location data on wikidata>"
@@ -1323,7 +1577,7 @@ class WikimediaLinkIssueDetector:
         """
         returned = ""
         for link in links:
-            link_wikidata_id = wikimedia_connection.get_wikidata_object_id_from_article(link['language_code'], link['title'])
+            link_wikidata_id = self.wikidata_id_from_article(link['language_code'], link['title'])
             distance_description = self.get_distance_description_between_location_and_wikidata_id(target_location, link_wikidata_id)
             returned += link['title'] + distance_description + "\n"
         return returned
@@ -1340,10 +1594,10 @@ class WikimediaLinkIssueDetector:
             return property_error
 
     def get_error_report_if_property_indicates_that_it_is_unlinkable_as_primary(self, wikidata_id, tag_summary, show_debug=False):
-        if wikimedia_connection.get_property_from_wikidata(wikidata_id, 'P247') != None:
+        if self.wikidata_property(wikidata_id, 'P247') != None:
             return self.get_should_use_subject_error('a spacecraft', 'name:', wikidata_id, tag_summary)
         # https://www.wikidata.org/wiki/Property:P279 - subclass of
-        subclass_of = wikimedia_connection.get_property_from_wikidata(wikidata_id, 'P279')
+        subclass_of = self.wikidata_property(wikidata_id, 'P279')
         if subclass_of != None:
             if show_debug:
                 for entry in subclass_of:
@@ -1351,49 +1605,78 @@ class WikimediaLinkIssueDetector:
                     print(wikidata_id, "subclass_of", subclass_of_wikidata)
             return self.get_should_use_subject_error('an uncoordinable generic object', 'name:', wikidata_id, tag_summary)
 
-    def wikidata_entries_classifying_entry(self, effective_wikidata_id):
-        returned = []
+    def get_direct_superclasses(self, class_id):
+        if self.ontology_graph != None:
+            return self.ontology_graph.direct_superclasses(class_id)
+        return self.entity_projection_cache.direct_superclasses(class_id)
 
+    def get_instance_of_ids(self, wikidata_id):
+        if wikidata_id == None:
+            return None
+        self.note_consulted_entity(wikidata_id)
+        if self.ontology_graph != None:
+            return self.ontology_graph.instance_of_ids(wikidata_id)
+        return self.entity_projection_cache.instance_of_ids(wikidata_id)
+
+    def get_all_superclasses(self, class_id):
+        # includes class_id itself
+        return self.ancestor_closure_cache.ancestors(class_id, self.ontology_rules.ignored_entries, self.ontology_rules.ignored_entries_version, self.get_direct_superclasses, self.ontology_source)
+
+    def get_recursive_all_superclasses_with_depth_data(self, class_id):
+        # the same traversal as wikidata_processing.get_recursive_all_subclass_of_with_depth_data
+        # but using data source of this detector
+        processed = set()
+        found = []
+        to_process = [{"id": class_id, "depth": 0}]
+        while to_process != []:
+            process = to_process.pop()
+            found.append(process)
+            processed.add(process["id"])
+            for parent_id in self.get_direct_superclasses(process["id"]):
+                if parent_id not in processed and not self.ontology_rules.is_ignored(parent_id):
+                    to_process.append({"id": parent_id, "depth": process["depth"] + 1})
+        return found
+
+    def wikidata_entries_classifying_entry(self, effective_wikidata_id):
         # instances of subclasses - also of indirect subclasses
-        parent_categories = wikidata_processing.get_recursive_all_subclass_of(effective_wikidata_id, self.ignored_entries_in_wikidata_ontology(), False, callback=None)
-        for base_type_id in (parent_categories):
-            returned.append(base_type_id)
-            # TODO is this used: get_all_types_describing_wikidata_object
+        returned = set(self.get_all_superclasses(effective_wikidata_id))
 
         # subclasses, of "is instance of"
-        root_instance_ids = wikidata_processing.get_wikidata_type_ids_of_entry(effective_wikidata_id)
+        root_instance_ids = self.get_instance_of_ids(effective_wikidata_id)
         if root_instance_ids == None:
             root_instance_ids = []
         for root in root_instance_ids:
-            if root in self.ignored_entries_in_wikidata_ontology():
+            if self.ontology_rules.is_ignored(root):
                 continue
-            parent_categories = wikidata_processing.get_recursive_all_subclass_of(root, self.ignored_entries_in_wikidata_ontology(), False, callback=None)
-            for base_type_id in (parent_categories):
-                returned.append(base_type_id)
+            # superclasses of root are shared by very many elements and are not tracked
+            self.note_consulted_entity(root)
+            returned |= self.get_all_superclasses(root)
 
-        return returned
+        # sorted to keep results stable between runs, callers only check membership
+        # and reason for invalid types is selected by get_verdict_for_entry
+        return sorted(returned)
 
     def wikidata_entries_classifying_entry_with_depth_data(self, effective_wikidata_id):
         returned = []
 
-        parent_categories_entries = wikidata_processing.get_recursive_all_subclass_of_with_depth_data(effective_wikidata_id, self.ignored_entries_in_wikidata_ontology(), False, callback=None)
+        parent_categories_entries = self.get_recursive_all_superclasses_with_depth_data(effective_wikidata_id)
         for base_type_id_entry in parent_categories_entries:
             returned.append(base_type_id_entry)
             base_type_id = base_type_id_entry["id"]
             base_type_id_depth = base_type_id_entry["depth"]
-            instance_ids = wikidata_processing.get_wikidata_type_ids_of_entry(base_type_id)
+            instance_ids = self.get_instance_of_ids(base_type_id)
             if instance_ids != None:
                 for instance_id in instance_ids:
-                    if instance_id not in self.ignored_entries_in_wikidata_ontology():
+                    if not self.ontology_rules.is_ignored(instance_id):
                         returned.append({"id": instance_id, "depth": base_type_id_depth + 1})
 
-        root_instance_ids = wikidata_processing.get_wikidata_type_ids_of_entry(effective_wikidata_id)
+        root_instance_ids = self.get_instance_of_ids(effective_wikidata_id)
         if root_instance_ids == None:
             root_instance_ids = []
         for root in root_instance_ids:
-            if root in self.ignored_entries_in_wikidata_ontology():
+            if self.ontology_rules.is_ignored(root):
                 continue
-            parent_categories_entries = wikidata_processing.get_recursive_all_subclass_of_with_depth_data(root, self.ignored_entries_in_wikidata_ontology(), False, callback=None)
+            parent_categories_entries = self.get_recursive_all_superclasses_with_depth_data(root)
             for base_type_id_entry in (parent_categories_entries + [{"id": root, "depth": 0}]):
                 returned.append(base_type_id_entry)
         return returned
@@ -1409,44 +1692,58 @@ class WikimediaLinkIssueDetector:
         # event entry about hoax/delusion that is actually strongly about location
         if effective_wikidata_id == 'Q5371519':
             return None
-        if effective_wikidata_id in self.ignored_entries_in_wikidata_ontology():
+        if self.ontology_rules.is_ignored(effective_wikidata_id):
             return None
-        remembered_potential_failure = None
-        for type_id in self.wikidata_entries_classifying_entry(effective_wikidata_id):
-            if type_id in [
-                "Q122754124", # ambiguous Wikidata item - so known to be broken
-            ]:
-                return None # maybe can be reported as worth handling on Wikidata?
-            potential_failure = self.get_reason_why_type_makes_object_invalid_primary_link(type_id)
-            if potential_failure != None:
-                if potential_failure['what'] == "a human" and tags.get('boundary') == 'aboriginal_lands':
-                    continue # cases like https://www.openstreetmap.org/way/758139284 where Wikipedia article bundles ethicity group and reservation land in one article
-                    # TODO
-                    # ideally can be fixed, see https://www.wikidata.org/w/index.php?title=User:Mateusz_Konieczny/failing_testcases/Archive_1&oldid=1808808796#Tulalip_Tribes_of_Washington_(Q1516298)_is_human,_according_to_Wikidata_ontology
-                    # bother with it after USA report page is empty and Wikidata Ontology has run out of things to fix
-                    # AKA never
-
-                if potential_failure['what'] == "a bicycle sharing system" and tags.get('type') == 'network':
-                    continue # for relations like https://www.openstreetmap.org/relation/6409389 it seems fine
-                             # though not sure is relation itself is fine
-                             # but lets skip and focus on blatantly bad things
-
-                # prefer to not report general one (there could be a more specific one reason in a different branch)
-                if 'extremely_broad_and_unspecific' in potential_failure:
-                    if potential_failure['extremely_broad_and_unspecific'] == True:
-                        if remembered_potential_failure != None:
-                            continue
-                remembered_potential_failure = potential_failure
-        if remembered_potential_failure != None:
-            tag_summary = self.get_should_use_subject_error_tag_summary(tags)
-            return self.get_should_use_subject_error(remembered_potential_failure['what'], remembered_potential_failure['replacement'], effective_wikidata_id, tag_summary)
-        return None
+        excluded_reasons = []
+        if tags.get('boundary') == 'aboriginal_lands':
+            excluded_reasons.append("a human")
+            # cases like https://www.openstreetmap.org/way/758139284 where Wikipedia article bundles ethicity group and reservation land in one article
+            # TODO
+            # ideally can be fixed, see https://www.wikidata.org/w/index.php?title=User:Mateusz_Konieczny/failing_testcases/Archive_1&oldid=1808808796#Tulalip_Tribes_of_Washington_(Q1516298)_is_human,_according_to_Wikidata_ontology
+            # bother with it after USA report page is empty and Wikidata Ontology has run out of things to fix
+            # AKA never
+        if tags.get('type') == 'network':
+            excluded_reasons.append("a bicycle sharing system")
+            # for relations like https://www.openstreetmap.org/relation/6409389 it seems fine
+            # though not sure is relation itself is fine
+            # but lets skip and focus on blatantly bad things
+        verdict = self.get_verdict_for_entry(effective_wikidata_id, frozenset(excluded_reasons))
+        if verdict.ambiguous:
+            return None # maybe can be reported as worth handling on Wikidata?
+        if verdict.is_clean():
+            return None
+        tag_summary = self.get_should_use_subject_error_tag_summary(tags)
+        return self.get_should_use_subject_error(verdict.reason['what'], verdict.reason['replacement'], effective_wikidata_id, tag_summary)
+
+    def get_class_verdict(self, class_id, excluded_reasons=frozenset()):
+        return self.class_verdict_cache.verdict(class_id, self.ontology_rules, self.get_direct_superclasses, excluded_reasons, self.ontology_source)
+
+    def get_verdict_for_entry(self, wikidata_id, excluded_reasons=frozenset()):
+        # verdicts for classes are precomputed and propagated through subclass of graph
+        # so it only needs to combine verdict of entry itself and of its instance of values
+        #
+        # the most specific reason is preferred (extremely_broad_and_unspecific ones are used
+        # only if nothing else was found as there could be a more specific one reason in a different branch)
+        # then the closest one (fewest subclass of steps), remaining ties are broken by the lowest class ID
+        #
+        # note that walking all superclasses reported the last specific reason met while walking, so
+        # for entries classified in multiple ways a different (closer) reason may be reported now
+        verdict = self.get_class_verdict(wikidata_id, excluded_reasons)
+        root_instance_ids = self.get_instance_of_ids(wikidata_id)
+        if root_instance_ids == None:
+            root_instance_ids = []
+        for root in root_instance_ids:
+            if self.ontology_rules.is_ignored(root):
+                continue
+            verdict = ontology_closure_cache.more_important_verdict(verdict, self.get_class_verdict(root, excluded_reasons).one_step_further())
+        return verdict
 
     def get_reason_why_type_makes_object_invalid_primary_link(self, type_id):
         # TODO - also generate_webpage file must be updated
-        return self.invalid_types().get(type_id, None)
+        return self.ontology_rules.reason_why_type_is_invalid(type_id)
 
     def invalid_types(self):
+        # source of rules, compiled once into self.ontology_rules - use that one when classifying
         taxon = {'what': 'an animal or plant (and not an individual one)', 'replacement': None}
         weapon = {'what': 'a weapon model or class', 'replacement': 'model:'}
         vehicle = {'what': 'a vehicle model or class', 'replacement': 'model:'}
@@ -1623,26 +1920,26 @@ class WikimediaLinkIssueDetector:
 
     def get_error_report_if_wikipedia_target_is_of_unusable_type(self, location, wikidata_id):
         # target_location is (latititude, longitude) tuple
-        for type_id in wikidata_processing.get_all_types_describing_wikidata_object(wikidata_id, self.ignored_entries_in_wikidata_ontology()):
-            if type_id == self.disambig_type_id():
-                # TODO note that pageprops may be a better source that should be used
-                # it does not require wikidata entry
-                # wikidata entry may be wrong
-                # https://pl.wikipedia.org/w/api.php?action=query&format=json&prop=pageprops&redirects=&titles=Java%20(ujednoznacznienie)
-                disambig_list = self.get_list_of_disambig_fixes(location, wikidata_id)
-                error_message = "link leads to a disambig page - not a proper wikipedia link (according to Wikidata - if target is not a disambig check Wikidata entry whether it is correct)\n\n" + disambig_list
-                return ErrorReport(
-                    error_id="link to a disambiguation page",
-                    error_message=error_message,
-                    prerequisite={'wikidata': wikidata_id},
-                )
-            if type_id == 'Q13406463':
-                error_message = "article linked in wikipedia tag is a list, so it is very unlikely to be correct"
-                return ErrorReport(
-                    error_id="link to a list",
-                    error_message=error_message,
-                    prerequisite={'wikidata': wikidata_id},
-                )
+        classifying_ids = self.wikidata_entries_classifying_entry(wikidata_id)
+        if self.disambig_type_id() in classifying_ids:
+            # TODO note that pageprops may be a better source that should be used
+            # it does not require wikidata entry
+            # wikidata entry may be wrong
+            # https://pl.wikipedia.org/w/api.php?action=query&format=json&prop=pageprops&redirects=&titles=Java%20(ujednoznacznienie)
+            disambig_list = self.get_list_of_disambig_fixes(location, wikidata_id)
+            error_message = "link leads to a disambig page - not a proper wikipedia link (according to Wikidata - if target is not a disambig check Wikidata entry whether it is correct)\n\n" + disambig_list
+            return ErrorReport(
+                error_id="link to a disambiguation page",
+                error_message=error_message,
+                prerequisite={'wikidata': wikidata_id},
+            )
+        if 'Q13406463' in classifying_ids:
+            error_message = "article linked in wikipedia tag is a list, so it is very unlikely to be correct"
+            return ErrorReport(
+                error_id="link to a list",
+                error_message=error_message,
+                prerequisite={'wikidata': wikidata_id},
+            )
 
     def get_problem_based_on_wikidata_and_osm_element(self, object_description, location, effective_wikidata_id, tags):
         if effective_wikidata_id != None:
@@ -1668,13 +1965,13 @@ class WikimediaLinkIssueDetector:
         if prefix + "wikidata" in tags:
             wikidata = tags[prefix + "wikidata"]
         if prefix + "wikipedia" in tags and wikidata == None:
-            wikidata = wikimedia_connection.get_wikidata_object_id_from_link(tags.get(prefix + "wikipedia"))
+            wikidata = self.wikidata_id_from_link(tags.get(prefix + "wikipedia"))
         if wikidata == None:
             return None
         if ";" in wikidata:
             # TODO maybe something can/should be done here?
             return None
-        data = wikimedia_connection.get_property_from_wikidata(wikidata, 'P105')
+        data = self.wikidata_property(wikidata, 'P105')
         if data == None:
             return ErrorReport(
                 error_id=prefix.replace(":", "") + " secondary tag links something that is not " + prefix.replace(":", "") + " according to wikidata (checking P105)",
@@ -1696,7 +1993,7 @@ class WikimediaLinkIssueDetector:
         if prefix + "wikidata" in tags:
             wikidata = tags[prefix + "wikidata"]
         if prefix + "wikipedia" in tags and wikidata == None:
-            wikidata = wikimedia_connection.get_wikidata_object_id_from_link(tags.get(prefix + "wikipedia"))
+            wikidata = self.wikidata_id_from_link(tags.get(prefix + "wikipedia"))
         if wikidata == None:
             return None
         if ";" in wikidata:
@@ -1744,7 +2041,8 @@ class WikimediaLinkIssueDetector:
             pass
         try:
             id_of_location = headquarters['mainsnak']['datavalue']['value']['id']
-            return wikimedia_connection.get_location_from_wikidata(id_of_location)
+            self.note_consulted_entity(id_of_location)
+            return self.entity_projection_cache.location(id_of_location)
         except KeyError:
             pass
         return (None, None)
@@ -1752,8 +2050,8 @@ class WikimediaLinkIssueDetector:
     def headquaters_location_indicate_invalid_connection(self, location, wikidata_id, tag_summary):
         if location == (None, None):
             return None
-        headquarters_location_data = wikimedia_connection.get_property_from_wikidata(wikidata_id, 'P159')
-        area_of_object = wikimedia_connection.get_property_from_wikidata(wikidata_id, 'P2046')
+        headquarters_location_data = self.wikidata_property(wikidata_id, 'P159')
+        area_of_object = self.wikidata_property(wikidata_id, 'P2046')
         if area_of_object != None:
             return None  # for example administrative boundaries such as https://www.wikidata.org/wiki/Q1364786
         if headquarters_location_data == None:
@@ -1761,6 +2059,7 @@ class WikimediaLinkIssueDetector:
         for option in headquarters_location_data:
             location_from_wikidata = self.get_location_of_this_headquaters(option)
             if location_from_wikidata != (None, None):
+                self.note_location_dependence()
                 if geopy.distance.geodesic(location, location_from_wikidata).km > 20:
                     return self.get_should_use_subject_error('a company that has multiple locations', 'brand:', wikidata_id, tag_summary)
 
@@ -1770,7 +2069,7 @@ class WikimediaLinkIssueDetector:
         print("**********************")
         print("starting output_debug_about_wikidata_item")
         print(wikidata_processing.get_wikidata_type_ids_of_entry(wikidata_id))
-        print(wikidata_processing.get_all_types_describing_wikidata_object(wikidata_id, self.ignored_entries_in_wikidata_ontology()))
+        print(wikidata_processing.get_all_types_describing_wikidata_object(wikidata_id, self.ontology_rules.ignored_entries_as_list))
         self.describe_unexpected_wikidata_structure(wikidata_id, show_only_banned=False)
 
     def callback_reporting_banned_categories(self, category_id):
@@ -1810,7 +2109,7 @@ class WikimediaLinkIssueDetector:
                 print(":"*depth + wikidata_processing.wikidata_description(category_id) + note)
             # print entire inheritance set
             show_debug = True
-            parent_categories = wikidata_processing.get_recursive_all_subclass_of(type_id, self.ignored_entries_in_wikidata_ontology(), show_debug, callback)
+            parent_categories = wikidata_processing.get_recursive_all_subclass_of(type_id, self.ontology_rules.ignored_entries_as_list, show_debug, callback)
             #for parent_category in parent_categories:
             #    print("if type_id == '" + parent_category + "':")
             #    print(wikidata_processing.wikidata_description(parent_category))
@@ -1845,700 +2144,44 @@ class WikimediaLinkIssueDetector:
 
     def wikidata_ids_of_countries_with_language(self, language_code):
         # data from Wikidata generated using generate_official_language_list.py in top level of repository
-        if language_code == "jiv":  # Shuar
-            return ["Q736"]  # Ecuador
-
-        if language_code == "gcl":  # Grenadian Creole English
-            return ["Q769"]  # Grenada
-
-        if language_code == "es":  # Spanish
-            return [
-                "Q298",  # Chile
-                "Q414",  # Argentina
-                "Q419",  # Peru
-                "Q717",  # Venezuela
-                "Q733",  # Paraguay
-                "Q736",  # Ecuador
-                "Q739",  # Colombia
-                "Q750",  # Bolivia
-                "Q774",  # Guatemala
-                "Q783",  # Honduras
-                "Q786",  # Dominican Republic
-                "Q792",  # El Salvador
-                "Q983",  # Equatorial Guinea
-                "Q29",  # Spain
-                "Q77",  # Uruguay
-                "Q96",  # Mexico
-                "Q241",  # Cuba
-                "Q800",  # Costa Rica
-                "Q804",  # Panama
-                "Q811",  # Nicaragua
-            ]
-
-        if language_code == "hi":  # Hindi
-            return ["Q668"]  # India
-
-        if language_code == "en":  # English
-            return [
-                "Q258",  # South Africa
-                "Q334",  # Singapore
-                "Q408",  # Australia
-                "Q664",  # New Zealand
-                "Q668",  # India
-                "Q672",  # Tuvalu
-                "Q678",  # Tonga
-                "Q683",  # Samoa
-                "Q685",  # Solomon Islands
-                "Q686",  # Vanuatu
-                "Q691",  # Papua New Guinea
-                "Q695",  # Palau
-                "Q697",  # Nauru
-                "Q702",  # Federated States of Micronesia
-                "Q709",  # Marshall Islands
-                "Q710",  # Kiribati
-                "Q712",  # Fiji
-                "Q734",  # Guyana
-                "Q754",  # Trinidad and Tobago
-                "Q757",  # Saint Vincent and the Grenadines
-                "Q760",  # Saint Lucia
-                "Q763",  # Saint Kitts and Nevis
-                "Q766",  # Jamaica
-                "Q769",  # Grenada
-                "Q778",  # The Bahamas
-                "Q781",  # Antigua and Barbuda
-                "Q784",  # Dominica
-                "Q986",  # Eritrea
-                "Q1005",  # The Gambia
-                "Q1009",  # Cameroon
-                "Q1013",  # Lesotho
-                "Q1014",  # Liberia
-                "Q1020",  # Malawi
-                "Q1027",  # Mauritius
-                "Q1030",  # Namibia
-                "Q1033",  # Nigeria
-                "Q1036",  # Uganda
-                "Q1037",  # Rwanda
-                "Q1042",  # Seychelles
-                "Q1044",  # Sierra Leone
-                "Q1049",  # Sudan
-                "Q1050",  # Eswatini
-                "Q16",  # Canada
-                "Q27",  # Republic of Ireland
-                "Q30",  # United States of America
-                "Q114",  # Kenya
-                "Q117",  # Ghana
-                "Q145",  # United Kingdom
-                "Q233",  # Malta
-                "Q242",  # Belize
-                "Q244",  # Barbados
-                "Q967",  # Burundi
-                "Q921",  # Brunei
-                "Q924",  # Tanzania
-                "Q928",  # Philippines
-                "Q953",  # Zambia
-                "Q954",  # Zimbabwe
-                "Q958",  # South Sudan
-                "Q963",  # Botswana
-            ]
-
-        if language_code == "ay":  # Aymara
-            return [
-                "Q419",  # Peru
-                "Q750",  # Bolivia
-            ]
-
-        if language_code == "pt":  # Portuguese
-            return [
-                "Q574",  # East Timor
-                "Q983",  # Equatorial Guinea
-                "Q1007",  # Guinea-Bissau
-                "Q1011",  # Cape Verde
-                "Q1029",  # Mozambique
-                "Q1039",  # São Tomé and Príncipe
-                "Q45",  # Portugal
-                "Q155",  # Brazil
-                "Q916",  # Angola
-                "Q824489",  # Estado Novo
-            ]
-
-        if language_code == "qu":  # Quechua
-            return [
-                "Q419",  # Peru
-                "Q750",  # Bolivia
-            ]
-
-        if language_code == "ja":  # Japanese
-            return [
-                "Q695",  # Palau
-                "Q17",  # Japan
-            ]
-
-        if language_code == "ta":  # Tamil
-            return [
-                "Q334",  # Singapore
-                "Q854",  # Sri Lanka
-            ]
-
-        if language_code == "nl":  # Dutch
-            return [
-                "Q730",  # Suriname
-                "Q29999",  # Kingdom of the Netherlands
-                "Q31",  # Belgium
-            ]
-
-        if language_code == "hy":  # Armenian
-            return ["Q399"]  # Armenia
-
-        if language_code == "fa":  # Persian
-            return ["Q794"]  # Iran
-
-        if language_code == "ko":  # Korean
-            return [
-                "Q423",  # North Korea
-                "Q884",  # South Korea
-            ]
-
-        if language_code == "km":  # Khmer
-            return ["Q424"]  # Cambodia
-
-        if language_code == "ms":  # Malay
-            return [
-                "Q334",  # Singapore
-                "Q833",  # Malaysia
-                "Q921",  # Brunei
-            ]
-
-        if language_code == "mn":  # Mongolian
-            return ["Q711"]  # Mongolia
-
-        if language_code == "uz":  # Uzbek
-            return [
-                "Q265",  # Uzbekistan
-                "Q889",  # Afghanistan
-            ]
-
-        if language_code == "sr":  # Serbian
-            return [
-                "Q403",  # Serbia
-                "Q225",  # Bosnia and Herzegovina
-            ]
-
-        if language_code == "zu":  # Zulu
-            return ["Q258"]  # South Africa
-
-        if language_code == "xh":  # Xhosa
-            return [
-                "Q258",  # South Africa
-                "Q954",  # Zimbabwe
-            ]
-
-        if language_code == "na":  # Nauruan
-            return ["Q697"]  # Nauru
-
-        if language_code == "ar":  # Arabic
-            return [
-                "Q262",  # Algeria
-                "Q398",  # Bahrain
-                "Q657",  # Chad
-                "Q977",  # Djibouti
-                "Q986",  # Eritrea
-                "Q1016",  # Libya
-                "Q1025",  # Mauritania
-                "Q1028",  # Morocco
-                "Q1045",  # Somalia
-                "Q1049",  # Sudan
-                "Q79",  # Egypt
-                "Q970",  # Comoros
-                "Q796",  # Iraq
-                "Q805",  # Yemen
-                "Q810",  # Jordan
-                "Q817",  # Kuwait
-                "Q822",  # Lebanon
-                "Q842",  # Oman
-                "Q846",  # Qatar
-                "Q851",  # Saudi Arabia
-                "Q858",  # Syria
-                "Q878",  # United Arab Emirates
-                "Q889",  # Afghanistan
-                "Q948",  # Tunisia
-                "Q958",  # South Sudan
-            ]
-
-        if language_code == "af":  # Afrikaans
-            return ["Q258"]  # South Africa
-
-        if language_code == "gil":  # Gilbertese
-            return ["Q710"]  # Kiribati
-
-        if language_code == "ve":  # Venda
-            return [
-                "Q258",  # South Africa
-                "Q954",  # Zimbabwe
-            ]
-
-        if language_code == "fr":  # French
-            return [
-                "Q657",  # Chad
-                "Q686",  # Vanuatu
-                "Q790",  # Haiti
-                "Q971",  # Republic of the Congo
-                "Q974",  # Democratic Republic of the Congo
-                "Q977",  # Djibouti
-                "Q983",  # Equatorial Guinea
-                "Q1000",  # Gabon
-                "Q1006",  # Guinea
-                "Q1008",  # Ivory Coast
-                "Q1009",  # Cameroon
-                "Q1019",  # Madagascar
-                "Q1027",  # Mauritius
-                "Q1032",  # Niger
-                "Q1037",  # Rwanda
-                "Q1041",  # Senegal
-                "Q1042",  # Seychelles
-                "Q16",  # Canada
-                "Q31",  # Belgium
-                "Q32",  # Luxembourg
-                "Q39",  # Switzerland
-                "Q142",  # France
-                "Q235",  # Monaco
-                "Q965",  # Burkina Faso
-                "Q967",  # Burundi
-                "Q970",  # Comoros
-                "Q912",  # Mali
-                "Q929",  # Central African Republic
-                "Q945",  # Togo
-                "Q962",  # Benin
-            ]
-
-        if language_code == "de":  # German
-            return [
-                "Q347",  # Liechtenstein
-                "Q31",  # Belgium
-                "Q32",  # Luxembourg
-                "Q39",  # Switzerland
-                "Q40",  # Austria
-                "Q183",  # Germany
-            ]
-
-        if language_code == "fj":  # Fijian
-            return ["Q712"]  # Fiji
-
-        if language_code == "ht":  # Haitian Creole
-            return ["Q790"]  # Haiti
-
-        if language_code == "ho":  # Hiri Motu
-            return ["Q691"]  # Papua New Guinea
-
-        if language_code == "pau":  # Palauan
-            return ["Q695"]  # Palau
-
-        if language_code == "nso":  # Northern Sotho
-            return ["Q258"]  # South Africa
-
-        if language_code == "sm":  # Samoan
-            return ["Q683"]  # Samoa
-
-        if language_code == "ss":  # Swazi
-            return [
-                "Q258",  # South Africa
-                "Q1050",  # Eswatini
-            ]
-
-        if language_code == "tvl":  # Tuvaluan
-            return ["Q672"]  # Tuvalu
-
-        if language_code == "to":  # Tongan
-            return ["Q678"]  # Tonga
-
-        if language_code == "tet":  # Tetum
-            return ["Q574"]  # East Timor
-
-        if language_code == "tn":  # Tswana
-            return [
-                "Q258",  # South Africa
-                "Q954",  # Zimbabwe
-            ]
-
-        if language_code == "tpi":  # Tok Pisin
-            return ["Q691"]  # Papua New Guinea
-
-        if language_code == "ts":  # Tsonga
-            return [
-                "Q258",  # South Africa
-                "Q954",  # Zimbabwe
-            ]
-
-        if language_code == "st":  # Sesotho
-            return [
-                "Q258",  # South Africa
-                "Q1013",  # Lesotho
-                "Q954",  # Zimbabwe
-            ]
-
-        if language_code == "bi":  # Bislama
-            return ["Q686"]  # Vanuatu
-
-        if language_code == "gn":  # Guarani
-            return [
-                "Q733",  # Paraguay
-                "Q750",  # Bolivia
-            ]
-
-        if language_code == "mh":  # Marshallese
-            return ["Q709"]  # Marshall Islands
-
-        if language_code == "mi":  # Māori
-            return ["Q664"]  # New Zealand
-
-        if language_code == "nr":  # Southern Ndebele
-            return ["Q258"]  # South Africa
-
-        if language_code == "hif":  # Fiji Hindi
-            return ["Q712"]  # Fiji
-
-        if language_code == "zgh":  # Standard Moroccan Berber
-            return ["Q1028"]  # Morocco
-
-        if language_code == "sw":  # Swahili
-            return [
-                "Q1036",  # Uganda
-                "Q1037",  # Rwanda
-                "Q114",  # Kenya
-                "Q924",  # Tanzania
-            ]
-
-        if language_code == "mg":  # Malagasy
-            return ["Q1019"]  # Madagascar
-
-        if language_code == "so":  # Somali
-            return ["Q1045"]  # Somalia
-
-        if language_code == "ny":  # Chewa
-            return [
-                "Q1020",  # Malawi
-                "Q954",  # Zimbabwe
-            ]
-
-        if language_code == "rw":  # Kinyarwanda
-            return ["Q1037"]  # Rwanda
-
-        if language_code == "crs":  # Seychellois Creole
-            return ["Q1042"]  # Seychelles
-
-        if language_code == "ti":  # Tigrinya
-            return ["Q986"]  # Eritrea
-
-        if language_code == "wo":  # Wolof
-            return ["Q1041"]  # Senegal
-
-        if language_code == "pbp":  # Badyara
-            return ["Q1041"]  # Senegal
-
-        if language_code == "kri":  # Krio
-            return ["Q1044"]  # Sierra Leone
-
-        if language_code == "kea":  # Cape Verdean Creole
-            return ["Q1011"]  # Cape Verde
-
-        if language_code == "bjs":  # Bajan Creole
-            return ["Q244"]  # Barbados
-
-        if language_code == "tr":  # Turkish
-            return [
-                "Q43",  # Turkey
-                "Q229",  # Cyprus
-            ]
-
-        if language_code == "is":  # Icelandic
-            return ["Q189"]  # Iceland
-
-        if language_code == "it":  # Italian
-            return [
-                "Q38",  # Italy
-                "Q39",  # Switzerland
-                "Q238",  # San Marino
-            ]
-
-        if language_code == "pl":  # Polish
-            return ["Q36"]  # Poland
-
-        if language_code == "fi":  # Finnish
-            return ["Q33"]  # Finland
-
-        if language_code == "ab":  # Abkhaz
-            return ["Q230"]  # Georgia
-
-        if language_code == "hr":  # Croatian
-            return [
-                "Q224",  # Croatia
-                "Q225",  # Bosnia and Herzegovina
-            ]
-
-        if language_code == "ca":  # Catalan
-            return ["Q228"]  # Andorra
-
-        if language_code == "ru":  # Russian
-            return [
-                "Q159",  # Russia
-                "Q184",  # Belarus
-                "Q232",  # Kazakhstan
-                "Q813",  # Kyrgyzstan
-                "Q863",  # Tajikistan
-            ]
-
-        if language_code == "zh":  # Chinese
-            return [
-                "Q148",  # People's Republic of China
-                "Q865",  # Taiwan
-            ]
-
-        if language_code == "ro":  # Romanian
-            return [
-                "Q217",  # Moldova
-                "Q218",  # Romania
-            ]
-
-        if language_code == "bg":  # Bulgarian
-            return ["Q219"]  # Bulgaria
-
-        if language_code == "ka":  # Georgian
-            return ["Q230"]  # Georgia
-
-        if language_code == "sq":  # Albanian
-            return [
-                "Q221",  # North Macedonia
-                "Q222",  # Albania
-            ]
-
-        if language_code == "uk":  # Ukrainian
-            return ["Q212"]  # Ukraine
-
-        if language_code == "cnr":  # Montenegrin
-            return ["Q236"]  # Montenegro
-
-        if language_code == "sv":  # Swedish
-            return [
-                "Q33",  # Finland
-                "Q34",  # Sweden
-            ]
-
-        if language_code == "da":  # Danish
-            return [
-                "Q35",  # Denmark
-                "Q756617",  # Kingdom of Denmark
-            ]
-
-        if language_code == "no":  # Norwegian
-            return ["Q20"]  # Norway
-
-        if language_code == "lb":  # Luxembourgish
-            return ["Q32"]  # Luxembourg
-
-        if language_code == "sk":  # Slovak
-            return ["Q214"]  # Slovakia
-
-        if language_code == "cs":  # Czech
-            return ["Q213"]  # Czech Republic
-
-        if language_code == "sl":  # Slovene
-            return ["Q215"]  # Slovenia
-
-        if language_code == "hu":  # Hungarian
-            return ["Q28"]  # Hungary
-
-        if language_code == "et":  # Estonian
-            return ["Q191"]  # Estonia
-
-        if language_code == "lv":  # Latvian
-            return ["Q211"]  # Latvia
-
-        if language_code == "lt":  # Lithuanian
-            return ["Q37"]  # Lithuania
-
-        if language_code == "be":  # Belarusian
-            return ["Q184"]  # Belarus
-
-        if language_code == "el":  # Greek
-            return [
-                "Q41",  # Greece
-                "Q229",  # Cyprus
-                "Q229",  # Cyprus
-            ]
-
-        if language_code == "ga":  # Irish
-            return ["Q27"]  # Republic of Ireland
-
-        if language_code == "mt":  # Maltese
-            return ["Q233"]  # Malta
-
-        if language_code == "id":  # Indonesian
-            return ["Q252"]  # Indonesia
-
-        if language_code == "kk":  # Kazakh
-            return ["Q232"]  # Kazakhstan
-
-        if language_code == "az":  # Azerbaijani
-            return ["Q227"]  # Azerbaijan
-
-        if language_code == "mk":  # Macedonian
-            return ["Q221"]  # North Macedonia
-
-        if language_code == "bs":  # Bosnian
-            return ["Q225"]  # Bosnia and Herzegovina
-
-        if language_code == "rm":  # Romansh
-            return ["Q39"]  # Switzerland
-
-        if language_code == "nah":  # Nahuatl
-            return ["Q96"]  # Mexico
-
-        if language_code == "mwl":  # Mirandese
-            return ["Q45"]  # Portugal
-
-        if language_code == "yua":  # Yucatec Maya
-            return ["Q96"]  # Mexico
-
-        if language_code == "nb":  # Bokmål
-            return ["Q20"]  # Norway
+        return sorted(self.frozenset_of_countries_with_language(language_code))
 
-        if language_code == "nn":  # Nynorsk
-            return ["Q20"]  # Norway
-
-        if language_code == "am":  # Amharic
-            return ["Q115"]  # Ethiopia
-
-        if language_code == "jv":  # Javanese
-            return ["Q252"]  # Indonesia
-
-        if language_code == "rn":  # Kirundi
-            return ["Q967"]  # Burundi
-
-        if language_code == "smi":  # Sámi
-            return ["Q20"]  # Norway
-
-        if language_code == "prs":  # Dari
-            return ["Q889"]  # Afghanistan
-
-        if language_code == "pwn":  # Paiwan
-            return ["Q865"]  # Taiwan
-
-        if language_code == "nmq":  # Nambya
-            return ["Q954"]  # Zimbabwe
-
-        if language_code == "bwg":  # Barwe
-            return ["Q954"]  # Zimbabwe
-
-        if language_code == "ur":  # Urdu
-            return ["Q843"]  # Pakistan
-
-        if language_code == "vi":  # Vietnamese
-            return ["Q881"]  # Vietnam
-
-        if language_code == "lo":  # Lao
-            return ["Q819"]  # Laos
-
-        if language_code == "th":  # Thai
-            return ["Q869"]  # Thailand
-
-        if language_code == "my":  # Burmese
-            return ["Q836"]  # Myanmar
-
-        if language_code == "ky":  # Kyrgyz
-            return ["Q813"]  # Kyrgyzstan
-
-        if language_code == "tg":  # Tajik
-            return ["Q863"]  # Tajikistan
-
-        if language_code == "tk":  # Turkmen
-            return [
-                "Q874",  # Turkmenistan
-                "Q889",  # Afghanistan
-            ]
-
-        if language_code == "he":  # Hebrew
-            return ["Q801"]  # Israel
-
-        if language_code == "bn":  # Bengali
-            return ["Q902"]  # Bangladesh
-
-        if language_code == "si":  # Sinhala
-            return ["Q854"]  # Sri Lanka
-
-        if language_code == "ndc":  # Ndau
-            return ["Q954"]  # Zimbabwe
-
-        if language_code == "fo":  # Faroese
-            return ["Q756617"]  # Kingdom of Denmark
-
-        if language_code == "kl":  # Greenlandic
-            return ["Q756617"]  # Kingdom of Denmark
-
-        if language_code == "dv":  # Maldivian
-            return ["Q826"]  # Maldives
-
-        if language_code == "bal":  # Balochi
-            return ["Q889"]  # Afghanistan
-
-        if language_code == "dz":  # Dzongkha
-            return ["Q917"]  # Bhutan
-
-        if language_code == "fil":  # Filipino
-            return ["Q928"]  # Philippines
-
-        if language_code == "khi":  # Khoisan
-            return ["Q954"]  # Zimbabwe
-
-        if language_code == "kck":  # Kalanga
-            return ["Q954"]  # Zimbabwe
-
-        if language_code == "ne":  # Nepali
-            return ["Q837"]  # Nepal
-
-        if language_code == "sg":  # Sango
-            return ["Q929"]  # Central African Republic
-
-        if language_code == "sn":  # Shona
-            return ["Q954"]  # Zimbabwe
-
-        if language_code == "toi":  # Tonga
-            return ["Q954"]  # Zimbabwe
-
-        if language_code == "ami":  # Amis language
-            return ["Q865"]  # Taiwan
-
-        if language_code == "nd":  # Northern Ndebele
-            return ["Q954"]  # Zimbabwe
-
-        if language_code == "ku":  # Kurdish
-            return ["Q796"]  # Iraq
-
-        if language_code == "map":  # Austronesian
-            return ["Q865"]  # Taiwan
-
-        if language_code == "ps":  # Pashto
-            return ["Q889"]  # Afghanistan
-
-        assert False, "language code <" + language_code + "> without hardcoded list of matching countries"
+    def frozenset_of_countries_with_language(self, language_code):
+        returned = official_languages.countries_with_official_language(language_code)
+        assert returned != None, "language code <" + language_code + "> without hardcoded list of matching countries"
+        return returned
 
     # unknown data, known to be completely inside -> not allowed, returns None
     # known to be outside or on border -> allowed, returns reason
-    def why_object_is_allowed_to_have_foreign_language_label(self, object_description, wikidata_id):
+    # location is (latititude, longitude) tuple or None
+    def why_object_is_allowed_to_have_foreign_language_label(self, object_description, wikidata_id, location=None):
         if wikidata_id == None:
             return "no wikidata entry exists"
 
         if self.expected_language_code == None:
             return "no expected language is defined"
 
-        country_ids_where_expected_language_will_be_enforced = self.wikidata_ids_of_countries_with_language(self.expected_language_code)
+        country_ids_where_expected_language_will_be_enforced = self.frozenset_of_countries_with_language(self.expected_language_code)
 
-        countries = self.get_country_location_from_wikidata_id(wikidata_id)
+        # country from coordinates is used when known, without fetching anything -
+        # P17 (country) in Wikidata only when object has no location or it is outside
+        # all countries in index
+        countries = self.get_country_location_from_coordinates(location)
+        if countries == None:
+            countries = self.get_country_location_from_wikidata_id(wikidata_id)
         if countries == None:
-            # TODO locate based on coordinates...
+            return None
+        if country_ids_where_expected_language_will_be_enforced.issuperset(countries):
             return None
         for country_id in countries:
-            if country_id in country_ids_where_expected_language_will_be_enforced:
+            if self.expected_language_code in official_languages.official_languages_of_country(country_id):
                 continue
-            country_name = wikidata_processing.get_wikidata_label(country_id, 'en')
+            country_name = None
+            if self.country_index != None:
+                country_name = self.country_index.country_name(country_id)
+            if country_name == None:
+                self.note_consulted_entity(country_id)
+                country_name = self.entity_projection_cache.label(country_id, 'en')
             if country_name == None:
                 return "it is at least partially in country without known name on Wikidata (country_id=" + country_id + ")"
             if country_id == 'Q7318':  # Nazi Germany. Wikidata is being silly again
@@ -2549,8 +2192,18 @@ class WikimediaLinkIssueDetector:
             return "it is at least partially in " + country_name
         return None
 
+    def get_country_location_from_coordinates(self, location):
+        # returns None if location is unknown or outside all countries in index
+        if self.country_index == None or location == None or None in location:
+            return None
+        self.note_location_dependence()
+        countries = self.country_index.countries_at(location[0], location[1])
+        if countries == []:
+            return None
+        return countries
+
     def get_country_location_from_wikidata_id(self, object_wikidata_id):
-        countries = wikimedia_connection.get_property_from_wikidata(object_wikidata_id, 'P17')
+        countries = self.wikidata_property(object_wikidata_id, 'P17')
         if countries == None:
             return None
         returned = []
@@ -2606,3 +2259,93 @@ class WikimediaLinkIssueDetector:
             if page.find(kml_data_str) == -1:  # enwiki article links to area, not point (see 'Central Park')
                 return False
         return True
+
+
+def unique_reports(reports):
+    # the same problem may be found by multiple checks, it is listed once
+    returned = []
+    reported = []
+    for report in reports:
+        identity = (report.error_id, sorted((report.prerequisite or {}).items()))
+        if identity not in reported:
+            reported.append(identity)
+            returned.append(report)
+    return returned
+
+
+def wikipedia_wikidata_collision_check(detector, context):
+    something_reportable = detector.wikipedia_wikidata_collision_report(context.tags)
+    if something_reportable != None:
+        if something_reportable.error_id == "wikipedia wikidata mismatch":
+            if "#" in context.tags.get("wikipedia"):
+                something_reportable.error_id = "wikipedia wikidata mismatch, wikipedia links to section - high risk of false positive"
+    return something_reportable
+
+
+def wikidata_blacklist_check(detector, context):
+    something_reportable = detector.get_problem_based_on_wikidata_blacklist(context.effective_wikidata_id(), context.tags.get('wikidata'), context.effective_wikipedia())
+    if something_reportable != None:
+        return detector.replace_prerequisites_to_match_actual_tags(something_reportable, context.tags)
+    return None
+
+
+def wikidata_and_osm_element_check(detector, context):
+    something_reportable = detector.get_problem_based_on_wikidata_and_osm_element(context.object_description, context.location, context.effective_wikidata_id(), context.tags)
+    if something_reportable != None:
+        if something_reportable.error_id == "link to a list" and context.tags.get("wikipedia") != None and "#" in context.tags.get("wikipedia"):
+            # not actually a real error, I think
+            return None
+        return detector.replace_prerequisites_to_match_actual_tags(something_reportable, context.tags)
+    return None
+
+
+def is_not_manually_excluded(detector, context):
+    return context.effective_wikidata_id() not in wikidata_knowledge.skipped_cases()
+
+
+def default_issue_checks():
+    """
+    checks run by get_the_most_important_problem_generic, problem reported by
+    check with the lowest priority value wins
+
+    checks in "freely reorderable" group may be reordered without changing
+    what is reported in a meaningful way
+    """
+    checks = check_registry.CheckRegistry()
+    checks.add("special properties allowing to ignore wikipedia tags", 100, check_registry.REMOTE,
+               lambda detector, context: detector.use_special_properties_allowing_to_ignore_wikipedia_tags(context.tags),
+               applies=lambda tags: "teryt:simc" in tags)
+    # malformed links and links to missing pages, checks using linked data are not run after it reports something
+    checks.add("broken links", 200, check_registry.REMOTE,
+               lambda detector, context: detector.broken_link_issue_report(context.tags),
+               gate=True)
+    checks.add("wikipedia and wikidata collisions", 210, check_registry.REMOTE, wikipedia_wikidata_collision_check)
+
+    checks.set_group_guard("freely reorderable", is_not_manually_excluded)
+    checks.add("wikidata blacklist", 300, check_registry.REMOTE, wikidata_blacklist_check, group="freely reorderable")
+    checks.add("information board", 310, check_registry.LOCAL,
+               lambda detector, context: detector.get_problem_based_on_information_board_tagging(context.tags),
+               applies=lambda tags: "information" in tags, group="freely reorderable", uses_linked_data=False)
+    checks.add("not:* conflicts", 320, check_registry.LOCAL,
+               lambda detector, context: detector.get_problem_based_on_not_prefixed_tags(context.object_description, context.tags),
+               group="freely reorderable", uses_linked_data=False)
+    checks.add("wikidata and osm element", 330, check_registry.REMOTE, wikidata_and_osm_element_check, group="freely reorderable")
+    checks.add("wikipedia language", 340, check_registry.REMOTE,
+               lambda detector, context: detector.get_wikipedia_language_issues(context.object_description, context.tags, context.tags.get("wikipedia"), context.effective_wikidata_id(), context.location),
+               applies=lambda tags: "wikipedia" in tags, group="freely reorderable")
+    checks.add("object existence", 350, check_registry.REMOTE,
+               lambda detector, context: detector.check_is_object_is_existing(context.effective_wikidata_id()),
+               group="freely reorderable")
+    checks.add("brand existence", 360, check_registry.REMOTE,
+               lambda detector, context: detector.check_is_object_brand_is_existing(context.tags),
+               applies=lambda tags: "brand:wikidata" in tags, group="freely reorderable")
+    checks.add("bridge prefixes", 370, check_registry.LOCAL,
+               lambda detector, context: detector.get_problem_based_on_bridge_prefixed_tags(context.tags),
+               group="freely reorderable", uses_linked_data=False)
+
+    checks.add("wikipedia and wikidata based on each other", 400, check_registry.REMOTE,
+               lambda detector, context: detector.add_wikipedia_and_wikidata_based_on_each_other(context.tags))
+    return checks
+
+
+issue_checks = default_issue_checks()
@@ -0,0 +1,270 @@
+import json
+import re
+import urllib.parse
+from wikimedia_connection import wikimedia_connection
+
+WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
+
+# limit of wbgetentities for ordinary users, both for ids and for titles
+BATCH_SIZE = 50
+
+
+def tags_of(element_or_tags):
+    if isinstance(element_or_tags, dict):
+        return element_or_tags
+    return element_or_tags.get_tag_dictionary()
+
+
+def wikidata_ids_in_value(value):
+    # also "Q1;Q2" values are used in secondary wikidata tags
+    returned = []
+    for part in value.split(";"):
+        part = part.strip()
+        if re.search(r"^Q[1-9]\d*\Z", part) != None:
+            returned.append(part)
+    return returned
+
+
+def article_in_link(link):
+    # returns (language_code, article_name) or None for clearly malformed links
+    language_code = wikimedia_connection.get_language_code_from_link(link)
+    article_name = wikimedia_connection.get_article_name_from_link(link)
+    if language_code == None or article_name == None:
+        return None
+    if language_code not in wikimedia_connection.interwiki_language_codes():
+        return None
+    if article_name.strip() == "" or "|" in article_name:
+        return None
+    return (language_code, article_name)
+
+
+def links_in_tags(tags):
+    """
+    returns set of wikidata IDs and set of (language_code, article_name) tuples
+    from wikidata, *:wikidata, wikipedia, *:wikipedia and old style wikipedia:xx tags
+    """
+    wikidata_ids = set()
+    articles = set()
+    for key, value in tags.items():
+        if key == "wikidata" or key.endswith(":wikidata"):
+            wikidata_ids.update(wikidata_ids_in_value(value))
+        elif key == "wikipedia" or key.endswith(":wikipedia"):
+            article = article_in_link(value)
+            if article != None:
+                articles.add(article)
+        elif key.startswith("wikipedia:"):
+            # wikipedia:pl = Kraków
+            # also wikipedia:de = de:Troszyn (Mieszkowice) happens
+            language_code = wikimedia_connection.get_text_after_first_colon(key)
+            link = value
+            if not value.startswith(language_code + ":"):
+                link = language_code + ":" + value
+            article = article_in_link(link)
+            if article != None:
+                articles.add(article)
+    return wikidata_ids, articles
+
+
+def site_of_language(language_code):
+    # see download_data_from_wikidata in wikimedia_connection
+    if language_code in ["be-tarask", "be-x-old"]:
+        return "be_x_oldwiki"
+    return language_code + "wiki"
+
+
+def instance_of_ids_of_entity(entity):
+    returned = []
+    for claim in entity.get('claims', {}).get('P31', []):
+        try:
+            returned.append(claim['mainsnak']['datavalue']['value']['id'])
+        except (KeyError, TypeError):
+            # "no value" and "unknown value" claims
+            continue
+    return returned
+
+
+def batches(values, batch_size):
+    values = sorted(values)
+    for start in range(0, len(values), batch_size):
+        yield values[start:start + batch_size]
+
+
+class WikimediaPrefetcher:
+    """
+    warms wikimedia_connection cache with bulk requests before elements are checked
+    one by one, so WikimediaLinkIssueDetector finds most data already in cache
+
+    fetched data is written in exactly the same form as wikimedia_connection writes
+    responses to requests for a single entity - so later cache reads are unaffected
+    by whether data was prefetched or not
+
+    data that can not be reliably matched to a request (for example, titles that
+    were normalised or redirected by Wikidata) is not written, it will be fetched
+    during checking as usual
+    """
+    def __init__(self, forced_refresh=False, api_url=WIKIDATA_API_URL, batch_size=BATCH_SIZE, download=None):
+        self.forced_refresh = forced_refresh
+        self.api_url = api_url
+        self.batch_size = batch_size
+        if download == None:
+            download = wikimedia_connection.download
+        self.download = download
+        self.requests_made = 0
+
+    def prefetch(self, elements):
+        """
+        elements may be OSM elements (with get_tag_dictionary) or tag dictionaries
+        """
+        wikidata_ids = set()
+        articles = set()
+        for element in elements:
+            ids_in_element, articles_in_element = links_in_tags(tags_of(element))
+            wikidata_ids |= ids_in_element
+            articles |= articles_in_element
+        wikidata_ids |= set(self.prefetch_articles(articles).values())
+        entities = self.prefetch_entities(wikidata_ids)
+        roots = set()
+        for entity in entities.values():
+            roots.update(instance_of_ids_of_entity(entity))
+        self.prefetch_entities(roots - set(entities))
+
+    def query(self, parameters):
+        url = self.api_url + "?" + urllib.parse.urlencode(parameters, safe="|")
+        self.requests_made += 1
+        result = self.download(url)
+        if result.code != 200:
+            print("prefetch request failed with code", result.code, "for", url)
+            return None
+        try:
+            return json.loads(result.content.decode())
+        except json.decoder.JSONDecodeError:
+            print("prefetch request returned invalid JSON for", url)
+            return None
+
+    def is_reload_necessary_for_entity(self, wikidata_id):
+        return self.forced_refresh or wikimedia_connection.it_is_necessary_to_reload_wikidata_by_id_files(wikidata_id)
+
+    def is_reload_necessary_for_article(self, language_code, article_name):
+        return self.forced_refresh or wikimedia_connection.it_is_necessary_to_reload_wikidata_files(language_code, article_name)
+
+    def store_entity_response(self, wikidata_id, response):
+        wikimedia_connection.ensure_that_cache_folder_exists(wikimedia_connection.wikidata_language_placeholder())
+        wikimedia_connection.write_to_text_file(wikimedia_connection.get_filename_with_wikidata_entity_by_id(wikidata_id), json.dumps(response))
+        wikimedia_connection.write_to_text_file(wikimedia_connection.get_filename_with_wikidata_by_id_response_code(wikidata_id), "200")
+
+    def store_article_response(self, language_code, article_name, response):
+        wikimedia_connection.ensure_that_cache_folder_exists(language_code)
+        wikimedia_connection.write_to_text_file(wikimedia_connection.get_filename_with_wikidata_entity(language_code, article_name), json.dumps(response))
+        wikimedia_connection.write_to_text_file(wikimedia_connection.get_filename_with_wikidata_response_code(language_code, article_name), "200")
+
+    def prefetch_entities(self, wikidata_ids):
+        """
+        returns dictionary with entity data for all requested IDs that exist,
+        reading ones that are already cached from cache
+        """
+        returned = {}
+        missing = []
+        for wikidata_id in wikidata_ids:
+            if self.is_reload_necessary_for_entity(wikidata_id):
+                missing.append(wikidata_id)
+                continue
+            response = wikimedia_connection.get_data_from_wikidata_by_id(wikidata_id)
+            if response != None and wikidata_id in response.get('entities', {}):
+                returned[wikidata_id] = response['entities'][wikidata_id]
+        for batch in batches(missing, self.batch_size):
+            returned.update(self.fetch_entities(batch))
+        return returned
+
+    def fetch_entities(self, wikidata_ids):
+        returned = {}
+        while wikidata_ids != []:
+            response = self.query({"action": "wbgetentities", "ids": "|".join(wikidata_ids), "format": "json"})
+            if response == None:
+                return returned
+            if 'error' in response:
+                # whole request fails if any of entities is not existing
+                # so such entities are recorded and request is repeated without them
+                if response['error'].get('code') != 'no-such-entity' or response['error'].get('id') not in wikidata_ids:
+                    print("unexpected error during prefetch", response['error'])
+                    return returned
+                nonexisting_id = response['error']['id']
+                self.store_entity_response(nonexisting_id, response)
+                wikidata_ids = [wikidata_id for wikidata_id in wikidata_ids if wikidata_id != nonexisting_id]
+                continue
+            for wikidata_id, entity in response.get('entities', {}).items():
+                if wikidata_id in wikidata_ids:
+                    self.store_entity_response(wikidata_id, {"entities": {wikidata_id: entity}, "success": 1})
+                    returned[wikidata_id] = entity
+            return returned
+        return returned
+
+    def fetch_revisions(self, wikidata_ids):
+        """
+        returns dictionary mapping requested IDs to current revision ID of entity
+        (lastrevid), None for entities that are not existing
+
+        only revision info is requested, so it is much cheaper than fetching entities
+        """
+        returned = {}
+        for batch in batches(wikidata_ids, self.batch_size):
+            while batch != []:
+                response = self.query({"action": "wbgetentities", "ids": "|".join(batch), "props": "info", "format": "json"})
+                if response == None:
+                    break
+                if 'error' in response:
+                    if response['error'].get('code') != 'no-such-entity' or response['error'].get('id') not in batch:
+                        print("unexpected error while fetching revisions", response['error'])
+                        break
+                    nonexisting_id = response['error']['id']
+                    returned[nonexisting_id] = None
+                    batch = [wikidata_id for wikidata_id in batch if wikidata_id != nonexisting_id]
+                    continue
+                for wikidata_id, entity in response.get('entities', {}).items():
+                    if wikidata_id in batch:
+                        returned[wikidata_id] = entity.get('lastrevid')
+                break
+        return returned
+
+    def prefetch_articles(self, articles):
+        """
+        articles are (language_code, article_name) tuples
+
+        returns dictionary mapping article to wikidata ID, for articles with
+        a matching Wikidata entity
+        """
+        returned = {}
+        missing_by_language = {}
+        for language_code, article_name in articles:
+            if self.is_reload_necessary_for_article(language_code, article_name):
+                missing_by_language.setdefault(language_code, []).append(article_name)
+                continue
+            wikidata_id = wikimedia_connection.get_wikidata_object_id_from_article(language_code, article_name)
+            if wikidata_id != None:
+                returned[(language_code, article_name)] = wikidata_id
+        for language_code in sorted(missing_by_language):
+            for batch in batches(missing_by_language[language_code], self.batch_size):
+                for article_name, wikidata_id in self.fetch_articles(language_code, batch).items():
+                    returned[(language_code, article_name)] = wikidata_id
+        return returned
+
+    def fetch_articles(self, language_code, article_names):
+        site = site_of_language(language_code)
+        response = self.query({"action": "wbgetentities", "sites": site, "titles": "|".join(article_names), "format": "json"})
+        if response == None or 'error' in response:
+            return {}
+        returned = {}
+        for key, entity in response.get('entities', {}).items():
+            if 'missing' in entity:
+                # reported under negative keys, as in responses for a single title
+                title = entity.get('title')
+                if title in article_names:
+                    self.store_article_response(language_code, title, {"entities": {"-1": entity}, "success": 1})
+                continue
+            title = entity.get('sitelinks', {}).get(site, {}).get('title')
+            if title not in article_names:
+                continue
+            self.store_article_response(language_code, title, {"entities": {key: entity}, "success": 1})
+            if key == entity.get('id') and self.is_reload_necessary_for_entity(key):
+                self.store_entity_response(key, {"entities": {key: entity}, "success": 1})
+            returned[title] = key
+        return returned
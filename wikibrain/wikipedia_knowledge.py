@@ -1,46 +1,86 @@
+import types
+
+# https://en.wikipedia.org/wiki/List_of_Wikipedias#Redirects
+LANGUAGE_CODE_REDIRECTS = ("be-x-old", "cz", "dk", "mo", "nan", "nb")
+
+# list from https://meta.wikimedia.org/wiki/List_of_Wikipedias as of 2017-10-07
+# ordered by article count except some for extreme bot spam
+# should use https://stackoverflow.com/questions/33608751/retrieve-a-list-of-all-wikipedia-languages-programmatically
+# probably via wikipedia connection library
+LANGUAGE_CODES_ORDERED_BY_IMPORTANCE = (
+    'en', 'de', 'fr', 'nl', 'ru', 'it', 'es', 'pl',
+    'vi', 'ja', 'pt', 'zh', 'uk', 'fa', 'ca', 'ar', 'no', 'sh', 'fi',
+    'hu', 'id', 'ko', 'cs', 'ro', 'sr', 'ms', 'tr', 'eu', 'eo', 'bg',
+    'hy', 'da', 'zh-min-nan', 'sk', 'min', 'kk', 'he', 'lt', 'hr',
+    'ce', 'et', 'sl', 'be', 'gl', 'el', 'nn', 'uz', 'simple', 'la',
+    'az', 'ur', 'hi', 'vo', 'th', 'ka', 'ta', 'cy', 'mk', 'mg', 'oc',
+    'tl', 'ky', 'lv', 'bs', 'tt', 'new', 'sq', 'tg', 'te', 'pms',
+    'br', 'be-tarask', 'zh-yue', 'bn', 'ml', 'ht', 'ast', 'lb', 'jv',
+    'mr', 'azb', 'af', 'sco', 'pnb', 'ga', 'is', 'cv', 'ba', 'fy',
+    'su', 'sw', 'my', 'lmo', 'an', 'yo', 'ne', 'gu', 'io', 'pa',
+    'nds', 'scn', 'bpy', 'als', 'bar', 'ku', 'kn', 'ia', 'qu', 'ckb',
+    'mn', 'arz', 'bat-smg', 'wa', 'gd', 'nap', 'bug', 'yi', 'am',
+    'si', 'cdo', 'map-bms', 'or', 'fo', 'mzn', 'hsb', 'xmf', 'li',
+    'mai', 'sah', 'sa', 'vec', 'ilo', 'os', 'mrj', 'hif', 'mhr', 'bh',
+    'roa-tara', 'eml', 'diq', 'pam', 'ps', 'sd', 'hak', 'nso', 'se',
+    'ace', 'bcl', 'mi', 'nah', 'zh-classical', 'nds-nl', 'szl', 'gan',
+    'vls', 'rue', 'wuu', 'bo', 'glk', 'vep', 'sc', 'fiu-vro', 'frr',
+    'co', 'crh', 'km', 'lrc', 'tk', 'kv', 'csb', 'so', 'gv', 'as',
+    'lad', 'zea', 'ay', 'udm', 'myv', 'lez', 'kw', 'stq', 'ie',
+    'nrm', 'nv', 'pcd', 'mwl', 'rm', 'koi', 'gom', 'ug', 'lij', 'ab',
+    'gn', 'mt', 'fur', 'dsb', 'cbk-zam', 'dv', 'ang', 'ln', 'ext',
+    'kab', 'sn', 'ksh', 'lo', 'gag', 'frp', 'pag', 'pi', 'olo', 'av',
+    'dty', 'xal', 'pfl', 'krc', 'haw', 'bxr', 'kaa', 'pap', 'rw',
+    'pdc', 'bjn', 'to', 'nov', 'kl', 'arc', 'jam', 'kbd', 'ha', 'tpi',
+    'tyv', 'tet', 'ig', 'ki', 'na', 'lbe', 'roa-rup', 'jbo', 'ty',
+    'mdf', 'kg', 'za', 'wo', 'lg', 'bi', 'srn', 'zu', 'chr', 'tcy',
+    'ltg', 'sm', 'om', 'xh', 'tn', 'pih', 'chy', 'rmy', 'tw', 'cu',
+    'kbp', 'tum', 'ts', 'st', 'got', 'rn', 'pnt', 'ss', 'fj', 'bm',
+    'ch', 'ady', 'iu', 'mo', 'ny', 'ee', 'ks', 'ak', 'ik', 've', 'sg',
+    'dz', 'ff', 'ti', 'cr', 'atj', 'din', 'ng', 'cho', 'kj', 'mh',
+    'ho', 'ii', 'aa', 'mus', 'hz', 'kr',
+    # degraded due to major low-quality bot spam
+    'ceb', 'sv', 'war'
+)
+
+
 class WikipediaKnowledge:
     @staticmethod
     def wikipedia_language_code_redirects():
-        # https://en.wikipedia.org/wiki/List_of_Wikipedias#Redirects
-        return ["be-x-old", "cz", "dk", "mo", "nan", "nb"]
+        return list(LANGUAGE_CODE_REDIRECTS)
 
     @staticmethod
     def all_wikipedia_language_codes_order_by_importance():
-        # list from https://meta.wikimedia.org/wiki/List_of_Wikipedias as of 2017-10-07
-        # ordered by article count except some for extreme bot spam
-        # should use https://stackoverflow.com/questions/33608751/retrieve-a-list-of-all-wikipedia-languages-programmatically
-        # probably via wikipedia connection library
-        return ['en', 'de', 'fr', 'nl', 'ru', 'it', 'es', 'pl',
-                'vi', 'ja', 'pt', 'zh', 'uk', 'fa', 'ca', 'ar', 'no', 'sh', 'fi',
-                'hu', 'id', 'ko', 'cs', 'ro', 'sr', 'ms', 'tr', 'eu', 'eo', 'bg',
-                'hy', 'da', 'zh-min-nan', 'sk', 'min', 'kk', 'he', 'lt', 'hr',
-                'ce', 'et', 'sl', 'be', 'gl', 'el', 'nn', 'uz', 'simple', 'la',
-                'az', 'ur', 'hi', 'vo', 'th', 'ka', 'ta', 'cy', 'mk', 'mg', 'oc',
-                'tl', 'ky', 'lv', 'bs', 'tt', 'new', 'sq', 'tg', 'te', 'pms',
-                'br', 'be-tarask', 'zh-yue', 'bn', 'ml', 'ht', 'ast', 'lb', 'jv',
-                'mr', 'azb', 'af', 'sco', 'pnb', 'ga', 'is', 'cv', 'ba', 'fy',
-                'su', 'sw', 'my', 'lmo', 'an', 'yo', 'ne', 'gu', 'io', 'pa',
-                'nds', 'scn', 'bpy', 'als', 'bar', 'ku', 'kn', 'ia', 'qu', 'ckb',
-                'mn', 'arz', 'bat-smg', 'wa', 'gd', 'nap', 'bug', 'yi', 'am',
-                'si', 'cdo', 'map-bms', 'or', 'fo', 'mzn', 'hsb', 'xmf', 'li',
-                'mai', 'sah', 'sa', 'vec', 'ilo', 'os', 'mrj', 'hif', 'mhr', 'bh',
-                'roa-tara', 'eml', 'diq', 'pam', 'ps', 'sd', 'hak', 'nso', 'se',
-                'ace', 'bcl', 'mi', 'nah', 'zh-classical', 'nds-nl', 'szl', 'gan',
-                'vls', 'rue', 'wuu', 'bo', 'glk', 'vep', 'sc', 'fiu-vro', 'frr',
-                'co', 'crh', 'km', 'lrc', 'tk', 'kv', 'csb', 'so', 'gv', 'as',
-                'lad', 'zea', 'ay', 'udm', 'myv', 'lez', 'kw', 'stq', 'ie',
-                'nrm', 'nv', 'pcd', 'mwl', 'rm', 'koi', 'gom', 'ug', 'lij', 'ab',
-                'gn', 'mt', 'fur', 'dsb', 'cbk-zam', 'dv', 'ang', 'ln', 'ext',
-                'kab', 'sn', 'ksh', 'lo', 'gag', 'frp', 'pag', 'pi', 'olo', 'av',
-                'dty', 'xal', 'pfl', 'krc', 'haw', 'bxr', 'kaa', 'pap', 'rw',
-                'pdc', 'bjn', 'to', 'nov', 'kl', 'arc', 'jam', 'kbd', 'ha', 'tpi',
-                'tyv', 'tet', 'ig', 'ki', 'na', 'lbe', 'roa-rup', 'jbo', 'ty',
-                'mdf', 'kg', 'za', 'wo', 'lg', 'bi', 'srn', 'zu', 'chr', 'tcy',
-                'ltg', 'sm', 'om', 'xh', 'tn', 'pih', 'chy', 'rmy', 'tw', 'cu',
-                'kbp', 'tum', 'ts', 'st', 'got', 'rn', 'pnt', 'ss', 'fj', 'bm',
-                'ch', 'ady', 'iu', 'mo', 'ny', 'ee', 'ks', 'ak', 'ik', 've', 'sg',
-                'dz', 'ff', 'ti', 'cr', 'atj', 'din', 'ng', 'cho', 'kj', 'mh',
-                'ho', 'ii', 'aa', 'mus', 'hz', 'kr',
-                # degraded due to major low-quality bot spam
-                'ceb', 'sv', 'war'
-                ]
+        return list(LANGUAGE_CODES_ORDERED_BY_IMPORTANCE)
+
+
+class LanguageCodeRegistry:
+    """
+    immutable lookup structures for Wikipedia language codes,
+    for constant time checks on hot paths
+    """
+    def __init__(self, codes_ordered_by_importance, redirects):
+        self.codes_ordered_by_importance = tuple(codes_ordered_by_importance)
+        self.codes = frozenset(self.codes_ordered_by_importance)
+        self.redirects = frozenset(redirects)
+        rank = {}
+        for code in self.codes_ordered_by_importance:
+            rank.setdefault(code, len(rank))
+        self.rank = types.MappingProxyType(rank)
+        self.old_style_wikipedia_keys = frozenset("wikipedia:" + code for code in self.codes)
+
+    def is_known_code(self, language_code):
+        return language_code in self.codes
+
+    def is_redirect(self, language_code):
+        return language_code in self.redirects
+
+    def rank_of(self, language_code):
+        # lower is more important, None for unknown codes
+        return self.rank.get(language_code)
+
+    def is_valid_old_style_wikipedia_key(self, key):
+        return key in self.old_style_wikipedia_keys
+
+
+language_codes = LanguageCodeRegistry(LANGUAGE_CODES_ORDERED_BY_IMPORTANCE, LANGUAGE_CODE_REDIRECTS)